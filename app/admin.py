@@ -4,6 +4,7 @@ from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.db.models import Sum
 from app.models import Competencia, Juez, Equipo, RegistroTiempo, ResultadoEquipo
 
 # ======= FILTROS PERSONALIZADOS =======
@@ -38,7 +39,7 @@ class EquipoInline(admin.TabularInline):
 
     def num_registros_display(self, obj):
         if obj.pk:
-            count = obj.times.count()
+            count = obj.records_count
             return format_html('<b>{}</b> registros', count)
         return '-'
     num_registros_display.short_description = 'Registros'
@@ -99,8 +100,8 @@ class CompetenciaAdmin(admin.ModelAdmin):
     total_equipos.short_description = 'Equipos'
 
     def total_registros(self, obj):
-        # Suma registros de todos los equipos en esta competencia
-        return RegistroTiempo.objects.filter(team__competition=obj).count()
+        # Suma los contadores de los equipos de esta competencia
+        return obj.teams.aggregate(total=Sum('records_count'))['total'] or 0
     total_registros.short_description = 'Registros de Tiempo'
 
     def get_status_display(self, obj):
@@ -285,8 +286,9 @@ class EquipoAdmin(admin.ModelAdmin):
     list_select_related = ['competition', 'judge']
 
     def num_registros(self, obj):
-        return obj.times.count()
+        return obj.records_count
     num_registros.short_description = 'Registros'
+    num_registros.admin_order_field = 'records_count'
 
     def ver_resultados(self, obj):
         from django.urls import reverse
@@ -406,20 +408,48 @@ class RegistroTiempoAdmin(admin.ModelAdmin):
 
 @admin.register(ResultadoEquipo)
 class ResultadoEquipoAdmin(admin.ModelAdmin):
-    list_display = ['number', 'name', 'competition', 'tiempo_total_display', 'num_registros']
-    list_filter = ['competition']
+    list_display = [
+        'number',
+        'name',
+        'competition',
+        'posicion_display',
+        'posicion_categoria_display',
+        'tiempo_total_display',
+        'num_registros',
+    ]
+    list_filter = ['competition', 'category']
     search_fields = ['name', 'number']
     inlines = [RegistroTiempoInline]
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('times')
+        # Una fila de ResumenEquipo por equipo en lugar de agregar sus registros
+        return super().get_queryset(request).select_related('competition', 'summary')
+
+    def posicion_display(self, obj):
+        resumen = obj.get_summary()
+        if resumen is None:
+            return '-'
+        if resumen.disqualified:
+            return 'Descalificado'
+        return resumen.position or '-'
+    posicion_display.short_description = 'Posición'
+    posicion_display.admin_order_field = 'summary__position'
+
+    def posicion_categoria_display(self, obj):
+        resumen = obj.get_summary()
+        if resumen is None or resumen.category_position is None:
+            return '-'
+        return resumen.category_position
+    posicion_categoria_display.short_description = 'Posición Categoría'
+    posicion_categoria_display.admin_order_field = 'summary__category_position'
 
     def num_registros(self, obj):
-        return obj.times.count()
+        return obj.records_count
     num_registros.short_description = 'Nº Registros'
+    num_registros.admin_order_field = 'records_count'
     
     def tiempo_total_display(self, obj):
-        total = obj.total_time()
+        total = obj.total_time
         if total:
             hours = total // 3600000
             minutes = (total % 3600000) // 60000
@@ -428,3 +458,4 @@ class ResultadoEquipoAdmin(admin.ModelAdmin):
             return f"{hours}h {minutes}m {seconds}s {milliseconds}ms"
         return '-'
     tiempo_total_display.short_description = 'Tiempo Total'
+    tiempo_total_display.admin_order_field = 'total_time'
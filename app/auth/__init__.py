@@ -4,5 +4,6 @@ Backend de autenticación personalizado para JWT.
 """
 
 from .authentication import JuezJWTAuthentication
+from .juez_cache import asignaciones, invalidar_juez
 
-__all__ = ['JuezJWTAuthentication']
+__all__ = ['JuezJWTAuthentication', 'asignaciones', 'invalidar_juez']
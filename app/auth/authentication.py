@@ -5,23 +5,27 @@ Los jueces NO son usuarios de Django, tienen su propio modelo.
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
 from app.models import Juez
+from .juez_cache import obtener_juez
 
 
 class JuezJWTAuthentication(JWTAuthentication):
     """
     Autenticación JWT personalizada para el modelo Juez.
+
+    El juez y sus asignaciones se leen de una caché de corta duración por
+    (juez_id, jti), así una petición autenticada no consulta la base de datos.
     """
     
     def get_user(self, validated_token):
         """
         Obtiene el juez desde el token JWT validado.
+        El juez incluye ``equipo_ids`` y ``competencia_ids``.
         """
         try:
             juez_id = validated_token.get('juez_id')
             if juez_id is None:
                 raise InvalidToken('Token no contiene juez_id')
             
-            juez = Juez.objects.get(id=juez_id, is_active=True)
-            return juez
+            return obtener_juez(juez_id, validated_token.get('jti'))
         except Juez.DoesNotExist:
             raise InvalidToken('Juez no encontrado o inactivo')
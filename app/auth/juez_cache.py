@@ -0,0 +1,141 @@
+"""
+Módulo: juez_cache
+Caché de corta duración de la identidad del juez y sus asignaciones.
+
+Características:
+- Una entrada por (juez_id, jti): datos del juez, ids de sus equipos y competencias
+- Generación por juez: guardar un Juez o un Equipo invalida todas sus entradas
+- Entrada y generación se leen en una sola ida a la caché
+- Sin caché disponible se consulta la base de datos como antes
+"""
+
+import logging
+from typing import Dict, List, Any, Optional
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIMEOUT = 60
+
+# Campos del juez que se guardan (nunca la contraseña)
+CAMPOS_JUEZ = ('id', 'username', 'first_name', 'last_name', 'email', 'is_active', 'created_at')
+
+
+def _clave_entrada(juez_id: int, jti: str) -> str:
+    return f'auth:juez:{juez_id}:{jti}'
+
+
+def _clave_generacion(juez_id: int) -> str:
+    return f'auth:juez:{juez_id}:gen'
+
+
+def obtener_juez(juez_id: int, jti: Optional[str]):
+    """
+    Obtiene el juez activo con sus asignaciones, desde la caché si es posible.
+
+    El juez devuelto trae ``equipo_ids`` y ``competencia_ids`` ya cargados
+    (ver ``asignaciones``).
+
+    Args:
+        juez_id: ID del juez del token
+        jti: Identificador del token (None si el token no lo trae)
+
+    Returns:
+        Instancia de Juez
+
+    Raises:
+        Juez.DoesNotExist: si el juez no existe o está inactivo
+    """
+    from app.models import Juez
+
+    if not jti:
+        return _cargar_desde_bd(juez_id)
+
+    clave = _clave_entrada(juez_id, jti)
+    clave_gen = _clave_generacion(juez_id)
+    try:
+        valores = cache.get_many([clave, clave_gen])
+    except Exception as e:
+        logger.warning("Caché de jueces no disponible: %s", e)
+        return _cargar_desde_bd(juez_id)
+
+    generacion = valores.get(clave_gen, 0)
+    entrada = valores.get(clave)
+    if entrada is not None and entrada['gen'] == generacion:
+        return _juez_desde_entrada(Juez, entrada)
+
+    juez = _cargar_desde_bd(juez_id)
+    entrada = {
+        'gen': generacion,
+        'juez': {campo: getattr(juez, campo) for campo in CAMPOS_JUEZ},
+        'equipo_ids': juez.equipo_ids,
+        'competencia_ids': juez.competencia_ids,
+    }
+    try:
+        cache.set(clave, entrada, CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning("No se pudo guardar el juez en caché: %s", e)
+    return juez
+
+
+def invalidar_juez(juez_id: Optional[int]) -> None:
+    """
+    Invalida todas las entradas en caché de un juez (todos sus tokens).
+
+    Args:
+        juez_id: ID del juez (None se ignora)
+    """
+    if not juez_id:
+        return
+    clave_gen = _clave_generacion(juez_id)
+    try:
+        cache.add(clave_gen, 0, None)
+        cache.incr(clave_gen)
+    except Exception as e:
+        logger.warning("No se pudo invalidar el juez %s en caché: %s", juez_id, e)
+
+
+def asignaciones(juez) -> Dict[str, List[int]]:
+    """
+    Retorna los ids de equipos y competencias asignados a un juez.
+
+    Usa los valores cargados por la autenticación; si el juez no viene de
+    ella (por ejemplo, en el WebSocket) los consulta y los deja en la instancia.
+
+    Args:
+        juez: Instancia de Juez
+
+    Returns:
+        Dict con 'equipo_ids' y 'competencia_ids'
+    """
+    if getattr(juez, 'equipo_ids', None) is None:
+        _cargar_asignaciones(juez)
+    return {
+        'equipo_ids': juez.equipo_ids,
+        'competencia_ids': juez.competencia_ids,
+    }
+
+
+def _cargar_desde_bd(juez_id: int):
+    from app.models import Juez
+
+    juez = Juez.objects.get(id=juez_id, is_active=True)
+    _cargar_asignaciones(juez)
+    return juez
+
+
+def _cargar_asignaciones(juez) -> None:
+    filas = list(juez.teams.order_by('id').values_list('id', 'competition_id'))
+    juez.equipo_ids = [equipo_id for equipo_id, _ in filas]
+    juez.competencia_ids = sorted({competencia_id for _, competencia_id in filas})
+
+
+def _juez_desde_entrada(modelo, entrada: Dict[str, Any]):
+    juez = modelo(**entrada['juez'])
+    # Instancia equivalente a una leída de la base de datos
+    juez._state.adding = False
+    juez._state.db = 'default'
+    juez.equipo_ids = list(entrada['equipo_ids'])
+    juez.competencia_ids = list(entrada['competencia_ids'])
+    return juez
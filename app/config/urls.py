@@ -9,16 +9,48 @@ from app.views import (
     CompetenciaViewSet,
     EquipoViewSet,
     EstadoCompetenciaAdminView,
-    RegistrarTiemposView,
     EstadoEquipoRegistrosView,
+    RegistrarTiemposView,
+    RegistrarTiemposEquiposView,
+    EstadoEnvioRegistrosView,
+    SincronizarRegistrosView,
 )
 
 
 def health_check(request):
-    """Endpoint de health check para Docker/Kubernetes."""
+    """
+    Endpoint de health check para Docker/Kubernetes. Público: solo indica
+    que el worker responde; los contadores están en /api/metricas/.
+    """
     return JsonResponse({"status": "ok"})
 
 
+def metricas(request):
+    """
+    Contadores de este worker, solo para el staff (sesión del admin de
+    Django): WebSocket (control de admisión, conexiones vivas, zombis y
+    cosechadas, caché de tramas), el pool de hilos de BD y el pool asíncrono
+    del registro nativo.
+    """
+    from app.websocket import latido
+    from app.websocket.admision import control_admision
+    from app.utils.bd_async import pool_bd, pool_registro
+    from app.websocket.codificacion import tramas
+
+    if not request.user.is_active or not request.user.is_staff:
+        return JsonResponse({"detail": "Solo para el staff"}, status=403)
+
+    return JsonResponse({
+        "websocket": {
+            "admision": control_admision.estadisticas(),
+            "conexiones": latido.estadisticas(),
+            "tramas": tramas.estadisticas(),
+        },
+        "pool_bd": pool_bd.estadisticas(),
+        "pool_registro": pool_registro.estadisticas(),
+    })
+
+
 # Router de DRF para ViewSets
 router = DefaultRouter()
 router.register(r'competencias', CompetenciaViewSet, basename='competencia')
@@ -27,6 +59,7 @@ router.register(r'equipos', EquipoViewSet, basename='equipo')
 urlpatterns = [
     # Health check (para Docker)
     path('health/', health_check, name='health_check'),
+    path('metricas/', metricas, name='metricas'),
     
     # Autenticación
     path('login/', LoginView.as_view(), name='login'),
@@ -40,6 +73,9 @@ urlpatterns = [
     # Endpoints de registros de tiempo (HTTP)
     path('equipos/<int:equipo_id>/registros/', RegistrarTiemposView.as_view(), name='registrar_tiempos'),
     path('equipos/<int:equipo_id>/registros/estado/', EstadoEquipoRegistrosView.as_view(), name='estado_registros'),
+    path('equipos/<int:equipo_id>/registros/sincronizar/', SincronizarRegistrosView.as_view(), name='sincronizar_registros'),
+    path('registros/lote/', RegistrarTiemposEquiposView.as_view(), name='registrar_tiempos_lote'),
+    path('registros/envios/<str:seguimiento>/', EstadoEnvioRegistrosView.as_view(), name='estado_envio_registros'),
     
     # Incluir rutas del router (Competencias y Equipos)
     path('', include(router.urls)),
@@ -0,0 +1,135 @@
+"""
+Comando para medir el camino de escritura de POST /api/equipos/{id}/registros/.
+
+Cada iteración envía los 15 tiempos de un equipo sin registros, a través de la
+vista real (autenticación JWT incluida), dentro de una transacción que se
+revierte al final: la base de datos queda igual y no se difunde nada.
+
+Uso:
+    docker compose exec web python manage.py benchmark_registros
+    docker compose exec web python manage.py benchmark_registros --competencia 1 --iteraciones 200
+
+Opciones:
+    --competencia ID    Competencia a usar (default: la primera con equipos sin registros)
+    --iteraciones N     Número de envíos a medir (default: 100)
+"""
+
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.models import Competencia, Equipo
+from app.views.registro_views import RegistrarTiemposView
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y latencia (p50/p95/p99) del registro de 15 tiempos por HTTP'
+
+    # Sentencias de la transacción externa del benchmark, no del camino medido
+    SENTENCIAS_IGNORADAS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--competencia',
+            type=int,
+            default=None,
+            help='ID de la competencia (default: la primera con equipos sin registros)',
+        )
+        parser.add_argument(
+            '--iteraciones',
+            type=int,
+            default=100,
+            help='Número de envíos a medir (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        iteraciones = options['iteraciones']
+        if iteraciones < 1:
+            raise CommandError('--iteraciones debe ser mayor que 0')
+
+        equipos = Equipo.objects.filter(judge__isnull=False, times__isnull=True).select_related('judge')
+        if options['competencia']:
+            equipos = equipos.filter(competition_id=options['competencia'])
+        equipos = list(equipos.order_by('competition_id', 'number'))
+        if not equipos:
+            raise CommandError('No hay equipos con juez y sin registros para medir')
+
+        competencia_id = equipos[0].competition_id
+        equipos = [e for e in equipos if e.competition_id == competencia_id]
+        competencia = Competencia.objects.get(id=competencia_id)
+
+        tokens = {}
+        for equipo in equipos:
+            if equipo.judge_id not in tokens:
+                refresh = RefreshToken()
+                refresh['juez_id'] = equipo.judge_id
+                tokens[equipo.judge_id] = str(refresh.access_token)
+
+        self.stdout.write(
+            f'Competencia: {competencia.name} | equipos disponibles: {len(equipos)} | iteraciones: {iteraciones}'
+        )
+
+        factory = APIRequestFactory()
+        vista = RegistrarTiemposView.as_view()
+        latencias = []
+        consultas = []
+        fallidas = 0
+
+        for i in range(iteraciones):
+            equipo = equipos[i % len(equipos)]
+            payload = {'registros': [
+                {'id_registro': str(uuid.uuid4()), 'tiempo': 1_200_000 + 1_000 * j}
+                for j in range(RegistrarTiemposView.MAX_REGISTROS)
+            ]}
+            request = factory.post(
+                f'/api/equipos/{equipo.id}/registros/',
+                payload,
+                format='json',
+                HTTP_AUTHORIZATION=f'Bearer {tokens[equipo.judge_id]}',
+            )
+
+            with transaction.atomic():
+                # Sin señales: solo se necesita la competencia en curso dentro de la transacción
+                Competencia.objects.filter(id=competencia_id).update(is_running=True)
+
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    respuesta = vista(request, equipo_id=equipo.id)
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+
+                if respuesta.status_code != 201:
+                    fallidas += 1
+                consultas.append(sum(
+                    1 for q in capturadas.captured_queries
+                    if not q['sql'].upper().startswith(self.SENTENCIAS_IGNORADAS)
+                ))
+                transaction.set_rollback(True)
+
+        self.mostrar_resumen(latencias, consultas, fallidas)
+
+    def mostrar_resumen(self, latencias, consultas, fallidas):
+        """Imprime consultas por petición y percentiles de latencia."""
+        percentiles = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+
+        self.stdout.write(self.style.SUCCESS('\n' + '═'*60))
+        self.stdout.write(self.style.SUCCESS('  RESULTADO DEL BENCHMARK'))
+        self.stdout.write(self.style.SUCCESS('═'*60))
+        self.stdout.write(f'  Peticiones: {len(latencias)} (no 201: {fallidas})')
+        self.stdout.write(
+            f'  Consultas por petición: mediana={statistics.median(consultas):g} '
+            f'min={min(consultas)} max={max(consultas)}'
+        )
+        self.stdout.write(
+            f'  Latencia (ms): p50={percentiles[49]:.2f} p95={percentiles[94]:.2f} '
+            f'p99={percentiles[98]:.2f} max={max(latencias):.2f}'
+        )
+        self.stdout.write(self.style.SUCCESS('═'*60))
+
+        if fallidas:
+            self.stdout.write(self.style.WARNING('Hubo respuestas distintas de 201: revisar la competencia y los equipos'))
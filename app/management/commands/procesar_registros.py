@@ -0,0 +1,85 @@
+"""
+Comando del worker de la cola de registros (REGISTRO_MODO='cola').
+
+Lee los envíos del Redis Stream con el grupo de consumidores 'registradores'
+y los guarda por tandas: cada tanda es una transacción con un único INSERT.
+Se pueden ejecutar varios workers; cada uno recibe mensajes distintos y
+reclama los que otro dejó sin confirmar.
+
+Uso:
+    docker compose exec web python manage.py procesar_registros
+    docker compose exec web python manage.py procesar_registros --bloque 500 --una-vez
+
+Opciones:
+    --bloque N       Máximo de envíos por tanda (default: 200)
+    --espera-ms N    Espera bloqueante cuando el stream está vacío (default: 1000)
+    --una-vez        Vacía lo pendiente y termina
+"""
+
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from app.services.cola_registros_service import ColaRegistrosService
+
+
+class Command(BaseCommand):
+    help = 'Guarda en la base de datos los envíos de registros encolados en Redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bloque',
+            type=int,
+            default=200,
+            help='Máximo de envíos por tanda (default: 200)',
+        )
+        parser.add_argument(
+            '--espera-ms',
+            type=int,
+            default=1000,
+            help='Espera bloqueante cuando el stream está vacío (default: 1000)',
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Vacía lo pendiente y termina',
+        )
+
+    def handle(self, *args, **options):
+        if options['bloque'] < 1:
+            raise CommandError('--bloque debe ser mayor que 0')
+
+        servicio = ColaRegistrosService()
+        consumidor = f'{socket.gethostname()}-{os.getpid()}'
+        servicio.crear_grupo()
+        self.stdout.write(f'Worker de registros {consumidor} | {servicio.estadisticas()}')
+
+        confirmados = 0
+        try:
+            while True:
+                # Como entre peticiones: descarta conexiones caducadas o rotas
+                close_old_connections()
+                try:
+                    vuelta = servicio.procesar(consumidor, options['bloque'], options['espera_ms'])
+                except Exception as e:
+                    # Redis o la base de datos caídos: los mensajes siguen en el stream
+                    self.stderr.write(f'Error procesando la cola: {e}')
+                    if options['una_vez']:
+                        raise CommandError(str(e))
+                    time.sleep(1)
+                    continue
+
+                confirmados += vuelta['confirmados']
+                if vuelta['confirmados'] or vuelta['pendientes']:
+                    self.stdout.write(
+                        f'Tanda: confirmados={vuelta["confirmados"]} pendientes={vuelta["pendientes"]}'
+                    )
+                if options['una_vez'] and not vuelta['confirmados']:
+                    break
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Envíos confirmados: {confirmados} | {servicio.estadisticas()}'))
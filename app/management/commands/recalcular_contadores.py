@@ -0,0 +1,35 @@
+"""
+Comando para reparar los contadores de registros de los equipos.
+
+Recalcula Equipo.records_count y Equipo.total_time a partir de la tabla de
+registros. El registro de tiempos los mantiene en su propia transacción;
+este comando corrige los desfases de importaciones o de cambios hechos
+directamente en la base de datos.
+
+Uso:
+    docker compose exec web python manage.py recalcular_contadores
+    docker compose exec web python manage.py recalcular_contadores --competencia 1
+
+Opciones:
+    --competencia ID    Limitar a una competencia (default: todas)
+"""
+
+from django.core.management.base import BaseCommand
+
+from app.services.registro_service import RegistroService
+
+
+class Command(BaseCommand):
+    help = 'Recalcula records_count y total_time de los equipos desde sus registros'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--competencia',
+            type=int,
+            default=None,
+            help='ID de la competencia (default: todas)',
+        )
+
+    def handle(self, *args, **options):
+        corregidos = RegistroService().recalcular_contadores(competencia_id=options['competencia'])
+        self.stdout.write(self.style.SUCCESS(f'Equipos con contadores corregidos: {corregidos}'))
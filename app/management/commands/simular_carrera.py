@@ -0,0 +1,526 @@
+"""
+Comando de prueba de carga que simula el tráfico de un día de carrera.
+
+Levanta la aplicación ASGI (server.asgi.application) dentro del proceso, con la
+base de datos configurada (SQLite o PostgreSQL local) y, por defecto, channel
+layer y caché en memoria, sin Redis. Simula:
+    - N jueces que inician sesión en /api/login/
+    - N sockets de juez en /ws/juez/{id}/ abiertos durante toda la prueba
+    - M espectadores en /ws/competencia/{id}/
+    - Envíos de 15 tiempos por equipo en ráfagas
+
+Crea una competencia, jueces y equipos temporales y los elimina al terminar.
+
+Uso:
+    python manage.py simular_carrera
+    python manage.py simular_carrera --jueces 72 --espectadores 300 --rafagas 3 --pausa 1.5
+
+    # Comparar el rendimiento del registro con jueces concurrentes (PostgreSQL)
+    python manage.py simular_carrera --jueces 200 --rafagas 1 --registro hilo
+    python manage.py simular_carrera --jueces 200 --rafagas 1 --registro nativo
+    python manage.py simular_carrera --jueces 200 --rafagas 1 --registro cola
+
+Opciones:
+    --jueces N          Jueces/equipos simulados (default: 72)
+    --espectadores M    Espectadores conectados a resultados en vivo (default: 200)
+    --rafagas B         Número de ráfagas en que se reparten los envíos (default: 3)
+    --pausa S           Segundos entre ráfagas (default: 1.0)
+    --registro MODO     Camino de escritura: 'hilo' (ORM en el executor de Django),
+                        'nativo' (psycopg asíncrono, requiere PostgreSQL) o 'cola'
+                        (202 y worker de la cola en un hilo, requiere Redis)
+                        (default: REGISTRO_MODO de settings)
+    --usar-redis        Usa el channel layer y la caché configurados en settings
+    --conservar         No elimina los datos creados al terminar
+"""
+
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+
+from channels.layers import InMemoryChannelLayer
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from app.models import Competencia, Juez, Equipo
+from app.services.cola_registros_service import ColaRegistrosService
+from app.services.registro_service import MODO_COLA, MODO_HILO, MODO_NATIVO
+from app.utils.bd_async import pool_bd, pool_registro
+
+
+class CapaEnMemoria(InMemoryChannelLayer):
+    """
+    InMemoryChannelLayer que se puede usar desde hilos con su propio event loop.
+
+    La difusión coalescida envía desde un hilo en segundo plano; con Redis eso
+    funciona tal cual, pero las colas en memoria pertenecen al loop principal,
+    así que los envíos de otros loops se reprograman en él.
+    """
+
+    bucle = None
+
+    async def send(self, channel, message):
+        return await self._en_bucle_principal(super().send(channel, message))
+
+    async def group_send(self, group, message):
+        return await self._en_bucle_principal(super().group_send(group, message))
+
+    async def _en_bucle_principal(self, corrutina):
+        bucle = type(self).bucle
+        if bucle is None or asyncio.get_running_loop() is bucle:
+            return await corrutina
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(corrutina, bucle))
+
+
+class ContadorConsultas:
+    """
+    Cuenta las consultas SQL de todas las conexiones (todos los hilos),
+    incluido el trabajo en segundo plano.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.total += 1
+        return execute(sql, params, many, context)
+
+    def instalar(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga: jueces (login, WebSocket, envíos en ráfagas) y espectadores en vivo'
+
+    HOST = 'testserver'
+    TIMEOUT = 120
+    PASSWORD = 'simulacion-5k'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jueces',
+            type=int,
+            default=72,
+            help='Número de jueces/equipos simulados (default: 72)',
+        )
+        parser.add_argument(
+            '--espectadores',
+            type=int,
+            default=200,
+            help='Espectadores conectados a resultados en vivo (default: 200)',
+        )
+        parser.add_argument(
+            '--rafagas',
+            type=int,
+            default=3,
+            help='Número de ráfagas en que se reparten los envíos (default: 3)',
+        )
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=1.0,
+            help='Segundos entre ráfagas (default: 1.0)',
+        )
+        parser.add_argument(
+            '--registro',
+            choices=[MODO_HILO, MODO_NATIVO, MODO_COLA],
+            default=None,
+            help="Camino de escritura del registro (default: REGISTRO_MODO de settings)",
+        )
+        parser.add_argument(
+            '--usar-redis',
+            action='store_true',
+            help='Usa el channel layer y la caché de settings en lugar de memoria',
+        )
+        parser.add_argument(
+            '--conservar',
+            action='store_true',
+            help='No elimina la competencia, jueces y equipos creados',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['jueces'] < 1 or options['espectadores'] < 0 or options['rafagas'] < 1:
+            raise CommandError('--jueces y --rafagas deben ser mayores que 0 y --espectadores no negativo')
+
+        ajustes = {
+            'ALLOWED_HOSTS': [self.HOST],
+            'SECURE_SSL_REDIRECT': False,
+        }
+        modo_registro = options['registro'] or getattr(settings, 'REGISTRO_MODO', 'hilo')
+        if modo_registro == MODO_NATIVO and not pool_registro.disponible():
+            raise CommandError("--registro nativo requiere PostgreSQL")
+        if modo_registro == MODO_COLA:
+            try:
+                ColaRegistrosService().crear_grupo()
+            except Exception as e:
+                raise CommandError(f"--registro cola requiere Redis (COLA_REGISTROS_URL): {e}")
+        ajustes['REGISTRO_MODO'] = modo_registro
+        if not options['usar_redis']:
+            ajustes['CHANNEL_LAYERS'] = {
+                'default': {'BACKEND': f'{__name__}.CapaEnMemoria'},
+                'espectadores': {'BACKEND': f'{__name__}.CapaEnMemoria'},
+            }
+            ajustes['CACHES'] = {
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'simulacion'},
+                'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'simulacion-local'},
+            }
+
+        with override_settings(**ajustes):
+            competencia, jueces = self.crear_datos(options['jueces'])
+            self.stdout.write(
+                f'Competencia: {competencia.name} (id={competencia.id}) | jueces: {len(jueces)} | '
+                f'espectadores: {options["espectadores"]} | ráfagas: {options["rafagas"]} | '
+                f'capa: {"Redis" if options["usar_redis"] else "memoria"} | registro: {modo_registro}'
+            )
+
+            contador = ContadorConsultas()
+            connections.close_all()
+            connection_created.connect(contador.instalar)
+            try:
+                resultados = asyncio.run(self.simular(competencia, jueces, contador, options))
+            finally:
+                connection_created.disconnect(contador.instalar)
+                connections.close_all()
+                if not options['conservar']:
+                    self.eliminar_datos(competencia, jueces)
+
+        self.mostrar_resumen(resultados)
+
+    # ===== Datos =====
+
+    def crear_datos(self, num_jueces):
+        """Crea una competencia en curso con un juez y un equipo por juez."""
+        sufijo = get_random_string(6).lower()
+        competencia = Competencia.objects.create(
+            name=f'Simulación de carga {sufijo}',
+            datetime=timezone.now(),
+            is_active=True,
+            is_running=False,
+        )
+        # Sin señales: no se notifica a nadie del inicio de una competencia ficticia
+        Competencia.objects.filter(id=competencia.id).update(is_running=True, started_at=timezone.now())
+
+        # Un único hash para todos: crear N hashes solo alargaría la preparación
+        plantilla = Juez()
+        plantilla.set_password(self.PASSWORD)
+        Juez.objects.bulk_create([
+            Juez(
+                username=f'sim_{sufijo}_{i}',
+                password=plantilla.password,
+                first_name='Juez',
+                last_name=f'Simulado {i}',
+                is_active=True,
+            )
+            for i in range(1, num_jueces + 1)
+        ])
+        jueces = list(Juez.objects.filter(username__startswith=f'sim_{sufijo}_').order_by('id'))
+
+        Equipo.objects.bulk_create([
+            Equipo(
+                name=f'Equipo simulado {i}',
+                number=i,
+                category=random.choice(['estudiantes', 'interfacultades']),
+                competition=competencia,
+                judge=juez,
+            )
+            for i, juez in enumerate(jueces, 1)
+        ])
+        equipos = {e.judge_id: e.id for e in Equipo.objects.filter(competition=competencia)}
+        for juez in jueces:
+            juez.equipo_id = equipos[juez.id]
+
+        return competencia, jueces
+
+    def eliminar_datos(self, competencia, jueces):
+        Competencia.objects.filter(id=competencia.id).delete()
+        Juez.objects.filter(id__in=[j.id for j in jueces]).delete()
+
+    # ===== Simulación =====
+
+    async def simular(self, competencia, jueces, contador, options):
+        from channels.testing import WebsocketCommunicator
+        from server.asgi import application
+
+        CapaEnMemoria.bucle = asyncio.get_running_loop()
+        resultados = {}
+
+        # 1. Login concurrente de todos los jueces
+        consultas_antes = contador.total
+        inicio = time.perf_counter()
+        logins = await asyncio.gather(*[
+            self.peticion(application, 'POST', '/api/login/', {'username': j.username, 'password': self.PASSWORD})
+            for j in jueces
+        ])
+        resultados['login'] = self.resumir_fase(logins, time.perf_counter() - inicio, contador.total - consultas_antes)
+        tokens = {j.id: r['json'].get('access') for j, r in zip(jueces, logins) if r['status'] == 200}
+
+        # 2. Sockets de jueces y espectadores
+        sockets_jueces = []
+        sockets_espectadores = []
+        recibidos = {'deltas': [], 'mensajes_espectador': [], 'mensajes_juez': 0}
+        tareas = []
+
+        async def conectar(path):
+            comunicador = WebsocketCommunicator(application, path)
+            t0 = time.perf_counter()
+            conectado, _ = await comunicador.connect(timeout=self.TIMEOUT)
+            return comunicador, conectado, (time.perf_counter() - t0) * 1000
+
+        consultas_antes = contador.total
+        inicio = time.perf_counter()
+        conexiones = await asyncio.gather(
+            *[conectar(f'/ws/juez/{j.id}/?token={tokens[j.id]}') for j in jueces if j.id in tokens],
+            *[conectar(f'/ws/competencia/{competencia.id}/') for _ in range(options['espectadores'])],
+        )
+        duracion = time.perf_counter() - inicio
+        num_jueces_ws = len(tokens)
+        for i, (comunicador, conectado, _) in enumerate(conexiones):
+            if not conectado:
+                continue
+            if i < num_jueces_ws:
+                sockets_jueces.append(comunicador)
+                tareas.append(asyncio.create_task(self.escuchar_juez(comunicador, recibidos)))
+            else:
+                sockets_espectadores.append(comunicador)
+                tareas.append(asyncio.create_task(self.escuchar_espectador(comunicador, recibidos)))
+        resultados['conexion'] = self.resumir_fase(
+            [{'status': 101 if c else 0, 'ms': ms} for _, c, ms in conexiones],
+            duracion,
+            contador.total - consultas_antes,
+            exito=101,
+        )
+
+        # 3. Envíos de 15 tiempos en ráfagas
+        con_token = [j for j in jueces if j.id in tokens]
+        random.shuffle(con_token)
+        rafagas = [con_token[i::options['rafagas']] for i in range(options['rafagas'])]
+
+        # Con la cola el envío responde 202 y el worker (aquí, un hilo) guarda
+        modo_cola = settings.REGISTRO_MODO == MODO_COLA
+        exito_registro = 202 if modo_cola else 201
+        cola = {'confirmados': 0, 'vaciada_en': None}
+        detener_cola = threading.Event()
+        if modo_cola:
+            worker = threading.Thread(target=self.vaciar_cola, args=(cola, detener_cola), daemon=True)
+            worker.start()
+
+        consultas_antes = contador.total
+        inicio = time.perf_counter()
+        envios = []
+        for numero, rafaga in enumerate(rafagas):
+            if numero:
+                await asyncio.sleep(options['pausa'])
+            envios += await asyncio.gather(*[
+                self.peticion(
+                    application, 'POST', f'/api/equipos/{j.equipo_id}/registros/',
+                    {'registros': self.generar_registros()}, token=tokens[j.id]
+                )
+                for j in rafaga
+            ])
+        fin_envios = time.perf_counter()
+        resultados['registro'] = self.resumir_fase(
+            envios, fin_envios - inicio - options['pausa'] * (len(rafagas) - 1), None, exito=exito_registro
+        )
+
+        # 4. Esperar la difusión: cada espectador debe recibir un delta por equipo guardado
+        guardados = sum(1 for r in envios if r['status'] == exito_registro)
+        limite = time.perf_counter() + 10
+        while time.perf_counter() < limite:
+            cola_vacia = not modo_cola or cola['confirmados'] >= guardados
+            if cola_vacia and sockets_espectadores and all(n >= guardados for n in recibidos['deltas']):
+                break
+            await asyncio.sleep(0.05)
+        if modo_cola:
+            detener_cola.set()
+            await asyncio.to_thread(worker.join)
+            resultados['cola'] = {
+                'aceptados': guardados,
+                'confirmados': cola['confirmados'],
+                'vaciada_ms': (cola['vaciada_en'] - fin_envios) * 1000 if cola['vaciada_en'] else None,
+            }
+        resultados['registro']['consultas'] = contador.total - consultas_antes
+        resultados['registro']['por_peticion'] = resultados['registro']['consultas'] / max(len(envios), 1)
+        resultados['difusion'] = {
+            'espectadores': len(sockets_espectadores),
+            'esperados': guardados,
+            'deltas_min': min(recibidos['deltas'], default=0),
+            'mensajes_media': statistics.mean(recibidos['mensajes_espectador']) if sockets_espectadores else 0,
+            'mensajes_juez': recibidos['mensajes_juez'],
+            'propagacion_ms': (time.perf_counter() - fin_envios) * 1000,
+        }
+
+        for tarea in tareas:
+            tarea.cancel()
+        for comunicador in sockets_jueces + sockets_espectadores:
+            try:
+                await comunicador.disconnect()
+            except (Exception, asyncio.CancelledError):
+                pass
+
+        resultados['pool_bd'] = pool_bd.estadisticas()
+        if settings.REGISTRO_MODO == MODO_NATIVO:
+            resultados['pool_registro'] = pool_registro.estadisticas()
+            await pool_registro.cerrar()
+
+        return resultados
+
+    def vaciar_cola(self, cola, detener):
+        """Worker de la cola de registros (como procesar_registros) hasta que se le detiene."""
+        servicio = ColaRegistrosService()
+        try:
+            while not detener.is_set():
+                close_old_connections()
+                try:
+                    vuelta = servicio.procesar('simulacion', bloque=200, espera_ms=100)
+                except Exception as e:
+                    self.stderr.write(f'Error procesando la cola: {e}')
+                    time.sleep(0.1)
+                    continue
+                if vuelta['confirmados']:
+                    cola['confirmados'] += vuelta['confirmados']
+                    cola['vaciada_en'] = time.perf_counter()
+        finally:
+            connections.close_all()
+
+    async def peticion(self, application, metodo, path, datos, token=None):
+        """Envía una petición HTTP a la aplicación ASGI y mide su latencia."""
+        from channels.testing import HttpCommunicator
+
+        cuerpo = json.dumps(datos).encode()
+        cabeceras = [
+            (b'host', self.HOST.encode()),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(cuerpo)).encode()),
+        ]
+        if token:
+            cabeceras.append((b'authorization', f'Bearer {token}'.encode()))
+
+        comunicador = HttpCommunicator(application, metodo, path, body=cuerpo, headers=cabeceras)
+        inicio = time.perf_counter()
+        respuesta = await comunicador.get_response(timeout=self.TIMEOUT)
+        ms = (time.perf_counter() - inicio) * 1000
+        try:
+            cuerpo = json.loads(respuesta['body'] or b'{}')
+        except ValueError:
+            cuerpo = {}
+        if respuesta['status'] >= 400 and self.verbosity >= 2:
+            self.stderr.write(f'{metodo} {path} -> {respuesta["status"]}: {str(cuerpo)[:200]}')
+        return {'status': respuesta['status'], 'ms': ms, 'json': cuerpo}
+
+    async def escuchar_espectador(self, comunicador, recibidos):
+        indice = len(recibidos['deltas'])
+        recibidos['deltas'].append(0)
+        recibidos['mensajes_espectador'].append(0)
+        while True:
+            mensaje = await comunicador.receive_json_from(timeout=3600)
+            recibidos['mensajes_espectador'][indice] += 1
+            if mensaje.get('tipo') == 'clasificacion_lote':
+                recibidos['deltas'][indice] += len(mensaje.get('deltas', []))
+            elif mensaje.get('tipo') == 'clasificacion_delta':
+                recibidos['deltas'][indice] += 1
+
+    async def escuchar_juez(self, comunicador, recibidos):
+        while True:
+            await comunicador.receive_json_from(timeout=3600)
+            recibidos['mensajes_juez'] += 1
+
+    def generar_registros(self):
+        """15 tiempos entre 15 y 40 minutos; a veces un jugador ausente (0 ms)."""
+        registros = [
+            {'id_registro': str(uuid.uuid4()), 'tiempo': random.randint(15 * 60_000, 40 * 60_000)}
+            for _ in range(15)
+        ]
+        if random.random() < 0.1:
+            registros[-1]['tiempo'] = 0
+        return registros
+
+    # ===== Resultados =====
+
+    def resumir_fase(self, respuestas, segundos, consultas, exito=200):
+        latencias = [r['ms'] for r in respuestas]
+        percentiles = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+        estados = {}
+        for r in respuestas:
+            estados[r['status']] = estados.get(r['status'], 0) + 1
+        return {
+            'total': len(respuestas),
+            'exitosas': estados.get(exito, 0),
+            'estados': estados,
+            'segundos': segundos,
+            'por_segundo': len(respuestas) / segundos if segundos > 0 else 0,
+            'p50': percentiles[49] if percentiles else 0,
+            'p95': percentiles[94] if percentiles else 0,
+            'p99': percentiles[98] if percentiles else 0,
+            'consultas': consultas,
+            'por_peticion': consultas / len(respuestas) if consultas is not None and respuestas else 0,
+        }
+
+    def mostrar_resumen(self, resultados):
+        """Imprime una tabla por fase y el resultado de la difusión."""
+        self.stdout.write(self.style.SUCCESS('\n' + '═'*78))
+        self.stdout.write(self.style.SUCCESS('  RESULTADO DE LA SIMULACIÓN'))
+        self.stdout.write(self.style.SUCCESS('═'*78))
+        self.stdout.write(
+            f'  {"Fase":<10}{"OK/total":>11}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+            f'{"consultas":>11}{"/req":>7}'
+        )
+        for nombre in ('login', 'conexion', 'registro'):
+            fase = resultados[nombre]
+            self.stdout.write(
+                f'  {nombre:<10}{fase["exitosas"]:>5}/{fase["total"]:<5}{fase["por_segundo"]:>9.1f}'
+                f'{fase["p50"]:>9.1f}{fase["p95"]:>9.1f}{fase["p99"]:>9.1f}'
+                f'{fase["consultas"]:>11}{fase["por_peticion"]:>7.1f}'
+            )
+            if fase['exitosas'] < fase['total']:
+                self.stdout.write(self.style.WARNING(f'  {"":<10}estados: {fase["estados"]}'))
+
+        difusion = resultados['difusion']
+        self.stdout.write('')
+        self.stdout.write(
+            f'  Difusión: {difusion["espectadores"]} espectadores, mínimo {difusion["deltas_min"]}/'
+            f'{difusion["esperados"]} deltas recibidos, {difusion["mensajes_media"]:.1f} mensajes por espectador'
+        )
+        self.stdout.write(
+            f'  Mensajes a jueces: {difusion["mensajes_juez"]} | '
+            f'último delta {difusion["propagacion_ms"]:.0f} ms después del último envío'
+        )
+        self.stdout.write('  Las consultas incluyen el trabajo en segundo plano (difusión, refresco de resultados).')
+        pool = resultados['pool_bd']
+        self.stdout.write(
+            f'  Pool de hilos de BD: {pool["hilos"]} hilos, espera p50={pool["espera_ms"]["p50"]:.1f} '
+            f'p95={pool["espera_ms"]["p95"]:.1f} max={pool["espera_ms"]["max"]:.1f} ms'
+        )
+        for nombre, funcion in sorted(pool['funciones'].items()):
+            self.stdout.write(
+                f'    {nombre:<45}{funcion["llamadas"]:>6} llamadas  p50={funcion["p50"]:.1f} '
+                f'p95={funcion["p95"]:.1f} ms'
+            )
+        cola = resultados.get('cola')
+        if cola:
+            vaciada = f'{cola["vaciada_ms"]:.0f} ms' if cola['vaciada_ms'] is not None else '-'
+            self.stdout.write(
+                f'  Cola: {cola["confirmados"]}/{cola["aceptados"]} envíos aceptados guardados por el worker, '
+                f'último {vaciada} después del último envío'
+            )
+        pool = resultados.get('pool_registro')
+        if pool:
+            self.stdout.write(
+                f'  Registro nativo: {pool["prestamos"]} préstamos del pool, {pool["abiertas"]} conexiones '
+                f'(máximo {pool["maximo"]}), {pool["esperas"]} esperas; sus consultas no se cuentan arriba.'
+            )
+        self.stdout.write(self.style.SUCCESS('═'*78))
+
+        if difusion['deltas_min'] < difusion['esperados']:
+            self.stdout.write(self.style.WARNING('Algún espectador no recibió todos los deltas (recarga por hueco de secuencia)'))
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 06:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_remove_competencia_category_equipo_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenEquipo',
+            fields=[
+                ('team', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='app.equipo', verbose_name='Equipo')),
+                ('total_time', models.BigIntegerField(default=0, help_text='Tiempo total en milisegundos', verbose_name='Tiempo total')),
+                ('best_time', models.BigIntegerField(blank=True, help_text='Mejor tiempo (> 0) en milisegundos', null=True, verbose_name='Mejor tiempo')),
+                ('average_time', models.BigIntegerField(default=0, help_text='Tiempo promedio en milisegundos', verbose_name='Tiempo promedio')),
+                ('absent_count', models.PositiveIntegerField(default=0, verbose_name='Jugadores ausentes')),
+                ('records_count', models.PositiveIntegerField(default=0, verbose_name='Registros')),
+                ('position', models.PositiveIntegerField(blank=True, null=True, verbose_name='Posición general')),
+                ('category_position', models.PositiveIntegerField(blank=True, null=True, verbose_name='Posición en categoría')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Equipo',
+                'verbose_name_plural': 'Resúmenes de Equipos',
+            },
+        ),
+    ]
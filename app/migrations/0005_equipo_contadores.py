@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 07:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def calcular_contadores(apps, schema_editor):
+    Equipo = apps.get_model('app', 'Equipo')
+    RegistroTiempo = apps.get_model('app', 'RegistroTiempo')
+    del_equipo = RegistroTiempo.objects.filter(team=OuterRef('pk')).order_by().values('team')
+    Equipo.objects.update(
+        records_count=Coalesce(Subquery(del_equipo.annotate(total=Count('pk')).values('total')), 0),
+        total_time=Coalesce(Subquery(del_equipo.annotate(total=Sum('time')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_resumenequipo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipo',
+            name='records_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Registros'),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='total_time',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Tiempo total en milisegundos', verbose_name='Tiempo total'),
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-17 07:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_equipo_contadores'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='resumenequipo',
+            name='records_count',
+        ),
+        migrations.RemoveField(
+            model_name='resumenequipo',
+            name='total_time',
+        ),
+    ]
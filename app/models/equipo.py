@@ -32,6 +32,13 @@ class Equipo(models.Model):
         verbose_name='Juez asignado',
     )
 
+    # Contadores mantenidos en la misma transacción que los INSERT de registros
+    # (RegistroService); se reparan con: python manage.py recalcular_contadores
+    records_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Registros")
+    total_time = models.BigIntegerField(
+        default=0, editable=False, help_text="Tiempo total en milisegundos", verbose_name="Tiempo total"
+    )
+
     class Meta:
         unique_together = ('competition', 'number')
         ordering = ['number']
@@ -41,17 +48,22 @@ class Equipo(models.Model):
     def __str__(self):
         return f"{self.name} (Dorsal {self.number})"
 
-    def total_time(self):
-        """Retorna el tiempo total en milisegundos"""
-        from django.db.models import Sum
-        total = self.times.aggregate(total=Sum('time'))['total']
-        return total or 0
+    def get_summary(self):
+        """
+        Retorna el resumen materializado del equipo o None si aún no existe.
+        Usar select_related('summary') al listar equipos para evitar una consulta por fila.
+        """
+        from app.models.resumen_equipo import ResumenEquipo
+        try:
+            return self.summary
+        except ResumenEquipo.DoesNotExist:
+            return None
 
     def average_time(self):
         """Retorna el tiempo promedio en milisegundos"""
-        from django.db.models import Avg
-        promedio = self.times.aggregate(promedio=Avg('time'))['promedio']
-        return int(promedio) if promedio else 0
+        if not self.records_count:
+            return 0
+        return self.total_time // self.records_count
 
     def best_time(self):
         """Retorna el mejor registro de tiempo"""
@@ -59,7 +71,7 @@ class Equipo(models.Model):
 
     def formatted_total_time(self):
         """Retorna el tiempo total formateado"""
-        total_ms = self.total_time()
+        total_ms = self.total_time
         ms = total_ms % 1000
         total_seconds = total_ms // 1000
         s = total_seconds % 60
@@ -68,10 +80,6 @@ class Equipo(models.Model):
         h = total_minutes // 60
         return f"{h}h {m}m {s}s {ms}ms"
 
-    def records_count(self):
-        """Retorna el número de registros"""
-        return self.times.count()
-
 
 class ResultadoEquipo(Equipo):
     class Meta:
@@ -0,0 +1,38 @@
+from django.db import models
+
+
+class ResumenEquipo(models.Model):
+    """
+    Resultados materializados de un equipo (una fila por equipo).
+    Los recalcula en segundo plano el worker de resultados tras cada lote de registros.
+    El tiempo total y el número de registros no se repiten aquí: son los
+    contadores de Equipo (records_count, total_time).
+    """
+    team = models.OneToOneField(
+        'Equipo',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary',
+        verbose_name='Equipo',
+    )
+
+    best_time = models.BigIntegerField(null=True, blank=True, help_text="Mejor tiempo (> 0) en milisegundos", verbose_name="Mejor tiempo")
+    average_time = models.BigIntegerField(default=0, help_text="Tiempo promedio en milisegundos", verbose_name="Tiempo promedio")
+    absent_count = models.PositiveIntegerField(default=0, verbose_name="Jugadores ausentes")
+
+    position = models.PositiveIntegerField(null=True, blank=True, verbose_name="Posición general")
+    category_position = models.PositiveIntegerField(null=True, blank=True, verbose_name="Posición en categoría")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Actualizado")
+
+    class Meta:
+        verbose_name = "Resumen de Equipo"
+        verbose_name_plural = "Resúmenes de Equipos"
+
+    def __str__(self):
+        return f"Resumen equipo {self.team_id} - posición {self.position or '-'}"
+
+    @property
+    def disqualified(self):
+        """Un jugador ausente (tiempo 0) descalifica al equipo"""
+        return self.absent_count > 0
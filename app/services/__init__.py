@@ -6,9 +6,17 @@ Contiene la lógica de negocio de la aplicación organizada en servicios.
 from .registro_service import RegistroService
 from .competencia_service import CompetenciaService
 from .results_service import ResultsService
+from .leaderboard_service import LeaderboardService
+from .resumen_service import ResumenService
+from .difusion_service import DifusionService
+from .cola_registros_service import ColaRegistrosService
 
 __all__ = [
     'RegistroService',
     'CompetenciaService',
     'ResultsService',
+    'LeaderboardService',
+    'ResumenService',
+    'DifusionService',
+    'ColaRegistrosService',
 ]
@@ -0,0 +1,349 @@
+"""
+Módulo: cola_registros_service
+Cola de escritura diferida (Redis Stream) para los envíos de registros de
+tiempo con REGISTRO_MODO='cola'.
+
+Características:
+- La vista valida los registros y el equipo con la caché compartida de
+  jueces (app.auth.juez_cache), añade el envío al stream y responde 202
+  con un id de seguimiento
+- El worker (python manage.py procesar_registros) lee el stream con un grupo
+  de consumidores y guarda cada tanda con RegistroService.registrar_equipos:
+  una transacción, un bloqueo y un INSERT para los envíos de todos los jueces
+- Un mensaje solo se confirma (XACK) después del commit; si el worker cae o
+  la base de datos falla, el mensaje queda pendiente y otro worker lo reclama
+  (XAUTOCLAIM). Los id_registro se fijan al encolar, así que repetir un
+  envío nunca duplica tiempos
+- Un mensaje que sigue fallando tras COLA_REGISTROS_MAX_INTENTOS entregas, o
+  que no se puede leer, se confirma con estado 'fallido' en vez de
+  reintentarse para siempre
+- Los mensajes se borran del stream al confirmarse (sin MAXLEN, que podría
+  descartar envíos aún no guardados)
+- Estado de cada envío en Redis (pendiente/confirmado/fallido) durante
+  COLA_REGISTROS_TTL segundos, consultable por el juez
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+STREAM = 'server5k:registros'
+GRUPO = 'registradores'
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_CONFIRMADO = 'confirmado'
+ESTADO_FALLIDO = 'fallido'
+
+_cliente = None
+_cliente_async: Optional[Tuple[Any, Any]] = None
+
+
+def _url() -> str:
+    return getattr(settings, 'COLA_REGISTROS_URL', 'redis://127.0.0.1:6379/2')
+
+
+def _clave_estado(seguimiento: str) -> str:
+    return f'registros:envio:{seguimiento}'
+
+
+class ColaRegistrosService:
+    """
+    Servicio de la cola de registros: encolar desde la vista, consultar el
+    estado de un envío y vaciar el stream en la base de datos desde el worker.
+    """
+
+    def _redis(self):
+        global _cliente
+        if _cliente is None:
+            import redis
+            _cliente = redis.Redis.from_url(_url())
+        return _cliente
+
+    def _redis_async(self):
+        # El cliente asíncrono queda ligado al bucle de eventos que lo usa
+        global _cliente_async
+        bucle = asyncio.get_running_loop()
+        if _cliente_async is None or _cliente_async[0] is not bucle:
+            import redis.asyncio
+            _cliente_async = (bucle, redis.asyncio.Redis.from_url(_url()))
+        return _cliente_async[1]
+
+    def _ttl(self) -> int:
+        return getattr(settings, 'COLA_REGISTROS_TTL', 86400)
+
+    async def encolar(self, juez, equipo_id: int, registros: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Añade un envío al stream y registra su estado 'pendiente'.
+
+        Los registros sin id_registro reciben uno aquí: el worker puede
+        procesar el mensaje más de una vez sin duplicar tiempos.
+
+        Returns:
+            Dict con 'seguimiento' y 'estado'
+        """
+        registros = [
+            {**registro, 'id_registro': registro.get('id_registro') or str(uuid.uuid4())}
+            if isinstance(registro, dict) else registro
+            for registro in registros
+        ]
+        seguimiento = uuid.uuid4().hex
+        estado = {'estado': ESTADO_PENDIENTE, 'juez_id': juez.id, 'equipo_id': equipo_id}
+
+        cliente = self._redis_async()
+        async with cliente.pipeline(transaction=True) as pipe:
+            pipe.set(_clave_estado(seguimiento), json.dumps(estado), ex=self._ttl())
+            pipe.xadd(
+                STREAM,
+                {
+                    'seguimiento': seguimiento,
+                    'juez_id': juez.id,
+                    'equipo_id': equipo_id,
+                    'registros': json.dumps(registros),
+                },
+            )
+            await pipe.execute()
+        return {'seguimiento': seguimiento, 'estado': ESTADO_PENDIENTE}
+
+    def estado(self, seguimiento: str, juez_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Estado de un envío del juez.
+
+        Returns:
+            Dict con 'estado' (y 'resultado' del servicio de registro si ya
+            se confirmó), o None si no existe, caducó o es de otro juez
+        """
+        valor = self._redis().get(_clave_estado(seguimiento))
+        if valor is None:
+            return None
+        estado = json.loads(valor)
+        if estado['juez_id'] != juez_id:
+            return None
+        return estado
+
+    def crear_grupo(self) -> None:
+        """Crea el stream y el grupo de consumidores si no existen."""
+        import redis
+        try:
+            self._redis().xgroup_create(STREAM, GRUPO, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def procesar(self, consumidor: str, bloque: int = 200, espera_ms: int = 1000) -> Dict[str, int]:
+        """
+        Una vuelta del worker: reclama los mensajes abandonados por otros
+        consumidores, lee los nuevos y los guarda en la base de datos.
+
+        Args:
+            consumidor: Nombre de este worker dentro del grupo
+            bloque: Máximo de mensajes por vuelta
+            espera_ms: Espera bloqueante de XREADGROUP si no hay mensajes
+
+        Returns:
+            Dict con 'confirmados' y 'pendientes' (no guardados, se reintentarán)
+        """
+        cliente = self._redis()
+        reintento_ms = getattr(settings, 'COLA_REGISTROS_REINTENTO_MS', 30000)
+        reclamados = cliente.xautoclaim(STREAM, GRUPO, consumidor, reintento_ms, '0-0', count=bloque)[1]
+        mensajes = [mensaje for mensaje in reclamados if mensaje[1]]
+
+        if len(mensajes) < bloque:
+            leidos = cliente.xreadgroup(
+                GRUPO, consumidor, {STREAM: '>'},
+                count=bloque - len(mensajes),
+                block=None if mensajes else espera_ms,
+            )
+            for _, entradas in leidos or []:
+                mensajes.extend(entradas)
+
+        if not mensajes:
+            return {'confirmados': 0, 'pendientes': 0}
+        return self.guardar(mensajes, reclamados=bool(reclamados))
+
+    def guardar(self, mensajes: List[Tuple[Any, Dict[bytes, bytes]]], reclamados: bool = False) -> Dict[str, int]:
+        """
+        Guarda una tanda de mensajes del stream y confirma los que quedaron
+        resueltos (guardados, rechazados por las reglas del registro o
+        fallidos: ilegibles o sin guardar tras COLA_REGISTROS_MAX_INTENTOS
+        entregas).
+
+        Los envíos se agrupan en rondas en las que cada equipo aparece una
+        sola vez, y cada ronda es una llamada a ``registrar_equipos``.
+        """
+        from app.models import Juez
+        from app.services.registro_service import RegistroService
+
+        cliente = self._redis()
+        envios = []
+        resueltos = []
+        for id_mensaje, campos in mensajes:
+            envio = self._leer_mensaje(id_mensaje, campos)
+            if 'error' in envio:
+                logger.error("[COLA] Mensaje %s ilegible: %s", id_mensaje, envio['error'])
+                resueltos.append(envio)
+            else:
+                envios.append(envio)
+
+        if reclamados:
+            # Un mensaje reclamado pudo guardarse justo antes de caer su worker
+            ya_guardados = self._ya_guardados(envios)
+            for envio in envios:
+                if envio['seguimiento'] in ya_guardados:
+                    envio['resultado'] = ya_guardados[envio['seguimiento']]
+                    resueltos.append(envio)
+            envios = [envio for envio in envios if envio['seguimiento'] not in ya_guardados]
+
+        # filter() y no in_bulk(): in_bulk lee features.max_query_params antes de
+        # la primera consulta y en SQLite falla con la conexión aún sin abrir
+        jueces = {juez.id: juez for juez in Juez.objects.filter(id__in={envio['juez_id'] for envio in envios})}
+        servicio = RegistroService()
+        max_intentos = getattr(settings, 'COLA_REGISTROS_MAX_INTENTOS', 5)
+        pendientes = 0
+        for ronda in self._rondas(envios):
+            validos = []
+            for envio in ronda:
+                juez = jueces.get(envio['juez_id'])
+                if juez is None:
+                    envio['resultado'] = servicio._rechazar_batch(
+                        envio['registros'], 'equipo_ajeno', 'El juez del envío ya no existe'
+                    )
+                    resueltos.append(envio)
+                else:
+                    validos.append({**envio, 'juez': juez})
+            if not validos:
+                continue
+
+            resultados = servicio.registrar_equipos(None, validos)
+            for envio, resultado in zip(validos, resultados):
+                if resultado.get('rechazo') == 'error':
+                    error = resultado['registros_fallidos'][0]['error']
+                    if self._entregas(envio['id_mensaje']) >= max_intentos:
+                        # No se reintenta más: se confirma con el error
+                        logger.error("[COLA] Envío %s descartado tras %s intentos: %s",
+                                     envio['seguimiento'], max_intentos, error)
+                        envio['error'] = error
+                        resueltos.append(envio)
+                        continue
+                    # Falló la base de datos: el mensaje sigue pendiente
+                    pendientes += 1
+                    logger.error("[COLA] No se pudo guardar el envío %s: %s", envio['seguimiento'], error)
+                    continue
+                envio['resultado'] = resultado
+                resueltos.append(envio)
+
+        if resueltos:
+            with cliente.pipeline(transaction=True) as pipe:
+                for envio in resueltos:
+                    if envio.get('seguimiento') is None or envio.get('juez_id') is None:
+                        continue
+                    estado = {'juez_id': envio['juez_id'], 'equipo_id': envio.get('equipo_id')}
+                    if 'error' in envio:
+                        estado.update(estado=ESTADO_FALLIDO, error=envio['error'])
+                    else:
+                        estado.update(estado=ESTADO_CONFIRMADO, resultado=envio['resultado'])
+                    pipe.set(_clave_estado(envio['seguimiento']), json.dumps(estado), ex=self._ttl())
+                ids = [envio['id_mensaje'] for envio in resueltos]
+                pipe.xack(STREAM, GRUPO, *ids)
+                pipe.xdel(STREAM, *ids)
+                pipe.execute()
+
+        logger.info("[COLA] Tanda procesada: confirmados=%s pendientes=%s", len(resueltos), pendientes)
+        return {'confirmados': len(resueltos), 'pendientes': pendientes}
+
+    def _leer_mensaje(self, id_mensaje, campos: Dict[bytes, bytes]) -> Dict[str, Any]:
+        """
+        Decodifica un mensaje del stream. Si no se puede leer, el envío
+        lleva 'error' con los campos que sí se pudieron leer, para poder
+        marcarlo como fallido.
+        """
+        envio: Dict[str, Any] = {'id_mensaje': id_mensaje}
+        try:
+            envio['seguimiento'] = campos[b'seguimiento'].decode()
+            envio['juez_id'] = int(campos[b'juez_id'])
+            envio['equipo_id'] = int(campos[b'equipo_id'])
+            registros = json.loads(campos[b'registros'])
+            if not isinstance(registros, list):
+                raise ValueError("'registros' no es una lista")
+            envio['registros'] = registros
+        except (KeyError, TypeError, ValueError, UnicodeDecodeError) as e:
+            envio['error'] = f'Mensaje ilegible: {e!r}'
+        return envio
+
+    def _entregas(self, id_mensaje) -> int:
+        """Veces que el grupo ha entregado el mensaje (incluida la actual)."""
+        pendiente = self._redis().xpending_range(STREAM, GRUPO, min=id_mensaje, max=id_mensaje, count=1)
+        return pendiente[0]['times_delivered'] if pendiente else 0
+
+    def _ya_guardados(self, envios: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Envíos cuyos registros ya están todos en la base de datos, con el
+        resultado que habría dado el registro (todos duplicados).
+        """
+        from app.models import RegistroTiempo
+
+        ids = set()
+        for envio in envios:
+            for registro in envio['registros']:
+                try:
+                    ids.add(uuid.UUID(str(registro.get('id_registro'))))
+                except (AttributeError, ValueError):
+                    pass
+        if not ids:
+            return {}
+        existentes = {
+            fila[0]: fila
+            for fila in RegistroTiempo.objects.filter(record_id__in=ids).values_list(
+                'record_id', 'team_id', 'time', 'team__name', 'team__number'
+            )
+        }
+
+        resultados = {}
+        for envio in envios:
+            filas = []
+            for registro in envio['registros']:
+                try:
+                    fila = existentes.get(uuid.UUID(str(registro.get('id_registro'))))
+                except (AttributeError, ValueError):
+                    fila = None
+                if fila is None or fila[1] != envio['equipo_id']:
+                    break
+                filas.append(fila)
+            else:
+                if filas:
+                    resultados[envio['seguimiento']] = {
+                        'total_enviados': len(filas),
+                        'total_guardados': 0,
+                        'total_fallidos': 0,
+                        'registros_guardados': [
+                            {'indice': i, 'id_registro': str(fila[0]), 'tiempo': fila[2], 'duplicado': True}
+                            for i, fila in enumerate(filas)
+                        ],
+                        'registros_fallidos': [],
+                        'equipo_nombre': filas[0][3],
+                        'equipo_dorsal': filas[0][4],
+                    }
+        return resultados
+
+    def _rondas(self, envios: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        # La n-ésima aparición de un equipo va a la ronda n: los reenvíos del
+        # mismo equipo se validan después de guardar el primero
+        rondas: List[List[Dict[str, Any]]] = []
+        apariciones: Dict[int, int] = {}
+        for envio in envios:
+            numero = apariciones.get(envio['equipo_id'], 0)
+            apariciones[envio['equipo_id']] = numero + 1
+            if numero == len(rondas):
+                rondas.append([])
+            rondas[numero].append(envio)
+        return rondas
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Longitud del stream y mensajes entregados sin confirmar."""
+        cliente = self._redis()
+        pendientes = cliente.xpending(STREAM, GRUPO)
+        return {'en_stream': cliente.xlen(STREAM), 'sin_confirmar': pendientes['pending']}
@@ -4,24 +4,21 @@ Responsable de la gestión del estado de las competencias.
 
 Características:
 - Iniciar/detener competencias
-- Notificar cambios de estado a jueces conectados
+- Notificar cambios de estado a jueces y espectadores conectados
 - Validar transiciones de estado
 """
 
 from django.utils import timezone
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from typing import Dict, Any
 
+from app.websocket.grupos import enviar_a_control, enviar_a_espectadores
+
 
 class CompetenciaService:
     """
     Servicio para gestionar el ciclo de vida de las competencias.
     """
     
-    def __init__(self):
-        self.channel_layer = get_channel_layer()
-    
     def iniciar_competencia(self, competencia_id: int) -> Dict[str, Any]:
         """
         Inicia una competencia y notifica a todos los jueces conectados.
@@ -161,25 +158,19 @@ class CompetenciaService:
             competencia_nombre: Nombre de la competencia
             en_curso: Estado de la competencia
         """
-        if not self.channel_layer:
-            return
-        
-        group_name = f'competencia_{competencia_id}'
-        
-        async_to_sync(self.channel_layer.group_send)(
-            group_name,
-            {
-                'type': tipo,
-                'data': {
-                    'mensaje': mensaje,
-                    'competencia_id': competencia_id,
-                    'competencia_nombre': competencia_nombre,
-                    'en_curso': en_curso,
-                    'started_at': started_at,
-                    'finished_at': finished_at,
-                }
+        evento = {
+            'type': tipo,
+            'data': {
+                'mensaje': mensaje,
+                'competencia_id': competencia_id,
+                'competencia_nombre': competencia_nombre,
+                'en_curso': en_curso,
+                'started_at': started_at,
+                'finished_at': finished_at,
             }
-        )
+        }
+        enviar_a_espectadores(competencia_id, evento)
+        enviar_a_control(competencia_id, evento)
     
     def obtener_estado_competencia(self, competencia_id: int) -> Dict[str, Any]:
         """
@@ -0,0 +1,155 @@
+"""
+Módulo: difusion_service
+Difusión coalescida de las actualizaciones de resultados por WebSocket.
+
+Características:
+- Agrupa por competencia los equipos con registros nuevos durante una ventana corta
+- Por ventana, un mensaje a los espectadores con los deltas de clasificación
+  (Redis pub/sub) y a cada juez uno con solo sus equipos
+- Se ejecuta en un hilo aparte: la respuesta HTTP no espera a Redis
+- Los vaciados se serializan para que los deltas salgan en orden de secuencia
+"""
+
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+
+from django.conf import settings
+from django.db import connections
+
+from app.websocket.grupos import enviar_a_espectadores, enviar_a_jueces
+
+logger = logging.getLogger(__name__)
+
+
+class DifusionService:
+    """
+    Servicio para difundir en lote las actualizaciones de registros.
+
+    El estado (equipos pendientes y temporizadores) es del proceso y se comparte
+    entre instancias, igual que el channel layer.
+    """
+
+    VENTANA_MS_DEFAULT = 150
+
+    _lock = threading.Lock()
+    _lock_vaciado = threading.Lock()
+    _pendientes: Dict[int, Dict[int, Any]] = {}
+    _temporizadores: Dict[int, threading.Timer] = {}
+
+    def encolar(self, equipo) -> None:
+        """
+        Marca un equipo como actualizado. Debe llamarse después del commit.
+
+        El primer equipo de una competencia abre la ventana; los que llegan
+        antes de que se cierre viajan en el mismo mensaje.
+
+        Args:
+            equipo: Instancia del modelo Equipo
+        """
+        self.encolar_varios([equipo])
+
+    def encolar_varios(self, equipos: List[Any]) -> None:
+        """
+        Como ``encolar`` para varios equipos (por ejemplo, un envío de todos
+        los equipos de un juez): se toman todos en la misma ventana.
+
+        Args:
+            equipos: Instancias del modelo Equipo
+        """
+        nuevos = []
+        with self._lock:
+            for equipo in equipos:
+                competencia_id = equipo.competition_id
+                self._pendientes.setdefault(competencia_id, {})[equipo.id] = equipo
+                if competencia_id in self._temporizadores:
+                    continue
+                temporizador = threading.Timer(self._ventana(), self._vaciar_en_hilo, args=(competencia_id,))
+                temporizador.daemon = True
+                self._temporizadores[competencia_id] = temporizador
+                nuevos.append(temporizador)
+        for temporizador in nuevos:
+            temporizador.start()
+
+    def vaciar(self, competencia_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Actualiza la clasificación de los equipos pendientes y envía un
+        mensaje a los espectadores de la competencia y otro a cada juez con
+        equipos en la ventana.
+
+        Args:
+            competencia_id: ID de la competencia
+
+        Returns:
+            Los datos enviados, o None si no había equipos pendientes
+        """
+        from app.services.leaderboard_service import LeaderboardService
+        from app.services.resumen_service import ResumenService
+
+        with self._lock_vaciado:
+            with self._lock:
+                equipos = self._pendientes.pop(competencia_id, {})
+                self._temporizadores.pop(competencia_id, None)
+
+            if not equipos:
+                return None
+
+            leaderboard = LeaderboardService()
+            resumen_equipos: List[Dict[str, Any]] = []
+            deltas: List[Dict[str, Any]] = []
+
+            for equipo in equipos.values():
+                delta = leaderboard.actualizar_equipo(equipo)
+                fila = delta.get('equipo') if delta else None
+                resumen_equipos.append({
+                    'equipo_id': equipo.id,
+                    'equipo_nombre': equipo.name,
+                    'equipo_dorsal': equipo.number,
+                    'total_registros': fila['num_registros'] if fila else None,
+                    'tiempo_total': fila['tiempo_total_ms'] if fila else None,
+                })
+                if delta:
+                    deltas.append(delta)
+
+            data = {
+                'competencia_id': competencia_id,
+                'equipos': resumen_equipos,
+                'deltas': deltas,
+            }
+
+            ResumenService().solicitar_refresco(competencia_id)
+
+            enviar_a_espectadores(competencia_id, {
+                'type': 'registros_actualizados',
+                'data': data,
+            })
+
+            # Cada juez solo recibe sus equipos (sin los deltas, que no muestra)
+            por_juez: Dict[int, List[Dict[str, Any]]] = {}
+            for equipo, resumen in zip(equipos.values(), resumen_equipos):
+                if equipo.judge_id:
+                    por_juez.setdefault(equipo.judge_id, []).append(resumen)
+            enviar_a_jueces({
+                juez_id: {
+                    'type': 'registros_actualizados',
+                    'data': {'competencia_id': competencia_id, 'equipos': equipos_juez},
+                }
+                for juez_id, equipos_juez in por_juez.items()
+            })
+            logger.debug(
+                "Difusión enviada (competencia=%s, equipos=%s, jueces=%s)",
+                competencia_id, len(resumen_equipos), len(por_juez)
+            )
+            return data
+
+    def _vaciar_en_hilo(self, competencia_id: int) -> None:
+        try:
+            self.vaciar(competencia_id)
+        except Exception as e:
+            logger.error("Error difundiendo actualización (competencia=%s): %s", competencia_id, e, exc_info=True)
+        finally:
+            # El hilo del temporizador abre sus propias conexiones a la base de datos
+            connections.close_all()
+
+    def _ventana(self) -> float:
+        return getattr(settings, 'DIFUSION_VENTANA_MS', self.VENTANA_MS_DEFAULT) / 1000
@@ -0,0 +1,444 @@
+"""
+Módulo: leaderboard_service
+Responsable de mantener la clasificación en vivo de cada competencia.
+
+Características:
+- Clasificación por competencia guardada en la caché de Django
+- Actualización incremental al confirmar registros de un equipo
+- Orden precalculado por categoría (calificados y descalificados)
+- Deltas de posición con número de secuencia para los espectadores
+- Historial circular de los últimos deltas para reenviar lo perdido al reconectar
+- Reconstrucción desde la base de datos cuando la caché no existe
+- Totales y orden con la consulta y las reglas del ranking (ResultsService)
+"""
+
+import logging
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from django.core.cache import cache
+
+from app.utils.render_cache import incrementar_version
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderboardService:
+    """
+    Servicio para leer y actualizar la clasificación en vivo de una competencia.
+
+    La clasificación completa se guarda bajo una clave con generación
+    (``leaderboard:<competencia_id>:g<n>``). Invalidar consiste en incrementar
+    la generación, de modo que cualquier escritura concurrente sobre la
+    generación anterior queda huérfana y nunca se lee.
+    """
+
+    CACHE_TIMEOUT = 60 * 60
+    HISTORIAL_DELTAS = 128
+    LOCK_TIMEOUT = 5
+    LOCK_INTENTOS = 20
+    LOCK_ESPERA = 0.01
+
+    # ===== Lectura =====
+
+    def obtener_clasificacion(
+        self,
+        competencia_id: int,
+        categoria: str = ''
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Obtiene la clasificación de una competencia, opcionalmente filtrada por categoría.
+
+        Args:
+            competencia_id: ID de la competencia
+            categoria: Código de categoría ('' para todas)
+
+        Returns:
+            Tupla (equipos_calificados, equipos_descalificados) con filas ya ordenadas
+            y con 'posicion' asignada dentro de la categoría solicitada.
+        """
+        instantanea = self.obtener_instantanea(competencia_id, categoria)
+        return instantanea['calificados'], instantanea['descalificados']
+
+    def obtener_instantanea(self, competencia_id: int, categoria: str = '') -> Dict[str, Any]:
+        """
+        Obtiene la clasificación junto con el número de secuencia del último delta aplicado.
+
+        Los clientes usan 'seq' para aplicar solo los deltas posteriores y
+        detectar huecos en la secuencia.
+
+        Args:
+            competencia_id: ID de la competencia
+            categoria: Código de categoría ('' para todas)
+
+        Returns:
+            Dict con claves 'seq', 'calificados' y 'descalificados'
+        """
+        try:
+            clasificacion = self._obtener_o_reconstruir(competencia_id)
+        except Exception as e:
+            logger.warning("Caché de clasificación no disponible (competencia=%s): %s", competencia_id, e)
+            clasificacion = self._reconstruir(competencia_id, seq=0)
+
+        calificados, descalificados = self._filas_de_categoria(clasificacion, categoria)
+        return {
+            'seq': clasificacion['seq'],
+            'calificados': calificados,
+            'descalificados': descalificados,
+        }
+
+    def _obtener_o_reconstruir(self, competencia_id: int) -> Dict[str, Any]:
+        clave = self._clave(competencia_id)
+        clasificacion = cache.get(clave)
+        if clasificacion is None:
+            # La secuencia se lee antes de consultar: un delta posterior se
+            # reaplica sin efecto porque los deltas llevan valores absolutos.
+            seq = self._secuencia_actual(competencia_id)
+            clasificacion = self._reconstruir(competencia_id, seq=seq)
+            # add() no sobrescribe una versión más reciente escrita por una actualización
+            cache.add(clave, clasificacion, self.CACHE_TIMEOUT)
+        return clasificacion
+
+    def _filas_de_categoria(
+        self,
+        clasificacion: Dict[str, Any],
+        categoria: str
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        filas = clasificacion['filas']
+        orden = clasificacion['ordenes'].get(categoria or '', {'calificados': [], 'descalificados': []})
+
+        calificados = []
+        for posicion, equipo_id in enumerate(orden['calificados'], 1):
+            fila = dict(filas[equipo_id])
+            fila['posicion'] = posicion
+            calificados.append(fila)
+
+        descalificados = [dict(filas[equipo_id]) for equipo_id in orden['descalificados']]
+        return calificados, descalificados
+
+    # ===== Escritura =====
+
+    def actualizar_equipo(self, equipo) -> Optional[Dict[str, Any]]:
+        """
+        Recalcula la fila de un equipo y reordena la clasificación de su competencia.
+
+        Debe llamarse después del commit (``transaction.on_commit``). Solo consulta
+        los registros del equipo afectado; el resto de la clasificación no se toca.
+
+        Args:
+            equipo: Instancia del modelo Equipo
+
+        Returns:
+            Dict con el delta de la clasificación:
+            - seq: número de secuencia del delta
+            - resync: True si el cliente debe recargar la clasificación completa
+            - equipo_id / equipo: fila nueva del equipo modificado
+            - posiciones: posición del equipo por categoría ('' = todas; None si descalificado)
+            - desplazados: por categoría, equipos cuya posición cambió [{'id', 'posicion'}]
+            None si la caché no está disponible.
+        """
+        delta = self._actualizar_equipo(equipo)
+        # El HTML público cacheado de la competencia deja de ser válido
+        incrementar_version(equipo.competition_id)
+        return delta
+
+    def _actualizar_equipo(self, equipo) -> Optional[Dict[str, Any]]:
+        competencia_id = equipo.competition_id
+        try:
+            if not self._adquirir_lock(competencia_id):
+                logger.warning("Lock de clasificación ocupado; invalidando competencia=%s", competencia_id)
+                self.invalidar(competencia_id)
+                return self._delta_resync(competencia_id, equipo.id)
+
+            try:
+                clave = self._clave(competencia_id)
+                clasificacion = cache.get(clave)
+                if clasificacion is None:
+                    # Se reconstruye con los datos ya confirmados. set() reemplaza
+                    # cualquier reconstrucción concurrente hecha antes del commit.
+                    seq = self._siguiente_secuencia(competencia_id)
+                    clasificacion = self._reconstruir(competencia_id, seq=seq)
+                    cache.set(clave, clasificacion, self.CACHE_TIMEOUT)
+                    delta = self._delta_resync(competencia_id, equipo.id, seq=seq)
+                    delta['equipo'] = clasificacion['filas'].get(equipo.id)
+                    return delta
+
+                ordenes_previas = clasificacion['ordenes']
+                fila = self._calcular_filas(competencia_id, equipo_id=equipo.id).get(equipo.id)
+                if fila is None:
+                    clasificacion['filas'].pop(equipo.id, None)
+                else:
+                    clasificacion['filas'][equipo.id] = fila
+                clasificacion['ordenes'] = self._calcular_ordenes(clasificacion['filas'])
+                clasificacion['seq'] = self._siguiente_secuencia(competencia_id)
+
+                cache.set(clave, clasificacion, self.CACHE_TIMEOUT)
+                delta = self._calcular_delta(equipo.id, fila, ordenes_previas, clasificacion)
+                self._registrar_delta(competencia_id, delta)
+            finally:
+                self._liberar_lock(competencia_id)
+        except Exception as e:
+            logger.warning("No se pudo actualizar la clasificación (competencia=%s): %s", competencia_id, e)
+            return None
+
+        return delta
+
+    def invalidar(self, competencia_id: int) -> None:
+        """
+        Descarta la clasificación en caché de una competencia.
+
+        También avanza la secuencia para que los clientes detecten el hueco
+        con el siguiente delta y recarguen la clasificación.
+
+        Args:
+            competencia_id: ID de la competencia
+        """
+        clave_generacion = self._clave_generacion(competencia_id)
+        try:
+            cache.add(clave_generacion, 0, None)
+            cache.incr(clave_generacion)
+            self._siguiente_secuencia(competencia_id)
+        except Exception as e:
+            logger.warning("No se pudo invalidar la clasificación (competencia=%s): %s", competencia_id, e)
+        incrementar_version(competencia_id)
+
+    # ===== Deltas =====
+
+    def deltas_desde(self, competencia_id: int, seq: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Deltas posteriores a ``seq``, para un cliente que reconecta.
+
+        Solo se devuelven si el historial los tiene todos, sin huecos, hasta la
+        secuencia actual. Las reconstrucciones e invalidaciones no dejan delta
+        en el historial, así que también obligan a enviar la instantánea.
+
+        Args:
+            competencia_id: ID de la competencia
+            seq: Último número de secuencia que tiene el cliente
+
+        Returns:
+            Lista de deltas en orden (vacía si el cliente está al día), o None
+            si el cliente necesita la clasificación completa.
+        """
+        try:
+            actual = self._secuencia_actual(competencia_id)
+            if seq == actual:
+                return []
+            if seq > actual or actual - seq > self.HISTORIAL_DELTAS:
+                return None
+
+            esperadas = range(seq + 1, actual + 1)
+            claves = {numero: self._clave_delta(competencia_id, numero) for numero in esperadas}
+            guardados = cache.get_many(list(claves.values()))
+        except Exception as e:
+            logger.warning("Historial de deltas no disponible (competencia=%s): %s", competencia_id, e)
+            return None
+
+        deltas = []
+        for numero in esperadas:
+            delta = guardados.get(claves[numero])
+            # El hueco puede ser un delta aún no guardado o uno ya pisado por otro
+            if delta is None or delta['seq'] != numero:
+                return None
+            deltas.append(delta)
+        return deltas
+
+    def _registrar_delta(self, competencia_id: int, delta: Dict[str, Any]) -> None:
+        """Guarda el delta en su hueco del historial circular (se llama con el lock tomado)."""
+        cache.set(self._clave_delta(competencia_id, delta['seq']), delta, self.CACHE_TIMEOUT)
+
+    def _clave_delta(self, competencia_id: int, seq: int) -> str:
+        return f'leaderboard:{competencia_id}:delta:{seq % self.HISTORIAL_DELTAS}'
+
+    @staticmethod
+    def _calcular_delta(
+        equipo_id: int,
+        fila: Optional[Dict[str, Any]],
+        ordenes_previas: Dict[str, Dict[str, List[int]]],
+        clasificacion: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Compara el orden previo con el nuevo y devuelve solo lo que cambió.
+        Solo se revisan la vista general ('') y la categoría del equipo.
+        """
+        categorias = {''}
+        if fila is not None:
+            categorias.add(fila['category'])
+
+        posiciones = {}
+        desplazados = {}
+        for categoria in categorias:
+            previas = ordenes_previas.get(categoria, {}).get('calificados', [])
+            nuevas = clasificacion['ordenes'].get(categoria, {}).get('calificados', [])
+            posicion_previa = {eid: pos for pos, eid in enumerate(previas, 1)}
+
+            posiciones[categoria] = None
+            desplazados[categoria] = []
+            for posicion, eid in enumerate(nuevas, 1):
+                if eid == equipo_id:
+                    posiciones[categoria] = posicion
+                elif posicion_previa.get(eid) != posicion:
+                    desplazados[categoria].append({'id': eid, 'posicion': posicion})
+
+        return {
+            'seq': clasificacion['seq'],
+            'resync': False,
+            'equipo_id': equipo_id,
+            'equipo': fila,
+            'posiciones': posiciones,
+            'desplazados': desplazados,
+        }
+
+    def _delta_resync(self, competencia_id: int, equipo_id: int, seq: int = None) -> Dict[str, Any]:
+        """Delta que solo indica al cliente que debe recargar la clasificación."""
+        if seq is None:
+            seq = self._secuencia_actual(competencia_id)
+        return {
+            'seq': seq,
+            'resync': True,
+            'equipo_id': equipo_id,
+            'equipo': None,
+            'posiciones': {},
+            'desplazados': {},
+        }
+
+    # ===== Cálculo =====
+
+    def calcular_clasificacion(self, competencia_id: int) -> Dict[str, Any]:
+        """
+        Calcula la clasificación desde la base de datos sin leer ni escribir la caché.
+
+        Returns:
+            Dict con 'filas' (por id de equipo) y 'ordenes' (por categoría)
+        """
+        return self._reconstruir(competencia_id, seq=0)
+
+    def _reconstruir(self, competencia_id: int, seq: int) -> Dict[str, Any]:
+        """
+        Calcula la clasificación completa de una competencia desde la base de datos.
+
+        Una sola consulta agregada: una fila por equipo con registros.
+        """
+        filas = self._calcular_filas(competencia_id)
+        return {
+            'seq': seq,
+            'filas': filas,
+            'ordenes': self._calcular_ordenes(filas),
+        }
+
+    def _calcular_filas(self, competencia_id: int, equipo_id: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Filas de clasificación con la consulta del ranking
+        (``ResultsService.consultar_totales``): los mismos registros
+        considerados y los mismos totales que el ranking REST.
+
+        Returns:
+            Dict {equipo_id: fila}; los equipos sin registros no aparecen
+        """
+        from app.services.results_service import ResultsService
+
+        return {
+            totales['team_id']: self._construir_fila(totales)
+            for totales in ResultsService().consultar_totales(competencia_id, equipo_id=equipo_id)
+        }
+
+    @staticmethod
+    def _construir_fila(totales: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Construye la fila de clasificación de un equipo a partir de su fila
+        agregada del ranking.
+
+        Args:
+            totales: Fila de ``ResultsService.consultar_totales``
+
+        Returns:
+            Dict con los datos que usa la plantilla de resultados
+        """
+        from app.models.equipo import CATEGORIA_CHOICES
+
+        num_registros = totales['total_registros']
+        # Jugadores ausentes (tiempo = 0 ms) descalifican al equipo
+        jugadores_ausentes = totales['total_ausentes'] or 0
+        tiempo_total_ms = totales['tiempo_total'] or 0
+        mejor_tiempo_ms = totales['mejor_tiempo'] or 0
+        categoria = totales['team__category']
+
+        return {
+            'id': totales['team_id'],
+            'pk': totales['team_id'],
+            'name': totales['team__name'],
+            'number': totales['team__number'],
+            'category': categoria,
+            'get_category_display': dict(CATEGORIA_CHOICES).get(categoria, categoria),
+            'jugadores_ausentes': jugadores_ausentes,
+            'descalificado': jugadores_ausentes > 0,
+            'tiempo_total_ms': tiempo_total_ms,
+            'mejor_tiempo_ms': mejor_tiempo_ms,
+            'tiempo_total_formateado': LeaderboardService._formatear_hms(tiempo_total_ms),
+            'mejor_tiempo_formateado': LeaderboardService._formatear_hms(mejor_tiempo_ms),
+            'num_registros': num_registros,
+            'jugadores_completados': num_registros - jugadores_ausentes,
+        }
+
+    @staticmethod
+    def _calcular_ordenes(filas: Dict[int, Dict[str, Any]]) -> Dict[str, Dict[str, List[int]]]:
+        """
+        Precalcula el orden de calificados y descalificados para todas las
+        categorías y para la vista sin filtro ('').
+        """
+        from app.services.results_service import ResultsService
+
+        calificados, descalificados = ResultsService.ordenar_equipos(filas.values(), 'tiempo_total_ms', 'number')
+
+        ordenes = {'': {
+            'calificados': [f['id'] for f in calificados],
+            'descalificados': [f['id'] for f in descalificados],
+        }}
+        for categoria in {f['category'] for f in filas.values()}:
+            ordenes[categoria] = {
+                'calificados': [f['id'] for f in calificados if f['category'] == categoria],
+                'descalificados': [f['id'] for f in descalificados if f['category'] == categoria],
+            }
+        return ordenes
+
+    @staticmethod
+    def _formatear_hms(tiempo_ms: int) -> str:
+        """Formatea milisegundos como HH:MM:SS (sin milisegundos)."""
+        total_seconds = tiempo_ms // 1000
+        s = total_seconds % 60
+        total_minutes = total_seconds // 60
+        m = total_minutes % 60
+        h = total_minutes // 60
+        return f"{h:02d}:{m:02d}:{s:02d}"
+
+    # ===== Claves y lock =====
+
+    def _clave(self, competencia_id: int) -> str:
+        generacion = cache.get_or_set(self._clave_generacion(competencia_id), 0, None)
+        return f'leaderboard:{competencia_id}:g{generacion}'
+
+    @staticmethod
+    def _clave_generacion(competencia_id: int) -> str:
+        return f'leaderboard:{competencia_id}:generacion'
+
+    @staticmethod
+    def _secuencia_actual(competencia_id: int) -> int:
+        return cache.get_or_set(f'leaderboard:{competencia_id}:seq', 0, None)
+
+    @staticmethod
+    def _siguiente_secuencia(competencia_id: int) -> int:
+        clave_seq = f'leaderboard:{competencia_id}:seq'
+        cache.add(clave_seq, 0, None)
+        return cache.incr(clave_seq)
+
+    def _adquirir_lock(self, competencia_id: int) -> bool:
+        clave_lock = f'leaderboard:{competencia_id}:lock'
+        for _ in range(self.LOCK_INTENTOS):
+            if cache.add(clave_lock, 1, self.LOCK_TIMEOUT):
+                return True
+            time.sleep(self.LOCK_ESPERA)
+        return False
+
+    @staticmethod
+    def _liberar_lock(competencia_id: int) -> None:
+        cache.delete(f'leaderboard:{competencia_id}:lock')
@@ -1,15 +1,66 @@
-from django.db import transaction
-from channels.db import database_sync_to_async
-from typing import Dict, List, Any
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from app.utils.bd_async import pool_bd
+from typing import Dict, List, Any, Optional, Tuple
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
+MODO_HILO = 'hilo'
+MODO_NATIVO = 'nativo'
+# Validación con el contexto en caché y escritura diferida por la cola de Redis
+MODO_COLA = 'cola'
+
 
 class RegistroService:
     
     MAX_REGISTROS_POR_EQUIPO = 15
-    
-    @database_sync_to_async
-    def registrar_tiempo(
+
+    # Para avisar una sola vez por proceso de REGISTRO_MODO='nativo' sin PostgreSQL
+    _aviso_sin_postgresql = False
+
+    def modo_nativo(self) -> bool:
+        """
+        True si las versiones asíncronas deben usar el camino nativo
+        (REGISTRO_MODO='nativo' y base de datos PostgreSQL).
+        """
+        if getattr(settings, 'REGISTRO_MODO', MODO_HILO) != MODO_NATIVO:
+            return False
+        from app.utils.bd_async import pool_registro
+        if pool_registro.disponible():
+            return True
+        if not RegistroService._aviso_sin_postgresql:
+            RegistroService._aviso_sin_postgresql = True
+            logger.warning("REGISTRO_MODO='nativo' requiere PostgreSQL; se usa el camino por hilos")
+        return False
+
+    async def registrar_tiempo(
+        self,
+        juez,
+        equipo_id: int,
+        time: int,
+        hours: int = 0,
+        minutes: int = 0,
+        seconds: int = 0,
+        milliseconds: int = 0,
+        record_id: str = None
+    ) -> Dict[str, Any]:
+        """
+        Versión ASÍNCRONA del registro de un tiempo individual.
+        Usa el camino nativo o el pool de hilos de BD según REGISTRO_MODO.
+        """
+        argumentos = dict(
+            juez=juez, equipo_id=equipo_id, time=time, hours=hours, minutes=minutes,
+            seconds=seconds, milliseconds=milliseconds, record_id=record_id,
+        )
+        if self.modo_nativo():
+            return await self._registrar_tiempo_nativo(**argumentos)
+        return await pool_bd.ejecutar(self._registrar_tiempo_impl, **argumentos)
+
+    def _registrar_tiempo_impl(
         self,
         juez,
         equipo_id: int,
@@ -89,10 +140,8 @@ class RegistroService:
                             'duplicado': True
                         }
                 
-                # Contar registros actuales del equipo en esta competencia
-                num_registros = RegistroTiempo.objects.filter(team=equipo).count()
-                
-                if num_registros >= self.MAX_REGISTROS_POR_EQUIPO:
+                # Contador del equipo, exacto bajo el bloqueo
+                if equipo.records_count >= self.MAX_REGISTROS_POR_EQUIPO:
                     return {
                         'exito': False,
                         'error': f'El equipo ya completó sus {self.MAX_REGISTROS_POR_EQUIPO} registros. No se permiten registros adicionales.'
@@ -123,6 +172,9 @@ class RegistroService:
                         'duplicado': True
                     }
                 
+                self._sumar_contadores([registro])
+                self._publicar_clasificacion_al_confirmar(equipo)
+
                 return {
                     'exito': True,
                     'registro': creados[0],
@@ -147,17 +199,23 @@ class RegistroService:
         """
         return self._registrar_batch_impl(juez, equipo_id, registros)
     
-    @database_sync_to_async
-    def registrar_batch(
+    async def registrar_batch(
         self,
         juez,
         equipo_id: int,
         registros: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """
-        Versión ASÍNCRONA de registrar_batch para uso desde WebSocket.
+        Versión ASÍNCRONA de registrar_batch para uso desde WebSocket y desde
+        la vista asíncrona de registro.
+
+        Con REGISTRO_MODO='nativo' (y PostgreSQL) no ocupa el executor de
+        hilos: usa psycopg asíncrono con su propio pool. Si no, el camino
+        síncrono de siempre en el pool acotado de hilos de BD.
         """
-        return self._registrar_batch_impl(juez, equipo_id, registros)
+        if self.modo_nativo():
+            return await self._registrar_batch_nativo(juez, equipo_id, registros)
+        return await pool_bd.ejecutar(self._registrar_batch_impl, juez, equipo_id, registros)
     
     def _registrar_batch_impl(
         self,
@@ -168,6 +226,10 @@ class RegistroService:
         """
         Registra múltiples tiempos en batch de manera transaccional.
         
+        Una sola transacción con dos consultas: el bloqueo del equipo (que
+        también trae el estado de la competencia y el conteo de registros) y
+        el INSERT en bloque.
+        
         Args:
             juez: Instancia del modelo Juez
             equipo_id: ID del equipo
@@ -176,162 +238,840 @@ class RegistroService:
         Returns:
             Dict con resumen de registros guardados y fallidos
         """
-        from app.models import Equipo, RegistroTiempo, Juez
+        from app.models import RegistroTiempo
         
-        registros_guardados = []
-        registros_fallidos = []
+        # La autenticación ya cargó los equipos del juez: si no tiene, no se consulta la base de datos
+        if getattr(juez, 'equipo_ids', None) == []:
+            return self._rechazar_batch(registros, 'sin_equipos', 'El juez no tiene equipos asignados')
         
         try:
             with transaction.atomic():
-                # Refrescar el juez con sus equipos asignados
-                juez_actualizado = Juez.objects.prefetch_related('teams', 'teams__competition').get(id=juez.id)
-                
-                # Verificar que el juez tenga equipos asignados
-                equipos = juez_actualizado.teams.all()
-                if not equipos:
-                    return {
-                        'total_enviados': len(registros),
-                        'total_guardados': 0,
-                        'total_fallidos': len(registros),
-                        'registros_guardados': [],
-                        'registros_fallidos': [
-                            {'indice': i, 'error': 'El juez no tiene equipos asignados'}
-                            for i in range(len(registros))
-                        ]
-                    }
-                
-                # Obtener la competencia del primer equipo
-                competencia_juez = equipos.first().competition
-                
-                # Verificar que la competencia esté en curso
-                if not competencia_juez or not competencia_juez.is_running:
-                    return {
-                        'total_enviados': len(registros),
-                        'total_guardados': 0,
-                        'total_fallidos': len(registros),
-                        'registros_guardados': [],
-                        'registros_fallidos': [
-                            {'indice': i, 'error': 'La competencia no está en curso'}
-                            for i in range(len(registros))
-                        ]
-                    }
-                
-                # Verificar que el equipo existe y pertenece a este juez
-                try:
-                    equipo = Equipo.objects.select_for_update().get(id=equipo_id)
-                except Equipo.DoesNotExist:
-                    return {
-                        'total_enviados': len(registros),
-                        'total_guardados': 0,
-                        'total_fallidos': len(registros),
-                        'registros_guardados': [],
-                        'registros_fallidos': [
-                            {'indice': i, 'error': f'El equipo con ID {equipo_id} no existe'}
-                            for i in range(len(registros))
-                        ]
-                    }
-                
-                if equipo.judge_id != juez.id:
-                    return {
-                        'total_enviados': len(registros),
-                        'total_guardados': 0,
-                        'total_fallidos': len(registros),
-                        'registros_guardados': [],
-                        'registros_fallidos': [
-                            {'indice': i, 'error': 'El equipo no pertenece al juez'}
-                            for i in range(len(registros))
-                        ]
-                    }
+                # Una sola consulta: bloquea el equipo y trae su competencia y sus registros actuales
+                equipo = self._bloquear_equipo(equipo_id)
                 
-                # Contar registros actuales
-                num_registros_actuales = RegistroTiempo.objects.filter(team=equipo).count()
-                
-                # Verificar si el equipo ya tiene registros (evitar envíos duplicados)
-                if num_registros_actuales > 0:
-                    return {
-                        'total_enviados': len(registros),
-                        'total_guardados': 0,
-                        'total_fallidos': len(registros),
-                        'registros_guardados': [],
-                        'registros_fallidos': [
-                            {'indice': i, 'error': f'El equipo ya tiene {num_registros_actuales} registros guardados. No se permiten envíos adicionales.'}
-                            for i in range(len(registros))
-                        ]
-                    }
+                rechazo = self._validar_envio(juez, equipo, equipo_id, registros)
+                if rechazo:
+                    return rechazo
                 
                 # Filtrar y normalizar datos válidos
-                registros_a_crear = []
-                mapping_idx_registro = []  # (indice_original, instancia_registro)
-                for idx, reg in enumerate(registros):
-                    time = reg.get('tiempo')
-                    if time is None:
-                        registros_fallidos.append({'indice': idx, 'error': 'Falta el campo tiempo'})
-                        continue
-                    if num_registros_actuales + len(registros_a_crear) >= self.MAX_REGISTROS_POR_EQUIPO:
-                        registros_fallidos.append({'indice': idx, 'error': f'Se alcanzó el límite de {self.MAX_REGISTROS_POR_EQUIPO} registros'})
+                mapping_idx_registro, registros_fallidos = self._preparar_registros(
+                    registros, equipo, equipo.records_count
+                )
+                registros_a_crear = [registro_obj for _, registro_obj in mapping_idx_registro]
+
+                creados_ids = set()
+                if registros_a_crear:
+                    # Crear en bloque con ignore_conflicts para idempotencia
+                    creados = RegistroTiempo.objects.bulk_create(
+                        registros_a_crear,
+                        ignore_conflicts=True,
+                    )
+                    if creados:
+                        self._sumar_contadores(registros_a_crear)
+                        self._publicar_clasificacion_al_confirmar(equipo)
+                    creados_ids = {r.record_id for r in creados}
+
+                return self._resultado_batch(registros, equipo, mapping_idx_registro, registros_fallidos, creados_ids)
+                
+        except Exception as e:
+            return self._error_batch(registros, e)
+
+    # ===== Sincronización por id_registro (envíos parciales) =====
+
+    def registrar_equipos(self, juez, envios: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Registra los lotes de varios equipos del juez en una sola transacción.
+
+        Cada envío se valida con las mismas reglas que ``registrar_batch``
+        (equipo del juez, competencia en curso, sin registros previos), pero
+        todos los equipos se bloquean en una consulta y todos los registros se
+        insertan con un único ``bulk_create``. Si ese INSERT falla, cada envío
+        se repite en su propio savepoint: el que falla recibe ``rechazo``
+        'error' y los demás se guardan. La clasificación se publica una sola
+        vez al confirmar, agrupada por competencia.
+
+        Args:
+            juez: Instancia del modelo Juez
+            envios: Lista de {'equipo_id': int, 'registros': [...]}. Un envío
+                puede traer su propio 'juez' (la cola de registros agrupa en
+                una transacción envíos de varios jueces)
+
+        Returns:
+            Lista con el resultado de cada envío (con su 'equipo_id'), en el
+            mismo orden
+        """
+        from app.models import RegistroTiempo
+
+        if getattr(juez, 'equipo_ids', None) == []:
+            return [
+                {'equipo_id': envio['equipo_id'],
+                 **self._rechazar_batch(envio['registros'], 'sin_equipos', 'El juez no tiene equipos asignados')}
+                for envio in envios
+            ]
+
+        try:
+            with transaction.atomic():
+                equipos = self._bloquear_equipos([envio['equipo_id'] for envio in envios])
+
+                vistos = set()
+                preparados = []
+                resultados = []
+                for envio in envios:
+                    equipo_id, registros = envio['equipo_id'], envio['registros']
+                    equipo = equipos.get(equipo_id)
+                    if equipo_id in vistos:
+                        resultado = self._rechazar_batch(
+                            registros, 'equipo_repetido', f'El equipo {equipo_id} aparece más de una vez en el envío'
+                        )
+                    else:
+                        resultado = self._validar_envio(envio.get('juez', juez), equipo, equipo_id, registros)
+                    vistos.add(equipo_id)
+                    if resultado is None:
+                        mapping_idx_registro, registros_fallidos = self._preparar_registros(
+                            registros, equipo, equipo.records_count
+                        )
+                        preparados.append((len(resultados), equipo, registros, mapping_idx_registro, registros_fallidos))
+                    resultados.append({'equipo_id': equipo_id, **(resultado or {})})
+
+                registros_a_crear = [
+                    registro_obj
+                    for _, _, _, mapping_idx_registro, _ in preparados
+                    for _, registro_obj in mapping_idx_registro
+                ]
+                creados_ids = set()
+                errores = {}
+                if registros_a_crear:
+                    try:
+                        with transaction.atomic():
+                            creados = RegistroTiempo.objects.bulk_create(registros_a_crear, ignore_conflicts=True)
+                            self._sumar_contadores(registros_a_crear)
+                        creados_ids = {r.record_id for r in creados}
+                    except Exception:
+                        # Un envío hizo fallar el INSERT común: cada envío se
+                        # repite en su propio savepoint y solo falla el suyo
+                        for posicion, _, _, mapping_idx_registro, _ in preparados:
+                            objetos = [registro_obj for _, registro_obj in mapping_idx_registro]
+                            if not objetos:
+                                continue
+                            try:
+                                with transaction.atomic():
+                                    creados = RegistroTiempo.objects.bulk_create(objetos, ignore_conflicts=True)
+                                    self._sumar_contadores(objetos)
+                                creados_ids.update(r.record_id for r in creados)
+                            except Exception as e:
+                                errores[posicion] = e
+
+                con_registros = []
+                for posicion, equipo, registros, mapping_idx_registro, registros_fallidos in preparados:
+                    if posicion in errores:
+                        resultados[posicion].update(self._error_batch(registros, errores[posicion]))
                         continue
-                    record_id = reg.get('id_registro') or uuid.uuid4()
-                    registro_obj = RegistroTiempo(
-                        record_id=record_id,
-                        team=equipo,
-                        time=time,
-                        hours=reg.get('horas', 0),
-                        minutes=reg.get('minutos', 0),
-                        seconds=reg.get('segundos', 0),
-                        milliseconds=reg.get('milisegundos', 0)
+                    resultado = self._resultado_batch(
+                        registros, equipo, mapping_idx_registro, registros_fallidos, creados_ids
                     )
-                    registros_a_crear.append(registro_obj)
-                    mapping_idx_registro.append((idx, registro_obj))
+                    if resultado['total_guardados']:
+                        con_registros.append(equipo)
+                    resultados[posicion].update(resultado)
 
-                if not registros_a_crear:
-                    return {
-                        'total_enviados': len(registros),
-                        'total_guardados': 0,
-                        'total_fallidos': len(registros_fallidos),
-                        'registros_guardados': registros_guardados,
-                        'registros_fallidos': registros_fallidos,
-                    }
+                if con_registros:
+                    transaction.on_commit(lambda: self._publicar_clasificaciones(con_registros))
+                return resultados
 
-                # Crear en bloque con ignore_conflicts para idempotencia
-                creados = RegistroTiempo.objects.bulk_create(
-                    registros_a_crear,
-                    ignore_conflicts=True,
+        except Exception as e:
+            return [
+                {'equipo_id': envio['equipo_id'], **self._error_batch(envio['registros'], e)}
+                for envio in envios
+            ]
+
+    def estado_sincronizacion(self, juez, equipo_id: int) -> Dict[str, Any]:
+        """
+        Ids de registro que el servidor ya tiene para un equipo del juez.
+
+        Returns:
+            Dict con 'ids_conocidos', 'total_registros', 'maximo_registros',
+            'completo' y los datos del equipo, o {'rechazo': codigo}
+        """
+        from app.models import RegistroTiempo
+
+        equipo, rechazo = self._equipo_para_sincronizar(juez, equipo_id)
+        if rechazo:
+            return {'rechazo': rechazo}
+        conocidos = set(RegistroTiempo.objects.filter(team_id=equipo.id).values_list('record_id', flat=True))
+        return self._resultado_sincronizacion(equipo, conocidos)
+
+    def sincronizar(
+        self,
+        juez,
+        equipo_id: int,
+        registros: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Guarda los registros que el servidor aún no tiene, identificados por
+        'id_registro', y devuelve el conjunto de ids conocidos.
+
+        Idempotente: reenviar registros ya guardados no escribe nada. Si el
+        envío no trae registros nuevos se responde con dos lecturas y sin
+        transacción; si los trae, la transacción bloquea el equipo, vuelve a
+        leer sus ids e inserta solo los que faltan (hasta el máximo por equipo).
+
+        Args:
+            juez: Instancia del modelo Juez
+            equipo_id: ID del equipo
+            registros: Lista de diccionarios con 'id_registro' y 'tiempo'
+
+        Returns:
+            Dict de ``estado_sincronizacion`` más 'guardados' (ids nuevos),
+            'ya_conocidos' y 'registros_fallidos' ({'indice', 'error'}),
+            o {'rechazo': codigo}
+        """
+        from app.models import RegistroTiempo
+
+        # La autenticación ya cargó los equipos del juez: si no tiene, no se consulta la base de datos
+        if getattr(juez, 'equipo_ids', None) == []:
+            return {'rechazo': 'sin_equipos'}
+
+        registros_fallidos = []
+        por_id = {}  # record_id -> (indice_original, registro); el primero gana
+        for idx, reg in enumerate(registros):
+            try:
+                record_id = uuid.UUID(str(reg['id_registro']))
+            except (KeyError, TypeError, ValueError):
+                registros_fallidos.append({'indice': idx, 'error': 'Falta el campo id_registro o no es un UUID'})
+                continue
+            por_id.setdefault(record_id, (idx, reg))
+
+        equipo, rechazo = self._equipo_para_sincronizar(juez, equipo_id)
+        if rechazo:
+            return {'rechazo': rechazo}
+
+        conocidos = set(RegistroTiempo.objects.filter(team_id=equipo.id).values_list('record_id', flat=True))
+        ya_conocidos = [record_id for record_id in por_id if record_id in conocidos]
+        if all(record_id in conocidos for record_id in por_id):
+            return self._resultado_sincronizacion(
+                equipo, conocidos, guardados=[], ya_conocidos=ya_conocidos, registros_fallidos=registros_fallidos
+            )
+
+        try:
+            with transaction.atomic():
+                equipo = self._bloquear_equipo(equipo_id)
+                if equipo is None:
+                    return {'rechazo': 'equipo_inexistente'}
+                if equipo.judge_id != juez.id:
+                    return {'rechazo': 'equipo_ajeno'}
+                if not equipo.competition.is_running:
+                    return {'rechazo': 'competencia_detenida'}
+
+                # Otro reintento pudo guardar algo entre la lectura y el bloqueo
+                conocidos = set(RegistroTiempo.objects.filter(team_id=equipo.id).values_list('record_id', flat=True))
+                ya_conocidos = [record_id for record_id in por_id if record_id in conocidos]
+                pendientes = [
+                    (idx, {**reg, 'id_registro': record_id})
+                    for record_id, (idx, reg) in por_id.items()
+                    if record_id not in conocidos
+                ]
+
+                mapping_idx_registro, fallidos_pendientes = self._preparar_registros(
+                    [reg for _, reg in pendientes], equipo, len(conocidos)
                 )
+                # Índices del envío original
+                registros_fallidos += [
+                    {**fallido, 'indice': pendientes[fallido['indice']][0]} for fallido in fallidos_pendientes
+                ]
+                candidatos = [(pendientes[i][0], registro_obj) for i, registro_obj in mapping_idx_registro]
 
-                # Mapear resultados: los no creados son duplicados
-                creados_ids = {r.record_id for r in creados}
-                for idx, registro_obj in mapping_idx_registro:
-                    if registro_obj.record_id in creados_ids:
-                        registros_guardados.append({
-                            'indice': idx,
-                            'id_registro': str(registro_obj.record_id),
-                            'tiempo': registro_obj.time,
-                            'duplicado': False,
-                        })
-                    else:
-                        registros_guardados.append({
-                            'indice': idx,
-                            'id_registro': str(registro_obj.record_id),
-                            'tiempo': registro_obj.time,
-                            'duplicado': True,
-                        })
+                guardados = []
+                if candidatos:
+                    RegistroTiempo.objects.bulk_create(
+                        [registro_obj for _, registro_obj in candidatos],
+                        ignore_conflicts=True,
+                    )
+                    conocidos = set(
+                        RegistroTiempo.objects.filter(team_id=equipo.id).values_list('record_id', flat=True)
+                    )
+                    for idx, registro_obj in candidatos:
+                        if registro_obj.record_id in conocidos:
+                            guardados.append(registro_obj.record_id)
+                        else:
+                            # El id ya existe en otro equipo
+                            registros_fallidos.append({'indice': idx, 'error': 'El id_registro ya pertenece a otro equipo'})
+                    if guardados:
+                        self._sumar_contadores([registro_obj for _, registro_obj in candidatos])
+                        self._publicar_clasificacion_al_confirmar(equipo)
 
-                return {
-                    'total_enviados': len(registros),
-                    'total_guardados': len(creados),
-                    'total_fallidos': len(registros_fallidos),
-                    'registros_guardados': registros_guardados,
-                    'registros_fallidos': registros_fallidos
-                }
-                
+        except Exception as e:
+            return {'rechazo': 'error', 'error': f'Error al sincronizar registros: {str(e)}'}
+
+        return self._resultado_sincronizacion(
+            equipo, conocidos, guardados=guardados, ya_conocidos=ya_conocidos,
+            registros_fallidos=sorted(registros_fallidos, key=lambda fallido: fallido['indice'])
+        )
+
+    def _equipo_para_sincronizar(self, juez, equipo_id: int):
+        """
+        Equipo del juez, sin bloqueo.
+
+        Returns:
+            Tupla (equipo, None) o (None, codigo_de_rechazo)
+        """
+        from app.models import Equipo
+
+        equipo = Equipo.objects.only('id', 'name', 'number', 'judge').filter(id=equipo_id).first()
+        if equipo is None:
+            return None, 'equipo_inexistente'
+        if equipo.judge_id != juez.id:
+            return None, 'equipo_ajeno'
+        return equipo, None
+
+    def _resultado_sincronizacion(
+        self, equipo, conocidos, guardados=None, ya_conocidos=None, registros_fallidos=None
+    ) -> Dict[str, Any]:
+        resultado = {
+            'equipo_id': equipo.id,
+            'equipo_nombre': equipo.name,
+            'equipo_dorsal': equipo.number,
+            'ids_conocidos': sorted(str(record_id) for record_id in conocidos),
+            'total_registros': len(conocidos),
+            'maximo_registros': self.MAX_REGISTROS_POR_EQUIPO,
+            'completo': len(conocidos) >= self.MAX_REGISTROS_POR_EQUIPO,
+        }
+        if guardados is not None:
+            resultado['guardados'] = [str(record_id) for record_id in guardados]
+            resultado['ya_conocidos'] = [str(record_id) for record_id in ya_conocidos]
+            resultado['registros_fallidos'] = registros_fallidos
+        return resultado
+
+    def _validar_envio(self, juez, equipo, equipo_id: int, registros: List[Dict[str, Any]]):
+        """
+        Comprueba un envío contra el equipo ya bloqueado.
+
+        Returns:
+            Resultado de ``_rechazar_batch`` o None si el envío es válido
+        """
+        if equipo is None:
+            return self._rechazar_batch(
+                registros, 'equipo_inexistente', f'El equipo con ID {equipo_id} no existe'
+            )
+
+        if equipo.judge_id != juez.id:
+            return self._rechazar_batch(registros, 'equipo_ajeno', 'El equipo no pertenece al juez')
+
+        # Verificar que la competencia del equipo esté en curso
+        if not equipo.competition.is_running:
+            return self._rechazar_batch(registros, 'competencia_detenida', 'La competencia no está en curso')
+
+        # Verificar si el equipo ya tiene registros (evitar envíos duplicados)
+        if equipo.records_count > 0:
+            return self._rechazar_batch(
+                registros,
+                'ya_registrado',
+                f'El equipo ya tiene {equipo.records_count} registros guardados. No se permiten envíos adicionales.',
+                equipo=equipo
+            )
+        return None
+
+    def _resultado_batch(
+        self,
+        registros: List[Dict[str, Any]],
+        equipo,
+        mapping_idx_registro: List[Tuple[int, Any]],
+        registros_fallidos: List[Dict[str, Any]],
+        creados_ids: set
+    ) -> Dict[str, Any]:
+        """Resumen de un envío guardado; los registros no creados son duplicados."""
+        registros_guardados = [
+            {
+                'indice': idx,
+                'id_registro': str(registro_obj.record_id),
+                'tiempo': registro_obj.time,
+                'duplicado': registro_obj.record_id not in creados_ids,
+            }
+            for idx, registro_obj in mapping_idx_registro
+        ]
+        return {
+            'total_enviados': len(registros),
+            'total_guardados': sum(1 for registro in registros_guardados if not registro['duplicado']),
+            'total_fallidos': len(registros_fallidos),
+            'registros_guardados': registros_guardados,
+            'registros_fallidos': registros_fallidos,
+            'equipo_nombre': equipo.name,
+            'equipo_dorsal': equipo.number,
+        }
+
+    def _error_batch(self, registros: List[Dict[str, Any]], error: Exception) -> Dict[str, Any]:
+        """
+        Resultado de un envío que falló por un error de la base de datos.
+        ``rechazo`` 'error' distingue el fallo (reintentable) de los rechazos.
+        """
+        return {
+            'rechazo': 'error',
+            'error': f'Error al guardar registros: {str(error)}',
+            'total_enviados': len(registros),
+            'total_guardados': 0,
+            'total_fallidos': len(registros),
+            'registros_guardados': [],
+            'registros_fallidos': [
+                {'indice': i, 'error': f'Error general: {str(error)}'}
+                for i in range(len(registros))
+            ]
+        }
+
+    # Campos opcionales de un registro: nombre en el envío -> máximo permitido
+    COMPONENTES_TIEMPO = {'horas': 2 ** 31 - 1, 'minutos': 59, 'segundos': 59, 'milisegundos': 999}
+
+    @classmethod
+    def validar_registro(cls, reg) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Valida y normaliza un registro del envío antes de construir su fila:
+        id_registro (opcional) debe ser un UUID, tiempo un entero de
+        milisegundos >= 0 y los componentes enteros en su rango. Así un valor
+        inválido se rechaza solo, sin hacer fallar el INSERT del lote.
+
+        Returns:
+            Tupla (registro normalizado o None, mensaje de error o None)
+        """
+        if not isinstance(reg, dict):
+            return None, 'El registro debe ser un objeto'
+
+        normalizado = dict(reg)
+        if reg.get('id_registro'):
+            try:
+                normalizado['id_registro'] = uuid.UUID(str(reg['id_registro']))
+            except ValueError:
+                return None, 'id_registro no es un UUID válido'
+
+        if reg.get('tiempo') is None:
+            return None, 'Falta el campo tiempo'
+        tiempo = cls._entero(reg['tiempo'])
+        if tiempo is None or not 0 <= tiempo < 2 ** 63:
+            return None, 'El tiempo debe ser un entero de milisegundos mayor o igual que 0'
+        normalizado['tiempo'] = tiempo
+
+        for campo, maximo in cls.COMPONENTES_TIEMPO.items():
+            if reg.get(campo) is None:
+                continue
+            valor = cls._entero(reg[campo])
+            if valor is None or not 0 <= valor <= maximo:
+                return None, f'{campo} debe ser un entero entre 0 y {maximo}'
+            normalizado[campo] = valor
+        return normalizado, None
+
+    @staticmethod
+    def _entero(valor):
+        # JSON no distingue 5 de 5.0; los booleanos no son tiempos
+        if isinstance(valor, bool):
+            return None
+        if isinstance(valor, int):
+            return valor
+        if isinstance(valor, float) and valor.is_integer():
+            return int(valor)
+        return None
+
+    def _preparar_registros(
+        self,
+        registros: List[Dict[str, Any]],
+        equipo,
+        num_registros_actuales: int
+    ) -> Tuple[List[Tuple[int, Any]], List[Dict[str, Any]]]:
+        """
+        Filtra y normaliza los registros recibidos (ver ``validar_registro``).
+
+        Returns:
+            Tupla ([(indice_original, RegistroTiempo sin guardar)], registros_fallidos)
+        """
+        from app.models import RegistroTiempo
+
+        mapping_idx_registro = []
+        registros_fallidos = []
+        for idx, reg in enumerate(registros):
+            reg, error = self.validar_registro(reg)
+            if error:
+                registros_fallidos.append({'indice': idx, 'error': error})
+                continue
+            if num_registros_actuales + len(mapping_idx_registro) >= self.MAX_REGISTROS_POR_EQUIPO:
+                registros_fallidos.append({'indice': idx, 'error': f'Se alcanzó el límite de {self.MAX_REGISTROS_POR_EQUIPO} registros'})
+                continue
+            registro_obj = RegistroTiempo(
+                record_id=reg.get('id_registro') or uuid.uuid4(),
+                team=equipo,
+                time=reg['tiempo'],
+                hours=reg.get('horas') or 0,
+                minutes=reg.get('minutos') or 0,
+                seconds=reg.get('segundos') or 0,
+                milliseconds=reg.get('milisegundos') or 0
+            )
+            mapping_idx_registro.append((idx, registro_obj))
+        return mapping_idx_registro, registros_fallidos
+
+    # ===== Camino nativo (psycopg asíncrono, solo PostgreSQL) =====
+
+    async def _registrar_batch_nativo(
+        self,
+        juez,
+        equipo_id: int,
+        registros: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Mismo contrato que ``_registrar_batch_impl`` sin pasar por el executor
+        de hilos: una transacción con el bloqueo del equipo y un INSERT en
+        bloque (ON CONFLICT DO NOTHING) que devuelve los ids insertados, así
+        los duplicados se distinguen de los nuevos. Validación y resultado son
+        los del camino ORM; solo cambia el SQL.
+        """
+        from app.utils.bd_async import pool_registro
+
+        if getattr(juez, 'equipo_ids', None) == []:
+            return self._rechazar_batch(registros, 'sin_equipos', 'El juez no tiene equipos asignados')
+
+        try:
+            async with pool_registro.conexion() as conexion:
+                async with conexion.transaction():
+                    async with conexion.cursor() as cursor:
+                        equipo = await self._bloquear_equipo_nativo(cursor, equipo_id)
+
+                        rechazo = self._validar_envio(juez, equipo, equipo_id, registros)
+                        if rechazo:
+                            return rechazo
+
+                        mapping_idx_registro, registros_fallidos = self._preparar_registros(
+                            registros, equipo, equipo.records_count
+                        )
+                        insertados = await self._insertar_nativo(
+                            cursor, [registro_obj for _, registro_obj in mapping_idx_registro]
+                        )
+        except Exception as e:
+            return self._error_batch(registros, e)
+
+        # Fuera del bloque de la transacción: ya se hizo commit
+        if insertados:
+            self._publicar_clasificacion(equipo)
+
+        return self._resultado_batch(registros, equipo, mapping_idx_registro, registros_fallidos, insertados)
+
+    async def _registrar_tiempo_nativo(
+        self,
+        juez,
+        equipo_id: int,
+        time: int,
+        hours: int = 0,
+        minutes: int = 0,
+        seconds: int = 0,
+        milliseconds: int = 0,
+        record_id: str = None
+    ) -> Dict[str, Any]:
+        """
+        Mismo contrato que ``_registrar_tiempo_impl`` sobre psycopg asíncrono.
+        La competencia que se comprueba es la del equipo bloqueado.
+        """
+        from app.models import RegistroTiempo
+        from app.utils.bd_async import pool_registro
+
+        if getattr(juez, 'equipo_ids', None) == []:
+            return {'exito': False, 'error': 'El juez no tiene equipos asignados'}
+
+        try:
+            async with pool_registro.conexion() as conexion:
+                async with conexion.transaction():
+                    async with conexion.cursor() as cursor:
+                        equipo = await self._bloquear_equipo_nativo(cursor, equipo_id)
+
+                        if equipo is None:
+                            return {'exito': False, 'error': f'El equipo con ID {equipo_id} no existe'}
+                        if equipo.judge_id != juez.id:
+                            return {
+                                'exito': False,
+                                'error': f'El equipo con ID {equipo_id} no pertenece a tu lista de equipos asignados'
+                            }
+                        if not equipo.competition.is_running:
+                            return {
+                                'exito': False,
+                                'error': 'No se pueden registrar tiempos. La competencia no ha iniciado o ya finalizó.'
+                            }
+
+                        registro = RegistroTiempo(
+                            record_id=record_id or uuid.uuid4(),
+                            team=equipo,
+                            time=time,
+                            hours=hours,
+                            minutes=minutes,
+                            seconds=seconds,
+                            milliseconds=milliseconds
+                        )
+                        existente = await self._leer_registro_nativo(cursor, registro.record_id, equipo)
+                        if existente is not None:
+                            return {'exito': True, 'registro': existente, 'duplicado': True}
+
+                        if equipo.records_count >= self.MAX_REGISTROS_POR_EQUIPO:
+                            return {
+                                'exito': False,
+                                'error': f'El equipo ya completó sus {self.MAX_REGISTROS_POR_EQUIPO} registros. No se permiten registros adicionales.'
+                            }
+
+                        insertados = await self._insertar_nativo(cursor, [registro])
+                        if not insertados:
+                            # Otro envío con el mismo id se adelantó
+                            existente = await self._leer_registro_nativo(cursor, registro.record_id, equipo)
+                            return {'exito': True, 'registro': existente, 'duplicado': True}
         except Exception as e:
             return {
-                'total_enviados': len(registros),
-                'total_guardados': 0,
-                'total_fallidos': len(registros),
-                'registros_guardados': [],
-                'registros_fallidos': [
-                    {'indice': i, 'error': f'Error general: {str(e)}'}
-                    for i in range(len(registros))
-                ]
+                'exito': False,
+                'error': f'Error al guardar registro: {str(e)}'
             }
+
+        self._publicar_clasificacion(equipo)
+        return {'exito': True, 'registro': registro, 'duplicado': False}
+
+    async def _bloquear_equipo_nativo(self, cursor, equipo_id: int):
+        """
+        Equivalente de ``_bloquear_equipo`` en SQL: bloquea el equipo y trae
+        el estado de su competencia (en ``equipo.competition``, como el
+        ``select_related`` del camino ORM).
+
+        Returns:
+            Equipo o None si no existe
+        """
+        from app.models import Competencia, Equipo
+        from app.utils.bd_async import pool_registro
+
+        qn = connections[pool_registro.alias].ops.quote_name
+        equipo_t = qn(Equipo._meta.db_table)
+        competencia_t = qn(Competencia._meta.db_table)
+        await cursor.execute(
+            f'SELECT e.{qn("id")}, e.{qn("name")}, e.{qn("number")}, e.{qn("category")}, '
+            f'e.{qn("judge_id")}, e.{qn("competition_id")}, c.{qn("is_running")}, e.{qn("records_count")} '
+            f'FROM {equipo_t} e JOIN {competencia_t} c ON c.{qn("id")} = e.{qn("competition_id")} '
+            f'WHERE e.{qn("id")} = %s FOR UPDATE OF e',
+            (equipo_id,)
+        )
+        fila = await cursor.fetchone()
+        if fila is None:
+            return None
+
+        competencia = Competencia(id=fila[5], is_running=fila[6])
+        equipo = Equipo(
+            id=fila[0], name=fila[1], number=fila[2], category=fila[3],
+            judge_id=fila[4], records_count=fila[7], competition=competencia,
+        )
+        # Instancias equivalentes a las leídas de la base de datos
+        for instancia in (competencia, equipo):
+            instancia._state.adding = False
+            instancia._state.db = pool_registro.alias
+        return equipo
+
+    async def _insertar_nativo(self, cursor, registros_a_crear) -> set:
+        """
+        INSERT en bloque que ignora los ids repetidos y suma lo insertado a
+        los contadores de cada equipo.
+
+        Los valores se preparan con los mismos campos del modelo que usa
+        ``bulk_create`` (un id_registro inválido falla igual que allí).
+
+        Returns:
+            Conjunto de record_id insertados
+        """
+        from app.models import Equipo, RegistroTiempo
+        from app.utils.bd_async import pool_registro
+
+        if not registros_a_crear:
+            return set()
+
+        conexion_django = connections[pool_registro.alias]
+        qn = conexion_django.ops.quote_name
+        campos = RegistroTiempo._meta.concrete_fields
+        columnas = ', '.join(qn(campo.column) for campo in campos)
+        marcadores = '(' + ', '.join(['%s'] * len(campos)) + ')'
+        valores = []
+        for registro_obj in registros_a_crear:
+            for campo in campos:
+                valores.append(campo.get_db_prep_save(getattr(registro_obj, campo.attname), conexion_django))
+            # Igual que bulk_create, el objeto queda con el id ya normalizado
+            registro_obj.record_id = RegistroTiempo._meta.pk.to_python(registro_obj.record_id)
+
+        await cursor.execute(
+            f'INSERT INTO {qn(RegistroTiempo._meta.db_table)} ({columnas}) '
+            f'VALUES {", ".join([marcadores] * len(registros_a_crear))} '
+            f'ON CONFLICT ({qn(RegistroTiempo._meta.pk.column)}) DO NOTHING '
+            f'RETURNING {qn(RegistroTiempo._meta.pk.column)}',
+            valores
+        )
+        insertados = {fila[0] for fila in await cursor.fetchall()}
+
+        # Contadores del equipo en la misma transacción, solo con lo insertado
+        por_equipo: Dict[int, List[int]] = {}
+        for registro_obj in registros_a_crear:
+            if registro_obj.record_id in insertados:
+                por_equipo.setdefault(registro_obj.team_id, []).append(int(registro_obj.time))
+        for equipo_id, tiempos in por_equipo.items():
+            await cursor.execute(
+                f'UPDATE {qn(Equipo._meta.db_table)} '
+                f'SET {qn("records_count")} = {qn("records_count")} + %s, {qn("total_time")} = {qn("total_time")} + %s '
+                f'WHERE {qn("id")} = %s',
+                (len(tiempos), sum(tiempos), equipo_id)
+            )
+        return insertados
+
+    async def _leer_registro_nativo(self, cursor, record_id, equipo):
+        """Registro existente con ese record_id, o None."""
+        from app.models import RegistroTiempo
+        from app.utils.bd_async import pool_registro
+
+        record_id = RegistroTiempo._meta.pk.to_python(record_id)
+        qn = connections[pool_registro.alias].ops.quote_name
+        campos = RegistroTiempo._meta.concrete_fields
+        await cursor.execute(
+            f'SELECT {", ".join(qn(campo.column) for campo in campos)} '
+            f'FROM {qn(RegistroTiempo._meta.db_table)} WHERE {qn(RegistroTiempo._meta.pk.column)} = %s',
+            (record_id,)
+        )
+        fila = await cursor.fetchone()
+        if fila is None:
+            return None
+        registro = RegistroTiempo(**{campo.attname: valor for campo, valor in zip(campos, fila)})
+        registro._state.adding = False
+        registro._state.db = pool_registro.alias
+        if registro.team_id == equipo.id:
+            registro.team = equipo
+        return registro
+
+    def _bloquear_equipo(self, equipo_id: int):
+        """
+        Bloquea el equipo (SELECT ... FOR UPDATE) y, en la misma consulta, trae
+        el estado de su competencia. Su contador ``records_count`` es exacto
+        mientras dura el bloqueo.
+
+        Returns:
+            Equipo o None si no existe
+        """
+        return self._bloquear_equipos([equipo_id]).get(equipo_id)
+
+    def _bloquear_equipos(self, equipo_ids: List[int]) -> Dict[int, Any]:
+        """
+        Igual que ``_bloquear_equipo`` para varios equipos en una sola consulta.
+        Los bloqueos se toman en orden de id para no cruzarse con otro envío.
+
+        Returns:
+            Dict {id: Equipo}; faltan los que no existen
+        """
+        from app.models import Equipo
+
+        equipos = (
+            Equipo.objects
+            .select_for_update(of=('self',))
+            .select_related('competition')
+            .only(
+                'id', 'name', 'number', 'category', 'judge', 'records_count',
+                'competition__id', 'competition__is_running',
+            )
+            .filter(id__in=equipo_ids)
+            .order_by('id')
+        )
+        return {equipo.id: equipo for equipo in equipos}
+
+    def _sumar_contadores(self, registros_creados) -> None:
+        """
+        Suma a ``records_count`` y ``total_time`` de sus equipos los registros
+        recién insertados, en la transacción del INSERT y en una sola sentencia.
+
+        Con ``ignore_conflicts`` no se sabe qué filas entraron: se cuentan las
+        del lote que quedaron en cada equipo (búsqueda por clave primaria).
+        Quien llama garantiza que ninguno de esos ids estaba ya en el equipo.
+        """
+        from app.models import Equipo, RegistroTiempo
+
+        if not registros_creados:
+            return
+        del_lote = RegistroTiempo.objects.filter(
+            team=OuterRef('pk'),
+            record_id__in=[registro_obj.record_id for registro_obj in registros_creados],
+        ).order_by().values('team')
+        Equipo.objects.filter(id__in={registro_obj.team_id for registro_obj in registros_creados}).update(
+            records_count=F('records_count') + Coalesce(
+                Subquery(del_lote.annotate(total=Count('pk')).values('total')), 0
+            ),
+            total_time=F('total_time') + Coalesce(
+                Subquery(del_lote.annotate(total=Sum('time')).values('total')), 0
+            ),
+        )
+
+    def recalcular_contadores(self, competencia_id: int = None, equipo_ids: List[int] = None) -> int:
+        """
+        Recalcula ``records_count`` y ``total_time`` a partir de los registros
+        (reparación tras cargas masivas o ediciones fuera del flujo normal).
+
+        Args:
+            competencia_id: Limitar a una competencia (default: todas)
+            equipo_ids: Limitar a esos equipos
+
+        Returns:
+            Número de equipos cuyos contadores estaban desfasados
+        """
+        from app.models import Equipo, RegistroTiempo
+
+        del_equipo = RegistroTiempo.objects.filter(team=OuterRef('pk')).order_by().values('team')
+        equipos = Equipo.objects.all()
+        if competencia_id is not None:
+            equipos = equipos.filter(competition_id=competencia_id)
+        if equipo_ids is not None:
+            equipos = equipos.filter(id__in=equipo_ids)
+        with transaction.atomic():
+            desfasados = equipos.annotate(
+                real_registros=Coalesce(Subquery(del_equipo.annotate(total=Count('pk')).values('total')), 0),
+                real_tiempo=Coalesce(Subquery(del_equipo.annotate(total=Sum('time')).values('total')), 0),
+            ).exclude(records_count=F('real_registros'), total_time=F('real_tiempo'))
+            ids = list(desfasados.values_list('id', flat=True))
+            if ids:
+                Equipo.objects.filter(id__in=ids).update(
+                    records_count=Coalesce(Subquery(del_equipo.annotate(total=Count('pk')).values('total')), 0),
+                    total_time=Coalesce(Subquery(del_equipo.annotate(total=Sum('time')).values('total')), 0),
+                )
+        return len(ids)
+
+    def _rechazar_batch(
+        self,
+        registros: List[Dict[str, Any]],
+        codigo: str,
+        error: str,
+        equipo=None
+    ) -> Dict[str, Any]:
+        """
+        Resultado de un lote rechazado completo. ``rechazo`` permite a la vista
+        elegir el código HTTP sin interpretar el mensaje.
+        """
+        resultado = {
+            'total_enviados': len(registros),
+            'total_guardados': 0,
+            'total_fallidos': len(registros),
+            'registros_guardados': [],
+            'registros_fallidos': [
+                {'indice': i, 'error': error}
+                for i in range(len(registros))
+            ],
+            'rechazo': codigo,
+        }
+        if equipo is not None:
+            resultado['equipo_nombre'] = equipo.name
+            resultado['equipo_dorsal'] = equipo.number
+        return resultado
+
+    def _publicar_clasificacion_al_confirmar(self, equipo) -> None:
+        """
+        Programa, para cuando la transacción actual haga commit, la difusión
+        coalescida: actualización de la clasificación en vivo, envío de los deltas
+        por WebSocket y refresco de los resultados materializados, fuera del
+        camino de la petición.
+        """
+        transaction.on_commit(lambda: self._publicar_clasificacion(equipo))
+
+    def _publicar_clasificacion(self, equipo) -> None:
+        """
+        Encola la difusión coalescida de inmediato. El camino nativo la llama
+        después de su propio commit.
+        """
+        from app.services.difusion_service import DifusionService
+
+        DifusionService().encolar(equipo)
+
+    def _publicar_clasificaciones(self, equipos) -> None:
+        """Encola de una vez la difusión de varios equipos (un temporizador por competencia)."""
+        from app.services.difusion_service import DifusionService
+
+        DifusionService().encolar_varios(equipos)
@@ -6,11 +6,15 @@ Características:
 - Ordenar registros por tiempo
 - Sumar los primeros 15 registros
 - Calcular promedios y mejores tiempos
+- Ranking de la competencia en una sola consulta (con filtros y paginación)
+- Consulta y reglas de orden compartidas con la clasificación en vivo
+  (LeaderboardService) y con los resúmenes materializados
 - Evitar recomputación innecesaria
 """
 
-from typing import Dict, List, Any
-from django.db.models import Sum, Avg, Count, Min
+from typing import Dict, List, Any, Optional, Tuple
+from django.db.models import Sum, Avg, Count, Min, Q, F, Window
+from django.db.models.functions import RowNumber
 
 
 class ResultsService:
@@ -37,9 +41,9 @@ class ResultsService:
             equipo = Equipo.objects.get(id=equipo_id)
             
             # Filtrar registros del equipo (equipo ya pertenece a una competencia)
-            registros = RegistroTiempo.objects.filter(
-                equipo=equipo
-            ).order_by('tiempo')[:self.MAX_REGISTROS_CONSIDERADOS]
+            registros = list(RegistroTiempo.objects.filter(
+                team=equipo
+            ).order_by('time')[:self.MAX_REGISTROS_CONSIDERADOS])
             
             if not registros:
                 return {
@@ -92,46 +96,68 @@ class ResultsService:
                 'error': f'Error al obtener resultados: {str(e)}'
             }
     
-    def obtener_ranking_competencia(self, competencia_id: int) -> Dict[str, Any]:
+    def obtener_ranking_competencia(
+        self,
+        competencia_id: int,
+        categoria: str = '',
+        pagina: int = 1,
+        tamano_pagina: Optional[int] = None
+    ) -> Dict[str, Any]:
         """
         Obtiene el ranking de equipos de una competencia.
-        
+
+        Los totales de todos los equipos se calculan en una sola consulta:
+        ``ROW_NUMBER() OVER (PARTITION BY team ORDER BY time)`` selecciona los
+        primeros MAX_REGISTROS_CONSIDERADOS registros de cada equipo y la consulta
+        externa los agrega por equipo.
+
+        Reglas (las mismas de la clasificación pública):
+        - Un equipo con algún registro en 0 ms (jugador ausente) queda descalificado
+        - Calificados ordenados por tiempo total ascendente, luego descalificados
+        - Equipos sin registros no aparecen
+
         Args:
             competencia_id: ID de la competencia
-            
+            categoria: Código de categoría para filtrar ('' para todas)
+            pagina: Número de página (desde 1)
+            tamano_pagina: Equipos por página (None para todos)
+
         Returns:
-            Dict con lista de equipos ordenados por mejor tiempo
+            Dict con la página solicitada del ranking y datos de paginación
         """
-        from app.models import Equipo, Competencia
-        
+        from app.models import Competencia
+
         try:
-            competencia = Competencia.objects.get(id=competencia_id)
-            
-            # Obtener equipos de esta competencia
-            equipos = Equipo.objects.filter(competencia_id=competencia_id)
-            
-            # Calcular resultados para cada equipo
-            resultados = []
-            for equipo in equipos:
-                resultado = self.obtener_resultados_equipo(equipo.id, competencia_id)
-                if resultado['exito']:
-                    resultados.append(resultado)
-            
-            # Ordenar por mejor tiempo (ascendente)
-            resultados.sort(key=lambda x: x['mejor_tiempo'] if x['mejor_tiempo'] is not None else float('inf'))
-            
-            # Asignar posiciones
-            for idx, resultado in enumerate(resultados, 1):
-                resultado['posicion'] = idx
-            
+            filas = self.consultar_totales(competencia_id, categoria)
+
+            if filas:
+                competencia_nombre = filas[0]['team__competition__name']
+            else:
+                competencia = Competencia.objects.get(id=competencia_id)
+                competencia_nombre = competencia.name
+
+            ranking = self._ordenar_ranking([self._fila_ranking(f) for f in filas])
+
+            total_equipos = len(ranking)
+            if tamano_pagina:
+                total_paginas = max(1, -(-total_equipos // tamano_pagina))
+                inicio = (pagina - 1) * tamano_pagina
+                ranking = ranking[inicio:inicio + tamano_pagina]
+            else:
+                total_paginas = 1
+
             return {
                 'exito': True,
                 'competencia_id': competencia_id,
-                'competencia_nombre': competencia.name,
-                'total_equipos': len(resultados),
-                'ranking': resultados_ordenados
+                'competencia_nombre': competencia_nombre,
+                'categoria': categoria or None,
+                'total_equipos': total_equipos,
+                'pagina': pagina,
+                'tamano_pagina': tamano_pagina,
+                'total_paginas': total_paginas,
+                'ranking': ranking
             }
-            
+
         except Competencia.DoesNotExist:
             return {
                 'exito': False,
@@ -142,6 +168,128 @@ class ResultsService:
                 'exito': False,
                 'error': f'Error al obtener ranking: {str(e)}'
             }
+
+    def consultar_totales(
+        self,
+        competencia_id: int,
+        categoria: str = '',
+        equipo_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Consulta única del ranking: una fila agregada por equipo con sus
+        primeros MAX_REGISTROS_CONSIDERADOS registros. Es la misma consulta que
+        usa la clasificación en vivo, completa o para un solo equipo.
+
+        Args:
+            competencia_id: ID de la competencia
+            categoria: Código de categoría para filtrar ('' para todas)
+            equipo_id: Limitar a un equipo (actualización incremental)
+
+        Returns:
+            Lista de dicts con team_id, team__name, team__number,
+            team__category, team__competition__name, tiempo_total,
+            tiempo_promedio, mejor_tiempo, total_ausentes y total_registros
+        """
+        from app.models import RegistroTiempo
+
+        registros = RegistroTiempo.objects.filter(team__competition_id=competencia_id)
+        if categoria:
+            registros = registros.filter(team__category=categoria)
+        if equipo_id is not None:
+            registros = registros.filter(team_id=equipo_id)
+
+        primeros = registros.annotate(
+            orden=Window(
+                RowNumber(),
+                partition_by=[F('team_id')],
+                order_by=[F('time').asc(), F('record_id').asc()],
+            )
+        ).filter(orden__lte=self.MAX_REGISTROS_CONSIDERADOS).values('pk')
+
+        return list(
+            RegistroTiempo.objects.filter(pk__in=primeros).values(
+                'team_id',
+                'team__name',
+                'team__number',
+                'team__category',
+                'team__competition__name',
+            ).annotate(
+                tiempo_total=Sum('time'),
+                tiempo_promedio=Avg('time'),
+                mejor_tiempo=Min('time', filter=Q(time__gt=0)),
+                total_ausentes=Count('time', filter=Q(time=0)),
+                total_registros=Count('time'),
+            ).order_by()
+        )
+
+    def _fila_ranking(self, fila: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convierte una fila agregada en la entrada pública del ranking.
+        """
+        from app.models.equipo import CATEGORIA_CHOICES
+
+        tiempo_total = fila['tiempo_total'] or 0
+        tiempo_promedio = int(fila['tiempo_promedio'] or 0)
+        mejor_tiempo = fila['mejor_tiempo']
+        jugadores_ausentes = fila['total_ausentes']
+
+        return {
+            'equipo_id': fila['team_id'],
+            'equipo_nombre': fila['team__name'],
+            'equipo_dorsal': fila['team__number'],
+            'categoria': fila['team__category'],
+            'categoria_nombre': dict(CATEGORIA_CHOICES).get(fila['team__category'], fila['team__category']),
+            'num_registros': fila['total_registros'],
+            'jugadores_ausentes': jugadores_ausentes,
+            'descalificado': jugadores_ausentes > 0,
+            'tiempo_total': tiempo_total,
+            'tiempo_promedio': tiempo_promedio,
+            'mejor_tiempo': mejor_tiempo,
+            'tiempo_total_formateado': self._formatear_tiempo(tiempo_total),
+            'tiempo_promedio_formateado': self._formatear_tiempo(tiempo_promedio),
+            'mejor_tiempo_formateado': self._formatear_tiempo(mejor_tiempo) if mejor_tiempo else None,
+        }
+
+    @staticmethod
+    def ordenar_equipos(filas, tiempo_total: str, dorsal: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Reglas de orden de la clasificación, únicas para el ranking REST, la
+        clasificación en vivo y los resúmenes: calificados por tiempo total
+        ascendente (un total de 0 va al final) y desempate por dorsal;
+        descalificados aparte, en el mismo orden.
+
+        Args:
+            filas: Filas con la clave 'descalificado'
+            tiempo_total: Clave del tiempo total en cada fila
+            dorsal: Clave del dorsal en cada fila
+
+        Returns:
+            Tupla (calificados, descalificados) ya ordenados
+        """
+        filas = list(filas)
+        calificados = sorted(
+            (f for f in filas if not f['descalificado']),
+            key=lambda f: (f[tiempo_total] if f[tiempo_total] > 0 else float('inf'), f[dorsal])
+        )
+        descalificados = sorted(
+            (f for f in filas if f['descalificado']),
+            key=lambda f: (f[tiempo_total], f[dorsal])
+        )
+        return calificados, descalificados
+
+    def _ordenar_ranking(self, resultados: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Ordena el ranking con ``ordenar_equipos`` y asigna 'posicion' solo a
+        los calificados.
+        """
+        calificados, descalificados = self.ordenar_equipos(resultados, 'tiempo_total', 'equipo_dorsal')
+
+        for idx, resultado in enumerate(calificados, 1):
+            resultado['posicion'] = idx
+        for resultado in descalificados:
+            resultado['posicion'] = None
+
+        return calificados + descalificados
     
     def _formatear_tiempo(self, tiempo_ms: int) -> str:
         """
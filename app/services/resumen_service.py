@@ -0,0 +1,137 @@
+"""
+Módulo: resumen_service
+Tabla materializada de resultados por equipo (ResumenEquipo).
+
+Características:
+- Una fila por equipo: mejor, promedio, ausentes y posiciones (el total y
+  los registros son los contadores de Equipo)
+- Refresco en segundo plano por un worker del channel layer (Redis)
+- Solicitudes coalescidas: como máximo un refresco pendiente por competencia
+- Mismas reglas de orden que la clasificación en vivo
+"""
+
+import logging
+from typing import Dict, Any
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Canal del worker: python manage.py runworker resultados-refresco
+CANAL_REFRESCO = 'resultados-refresco'
+
+
+class ResumenService:
+    """
+    Servicio para mantener la tabla materializada de resultados.
+    """
+
+    PENDIENTE_TIMEOUT = 60
+
+    def solicitar_refresco(self, competencia_id: int) -> bool:
+        """
+        Encola el refresco de los resúmenes de una competencia.
+
+        Si ya hay un refresco pendiente no se encola otro: el pendiente leerá
+        los registros más recientes cuando se ejecute.
+
+        Args:
+            competencia_id: ID de la competencia
+
+        Returns:
+            True si se encoló un mensaje nuevo
+        """
+        clave = self._clave_pendiente(competencia_id)
+        try:
+            if not cache.add(clave, 1, self.PENDIENTE_TIMEOUT):
+                return False
+        except Exception as e:
+            logger.warning("Caché no disponible para coalescer refresco (competencia=%s): %s", competencia_id, e)
+
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            logger.warning("Channel layer no disponible; no se puede refrescar resultados")
+            return False
+
+        try:
+            async_to_sync(channel_layer.send)(CANAL_REFRESCO, {
+                'type': 'resultados.refrescar',
+                'competencia_id': competencia_id,
+            })
+            return True
+        except Exception as e:
+            logger.error("Error encolando refresco de resultados (competencia=%s): %s", competencia_id, e)
+            self._liberar_pendiente(competencia_id)
+            return False
+
+    def refrescar_competencia(self, competencia_id: int) -> Dict[str, Any]:
+        """
+        Recalcula y guarda los resúmenes de todos los equipos de una competencia.
+
+        Se libera la marca de pendiente antes de leer, así un lote que haga
+        commit durante el cálculo encola un nuevo refresco.
+
+        Args:
+            competencia_id: ID de la competencia
+
+        Returns:
+            Dict con el número de equipos actualizados
+        """
+        from app.models import Equipo, ResumenEquipo
+        from app.services.leaderboard_service import LeaderboardService
+
+        self._liberar_pendiente(competencia_id)
+
+        clasificacion = LeaderboardService().calcular_clasificacion(competencia_id)
+        filas = clasificacion['filas']
+        ordenes = clasificacion['ordenes']
+
+        posiciones = {
+            equipo_id: idx
+            for idx, equipo_id in enumerate(ordenes['']['calificados'], 1)
+        }
+        posiciones_categoria = {}
+        for categoria, orden in ordenes.items():
+            if categoria:
+                for idx, equipo_id in enumerate(orden['calificados'], 1):
+                    posiciones_categoria[equipo_id] = idx
+
+        resumenes = []
+        equipo_ids = Equipo.objects.filter(competition_id=competencia_id).values_list('id', flat=True)
+        for equipo_id in equipo_ids:
+            fila = filas.get(equipo_id)
+            if fila is None:
+                resumenes.append(ResumenEquipo(team_id=equipo_id))
+                continue
+            resumenes.append(ResumenEquipo(
+                team_id=equipo_id,
+                best_time=fila['mejor_tiempo_ms'] or None,
+                average_time=fila['tiempo_total_ms'] // fila['num_registros'],
+                absent_count=fila['jugadores_ausentes'],
+                position=posiciones.get(equipo_id),
+                category_position=posiciones_categoria.get(equipo_id),
+            ))
+
+        ResumenEquipo.objects.bulk_create(
+            resumenes,
+            update_conflicts=True,
+            unique_fields=['team'],
+            update_fields=[
+                'best_time', 'average_time', 'absent_count',
+                'position', 'category_position', 'updated_at',
+            ],
+        )
+
+        logger.debug("Resúmenes refrescados (competencia=%s, equipos=%s)", competencia_id, len(resumenes))
+        return {'competencia_id': competencia_id, 'equipos': len(resumenes)}
+
+    def _clave_pendiente(self, competencia_id: int) -> str:
+        return f'resumen:{competencia_id}:pendiente'
+
+    def _liberar_pendiente(self, competencia_id: int) -> None:
+        try:
+            cache.delete(self._clave_pendiente(competencia_id))
+        except Exception as e:
+            logger.warning("No se pudo liberar el refresco pendiente (competencia=%s): %s", competencia_id, e)
@@ -4,11 +4,13 @@ Señales de Django para notificar cambios en tiempo real vía WebSocket.
 """
 
 import logging
-from django.db.models.signals import post_save, pre_save
+import threading
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from app.models import Competencia
+from app.models import Competencia, Equipo, Juez, RegistroTiempo, ResultadoEquipo
+from app.websocket.grupos import enviar_a_control, enviar_a_espectadores
 
 logger = logging.getLogger(__name__)
 
@@ -27,10 +29,24 @@ def competencia_pre_save(sender, instance, **kwargs):
         instance._previous_is_running = False
 
 
+@receiver(post_save, sender=Competencia)
+@receiver(post_delete, sender=Competencia)
+def competencia_modificada(sender, instance, **kwargs):
+    """
+    Invalida el HTML público cacheado de la competencia (estado, nombre, activa)
+    y los contextos de conexión WebSocket de los jueces.
+    """
+    from app.utils.render_cache import incrementar_version
+    from app.websocket.validators import invalidar_contextos_conexion
+
+    incrementar_version(instance.id)
+    invalidar_contextos_conexion()
+
+
 @receiver(post_save, sender=Competencia)
 def competencia_estado_cambiado(sender, instance, created, **kwargs):
     """
-    Notifica a los jueces cuando cambia el estado de una competencia.
+    Notifica a los jueces y espectadores cuando cambia el estado de una competencia.
     Se dispara cuando se cambia is_running desde el admin de Django.
     """
     # Solo notificar si no es una creación y el estado cambió
@@ -43,13 +59,6 @@ def competencia_estado_cambiado(sender, instance, created, **kwargs):
     if previous_is_running == instance.is_running:
         return
     
-    channel_layer = get_channel_layer()
-    if not channel_layer:
-        logger.warning("Channel layer no disponible; no se puede enviar notificación")
-        return
-    
-    group_name = f'competencia_{instance.id}'
-    
     # Determinar el tipo de evento
     if instance.is_running:
         tipo_evento = 'competencia_iniciada'
@@ -59,21 +68,159 @@ def competencia_estado_cambiado(sender, instance, created, **kwargs):
         tipo_evento = 'competencia_detenida'
         mensaje = 'La competencia ha finalizado'
         logger.info("Competencia detenida: %s (id=%s)", instance.name, instance.id)
-    
-    # Enviar notificación al grupo de la competencia
-    try:
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                'type': tipo_evento,
-                'data': {
-                    'mensaje': mensaje,
-                    'competencia_id': instance.id,
-                    'competencia_nombre': instance.name,
-                    'en_curso': instance.is_running,
-                }
-            }
+
+    evento = {
+        'type': tipo_evento,
+        'data': {
+            'mensaje': mensaje,
+            'competencia_id': instance.id,
+            'competencia_nombre': instance.name,
+            'en_curso': instance.is_running,
+        }
+    }
+    enviar_a_espectadores(instance.id, evento)
+    enviar_a_control(instance.id, evento)
+    logger.debug("Notificación enviada (competencia=%s): %s", instance.id, tipo_evento)
+
+
+@receiver(pre_save, sender=RegistroTiempo)
+def registro_tiempo_pre_save(sender, instance, **kwargs):
+    """
+    Guarda el equipo anterior del registro: si se mueve a otro equipo hay que
+    recalcular los dos.
+    """
+    if instance._state.adding:
+        instance._previous_team_id = None
+    else:
+        instance._previous_team_id = (
+            RegistroTiempo.objects.filter(pk=instance.pk).values_list('team_id', flat=True).first()
         )
-        logger.debug("Notificación enviada al grupo %s: %s", group_name, tipo_evento)
-    except Exception as e:
-        logger.error("Error enviando notificación WebSocket: %s", e, exc_info=True)
+
+
+@receiver(post_save, sender=RegistroTiempo)
+@receiver(post_delete, sender=RegistroTiempo)
+def registro_tiempo_modificado(sender, instance, origin=None, **kwargs):
+    """
+    Recalcula los contadores del equipo (y del anterior, si el registro cambió
+    de equipo) e invalida la clasificación en vivo cuando un registro se edita
+    o elimina fuera del flujo de registro (por ejemplo, desde el admin).
+    El flujo normal usa bulk_create, suma los contadores en su transacción y
+    actualiza la clasificación de forma incremental.
+
+    Los equipos se acumulan y se recalculan una sola vez al confirmar la
+    transacción, así borrar cien registros desde el admin es un recálculo y
+    no cien. Los registros borrados en cascada con su equipo o competencia se
+    ignoran: de eso se encarga la señal del equipo.
+    """
+    if origin is not None and not isinstance(origin, (RegistroTiempo, QuerySet)):
+        return
+    if isinstance(origin, QuerySet) and not issubclass(origin.model, RegistroTiempo):
+        return
+
+    pendientes = _equipos_pendientes()
+    pendientes.add(instance.team_id)
+    previous_team_id = getattr(instance, '_previous_team_id', None)
+    if previous_team_id is not None:
+        pendientes.add(previous_team_id)
+    transaction.on_commit(_recalcular_equipos_pendientes)
+
+
+_pendientes_hilo = threading.local()
+
+
+def _equipos_pendientes() -> set:
+    # Por hilo: cada hilo tiene su propia conexión y transacción
+    if not hasattr(_pendientes_hilo, 'equipos'):
+        _pendientes_hilo.equipos = set()
+    return _pendientes_hilo.equipos
+
+
+def _recalcular_equipos_pendientes():
+    """
+    Recalcula los equipos acumulados por registro_tiempo_modificado. Se
+    programa una vez por registro, pero solo la primera ejecución tras el
+    commit encuentra equipos; las demás no hacen nada. Los equipos de una
+    transacción deshecha se recalculan con el siguiente commit, lo que no
+    cambia nada: el recálculo parte siempre de los registros.
+    """
+    from app.services.leaderboard_service import LeaderboardService
+    from app.services.registro_service import RegistroService
+    from app.services.resumen_service import ResumenService
+
+    pendientes = _equipos_pendientes()
+    if not pendientes:
+        return
+    equipo_ids = list(pendientes)
+    pendientes.clear()
+
+    RegistroService().recalcular_contadores(equipo_ids=equipo_ids)
+    competencia_ids = set(
+        Equipo.objects.filter(pk__in=equipo_ids).values_list('competition_id', flat=True)
+    )
+    for competencia_id in competencia_ids:
+        LeaderboardService().invalidar(competencia_id)
+        ResumenService().solicitar_refresco(competencia_id)
+
+
+@receiver(post_save, sender=Equipo)
+@receiver(post_save, sender=ResultadoEquipo)
+@receiver(post_delete, sender=Equipo)
+@receiver(post_delete, sender=ResultadoEquipo)
+def equipo_modificado(sender, instance, **kwargs):
+    """
+    Invalida la clasificación en vivo cuando cambian los datos de un equipo
+    (nombre, dorsal, categoría) o se elimina.
+    """
+    from app.services.leaderboard_service import LeaderboardService
+    from app.services.resumen_service import ResumenService
+
+    competencia_id = instance.competition_id
+    LeaderboardService().invalidar(competencia_id)
+    transaction.on_commit(lambda: ResumenService().solicitar_refresco(competencia_id))
+
+
+@receiver(post_save, sender=Juez)
+@receiver(post_delete, sender=Juez)
+def juez_modificado(sender, instance, **kwargs):
+    """
+    Invalida la identidad del juez en caché (datos, estado activo) y los
+    contextos de conexión WebSocket.
+    """
+    from app.auth.juez_cache import invalidar_juez
+    from app.websocket.validators import invalidar_contextos_conexion
+
+    invalidar_juez(instance.id)
+    invalidar_contextos_conexion()
+
+
+@receiver(pre_save, sender=Equipo)
+@receiver(pre_save, sender=ResultadoEquipo)
+def equipo_pre_save(sender, instance, **kwargs):
+    """
+    Guarda el juez anterior del equipo para invalidar también sus asignaciones.
+    """
+    if instance.pk:
+        instance._previous_judge_id = (
+            Equipo.objects.filter(pk=instance.pk).values_list('judge_id', flat=True).first()
+        )
+    else:
+        instance._previous_judge_id = None
+
+
+@receiver(post_save, sender=Equipo)
+@receiver(post_save, sender=ResultadoEquipo)
+@receiver(post_delete, sender=Equipo)
+@receiver(post_delete, sender=ResultadoEquipo)
+def equipo_asignacion_modificada(sender, instance, **kwargs):
+    """
+    Invalida las asignaciones en caché del juez actual y del anterior del equipo,
+    y los contextos de conexión WebSocket.
+    """
+    from app.auth.juez_cache import invalidar_juez
+    from app.websocket.validators import invalidar_contextos_conexion
+
+    invalidar_juez(instance.judge_id)
+    invalidar_contextos_conexion()
+    previous_judge_id = getattr(instance, '_previous_judge_id', None)
+    if previous_judge_id != instance.judge_id:
+        invalidar_juez(previous_judge_id)
@@ -1,3 +1,771 @@
-from django.test import TestCase
+"""
+Módulo: tests
+Tests del registro de tiempos y de la clasificación.
 
-# Create your tests here.
+Características:
+- Base de datos de pruebas de Django (SQLite o PostgreSQL según settings)
+- Caché en memoria y capa de canales en memoria: no necesitan Redis
+- Los tests de la cola usan fakeredis (grupo dev): tampoco necesitan Redis
+"""
+
+import hashlib
+import json
+import uuid
+from unittest import mock
+
+import fakeredis
+import fakeredis.aioredis
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.models import Competencia, Equipo, Juez, RegistroTiempo
+
+AJUSTES_PRUEBA = {
+    'ALLOWED_HOSTS': ['testserver'],
+    'SECURE_SSL_REDIRECT': False,
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+        'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-local'},
+    },
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    # Las plantillas se renderizan sin collectstatic (sin manifiesto)
+    'STORAGES': {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+}
+
+
+def registros_validos(cantidad=15):
+    return [{'id_registro': str(uuid.uuid4()), 'tiempo': 60000 + i} for i in range(cantidad)]
+
+
+@override_settings(**AJUSTES_PRUEBA)
+class RegistrosTestCase(TransactionTestCase):
+    """
+    Competencia en curso, un juez con dos equipos y un equipo ajeno.
+
+    TransactionTestCase: las vistas asíncronas consultan la base de datos
+    desde el hilo de pool_bd, que no ve la transacción de un TestCase.
+    """
+
+    def setUp(self):
+        from django.core.cache import caches
+        for alias in ('default', 'local'):
+            caches[alias].clear()
+
+        self.competencia = Competencia.objects.create(
+            name='Prueba', datetime=timezone.now(), is_running=True
+        )
+        self.juez = Juez.objects.create(username='juez')
+        self.otro_juez = Juez.objects.create(username='otro')
+        self.equipo = Equipo.objects.create(name='A', number=1, competition=self.competencia, judge=self.juez)
+        self.equipo_b = Equipo.objects.create(name='B', number=2, competition=self.competencia, judge=self.juez)
+        self.ajeno = Equipo.objects.create(name='C', number=3, competition=self.competencia, judge=self.otro_juez)
+
+        token = RefreshToken()
+        token['juez_id'] = self.juez.id
+        self.token = str(token.access_token)
+        self.cliente = APIClient()
+        self.cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def url_registros(self, equipo):
+        return f'/api/equipos/{equipo.id}/registros/'
+
+
+class IdempotenciaTests(RegistrosTestCase):
+    """Cabecera Idempotency-Key en los envíos de registros."""
+
+    def post(self, url, cuerpo, clave):
+        return self.cliente.post(url, cuerpo, format='json', HTTP_IDEMPOTENCY_KEY=clave)
+
+    def test_reintento_repite_la_respuesta(self):
+        cuerpo = {'registros': registros_validos()}
+        primera = self.post(self.url_registros(self.equipo), cuerpo, 'clave-1')
+        repetida = self.post(self.url_registros(self.equipo), cuerpo, 'clave-1')
+
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual(repetida.status_code, 201)
+        self.assertEqual(repetida.content, primera.content)
+        self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+        self.assertEqual(RegistroTiempo.objects.filter(team=self.equipo).count(), 15)
+
+    def test_misma_clave_con_otro_cuerpo(self):
+        self.post(self.url_registros(self.equipo), {'registros': registros_validos()}, 'clave-1')
+        respuesta = self.post(self.url_registros(self.equipo), {'registros': registros_validos()}, 'clave-1')
+        self.assertEqual(respuesta.status_code, 422)
+
+    def test_misma_clave_en_otra_ruta(self):
+        self.post(self.url_registros(self.equipo), {'registros': registros_validos()}, 'clave-1')
+        respuesta = self.post(
+            '/api/registros/lote/',
+            {'equipos': [{'equipo_id': self.equipo_b.id, 'registros': registros_validos()}]},
+            'clave-1'
+        )
+        self.assertEqual(respuesta.status_code, 422)
+        self.assertFalse(RegistroTiempo.objects.filter(team=self.equipo_b).exists())
+
+    def test_envio_en_curso(self):
+        from django.core.cache import caches
+        from app.utils.idempotency import EN_CURSO
+
+        cuerpo = {'registros': registros_validos()}
+        self.post(self.url_registros(self.equipo), cuerpo, 'clave-1')
+        clave = 'idempotencia:{}:{}'.format(self.juez.id, hashlib.sha256(b'clave-1').hexdigest())
+        entrada = caches['default'].get(clave)
+        caches['default'].set(clave, {'estado': EN_CURSO, 'huella': entrada['huella']}, 60)
+
+        respuesta = self.post(self.url_registros(self.equipo), cuerpo, 'clave-1')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta['Retry-After'], '1')
+
+    def test_clave_invalida(self):
+        respuesta = self.post(self.url_registros(self.equipo), {'registros': registros_validos()}, 'x' * 256)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(RegistroTiempo.objects.exists())
+
+
+class SincronizarRegistrosTests(RegistrosTestCase):
+    """Sincronización por id_registro con envíos parciales."""
+
+    def url(self, equipo):
+        return f'/api/equipos/{equipo.id}/registros/sincronizar/'
+
+    def test_envios_parciales_y_reintentos(self):
+        registros = registros_validos()
+        self.assertEqual(self.cliente.get(self.url(self.equipo)).json()['ids_conocidos'], [])
+
+        primera = self.cliente.post(self.url(self.equipo), {'registros': registros[:5]}, format='json').json()
+        self.assertEqual(len(primera['guardados']), 5)
+        self.assertFalse(primera['completo'])
+
+        reintento = self.cliente.post(self.url(self.equipo), {'registros': registros[:10]}, format='json').json()
+        self.assertEqual(len(reintento['guardados']), 5)
+        self.assertEqual(len(reintento['ya_conocidos']), 5)
+
+        estado = self.cliente.get(self.url(self.equipo)).json()
+        self.assertEqual(set(estado['ids_conocidos']), {r['id_registro'] for r in registros[:10]})
+
+        final = self.cliente.post(self.url(self.equipo), {'registros': registros[10:]}, format='json').json()
+        self.assertTrue(final['completo'])
+        self.assertEqual(RegistroTiempo.objects.filter(team=self.equipo).count(), 15)
+        self.assertEqual(Equipo.objects.get(pk=self.equipo.pk).records_count, 15)
+
+    def test_registro_sin_id_falla_solo_el_suyo(self):
+        registros = registros_validos(2) + [{'tiempo': 5}]
+        respuesta = self.cliente.post(self.url(self.equipo), {'registros': registros}, format='json').json()
+
+        self.assertEqual(len(respuesta['guardados']), 2)
+        self.assertEqual([f['indice'] for f in respuesta['registros_fallidos']], [2])
+
+    def test_mas_del_maximo(self):
+        respuesta = self.cliente.post(self.url(self.equipo), {'registros': registros_validos(16)}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_equipo_ajeno(self):
+        self.assertEqual(self.cliente.get(self.url(self.ajeno)).status_code, 403)
+
+
+class RegistrarTiemposEquiposTests(RegistrosTestCase):
+    """Envío de varios equipos en una petición (/api/registros/lote/)."""
+
+    def test_resultados_por_equipo(self):
+        cuerpo = {'equipos': [
+            {'equipo_id': self.equipo.id, 'registros': registros_validos()},
+            {'equipo_id': self.equipo_b.id, 'registros': registros_validos(3)},
+            {'equipo_id': self.ajeno.id, 'registros': registros_validos()},
+            {'equipo_id': 999999, 'registros': registros_validos()},
+        ]}
+        respuesta = self.cliente.post('/api/registros/lote/', cuerpo, format='json')
+
+        self.assertEqual(respuesta.status_code, 201)
+        estados = {e['equipo_id']: e['status'] for e in respuesta.json()['equipos']}
+        self.assertEqual(estados, {self.equipo.id: 201, self.equipo_b.id: 400, self.ajeno.id: 403, 999999: 404})
+        self.assertEqual(RegistroTiempo.objects.filter(team=self.equipo).count(), 15)
+        self.assertFalse(RegistroTiempo.objects.exclude(team=self.equipo).exists())
+
+    def test_equipo_repetido(self):
+        cuerpo = {'equipos': [
+            {'equipo_id': self.equipo.id, 'registros': registros_validos()},
+            {'equipo_id': self.equipo.id, 'registros': registros_validos()},
+        ]}
+        equipos = self.cliente.post('/api/registros/lote/', cuerpo, format='json').json()['equipos']
+
+        self.assertEqual([e['status'] for e in equipos], [201, 400])
+        self.assertEqual(RegistroTiempo.objects.filter(team=self.equipo).count(), 15)
+
+    def test_todos_rechazados(self):
+        cuerpo = {'equipos': [{'equipo_id': self.ajeno.id, 'registros': registros_validos()}]}
+        respuesta = self.cliente.post('/api/registros/lote/', cuerpo, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['equipos'][0]['status'], 403)
+
+    def test_error_de_base_de_datos_responde_5xx(self):
+        from app.services.registro_service import RegistroService
+
+        cuerpo = {'equipos': [
+            {'equipo_id': self.equipo.id, 'registros': registros_validos()},
+            {'equipo_id': self.ajeno.id, 'registros': registros_validos()},
+        ]}
+        with mock.patch.object(RegistroService, '_bloquear_equipos', side_effect=Exception('bd caída')):
+            respuesta = self.cliente.post('/api/registros/lote/', cuerpo, format='json', HTTP_IDEMPOTENCY_KEY='lote-1')
+            individual = self.cliente.post(
+                self.url_registros(self.equipo), {'registros': registros_validos()}, format='json'
+            )
+
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertEqual([e['status'] for e in respuesta.json()['equipos']], [500, 500])
+        self.assertEqual(individual.status_code, 500)
+
+        # El 5xx no se guarda como respuesta idempotente: el reintento se procesa
+        reintento = self.cliente.post('/api/registros/lote/', cuerpo, format='json', HTTP_IDEMPOTENCY_KEY='lote-1')
+        self.assertEqual(reintento.status_code, 201)
+        self.assertEqual([e['status'] for e in reintento.json()['equipos']], [201, 403])
+        self.assertEqual(RegistroTiempo.objects.filter(team=self.equipo).count(), 15)
+
+
+@override_settings(REGISTRO_MODO='cola', COLA_REGISTROS_REINTENTO_MS=0, COLA_REGISTROS_MAX_INTENTOS=2)
+class ColaRegistrosTests(RegistrosTestCase):
+    """Envíos encolados (REGISTRO_MODO='cola') y el worker que los guarda."""
+
+    def setUp(self):
+        super().setUp()
+        from app.services import cola_registros_service
+        from app.services.cola_registros_service import ColaRegistrosService
+
+        servidor = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=servidor)
+        parches = [
+            mock.patch.object(cola_registros_service, '_cliente', self.redis),
+            mock.patch.object(
+                ColaRegistrosService, '_redis_async',
+                lambda servicio: fakeredis.aioredis.FakeRedis(server=servidor)
+            ),
+        ]
+        for parche in parches:
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.servicio = ColaRegistrosService()
+        self.servicio.crear_grupo()
+
+    def encolar(self, equipo, registros=None):
+        respuesta = self.cliente.post(
+            self.url_registros(equipo), {'registros': registros or registros_validos()}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 202)
+        return respuesta.json()
+
+    def estado(self, envio):
+        return self.cliente.get(envio['url_estado']).json()
+
+    def test_envio_encolado_y_confirmado(self):
+        envio = self.encolar(self.equipo)
+        self.assertEqual(self.estado(envio)['estado'], 'pendiente')
+        self.assertFalse(RegistroTiempo.objects.exists())
+
+        self.assertEqual(self.servicio.procesar('worker', espera_ms=1), {'confirmados': 1, 'pendientes': 0})
+
+        estado = self.estado(envio)
+        self.assertEqual(estado['estado'], 'confirmado')
+        self.assertEqual(estado['status'], 201)
+        self.assertEqual(estado['respuesta']['total_guardados'], 15)
+        self.assertEqual(RegistroTiempo.objects.filter(team=self.equipo).count(), 15)
+        self.assertEqual(self.servicio.estadisticas(), {'en_stream': 0, 'sin_confirmar': 0})
+
+    def test_registro_invalido_no_se_encola(self):
+        registros = registros_validos(14) + [{'tiempo': -1}]
+        respuesta = self.cliente.post(self.url_registros(self.equipo), {'registros': registros}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self.redis.xlen('server5k:registros'), 0)
+
+    def test_equipo_ajeno_rechazado_al_encolar(self):
+        respuesta = self.cliente.post(
+            self.url_registros(self.ajeno), {'registros': registros_validos()}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_reasignacion_visible_al_encolar(self):
+        self.encolar(self.equipo)
+        self.equipo.judge = self.otro_juez
+        self.equipo.save()
+        respuesta = self.cliente.post(
+            self.url_registros(self.equipo), {'registros': registros_validos()}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_mensaje_ilegible_se_confirma_como_fallido(self):
+        from app.services.cola_registros_service import STREAM, _clave_estado
+
+        seguimiento = uuid.uuid4().hex
+        self.redis.set(_clave_estado(seguimiento), json.dumps(
+            {'estado': 'pendiente', 'juez_id': self.juez.id, 'equipo_id': self.equipo.id}
+        ))
+        self.redis.xadd(STREAM, {
+            'seguimiento': seguimiento, 'juez_id': self.juez.id,
+            'equipo_id': self.equipo.id, 'registros': '{no es json',
+        })
+        self.redis.xadd(STREAM, {'campo': 'desconocido'})
+
+        self.assertEqual(self.servicio.procesar('worker', espera_ms=1), {'confirmados': 2, 'pendientes': 0})
+
+        estado = self.estado({'url_estado': f'/api/registros/envios/{seguimiento}/'})
+        self.assertEqual(estado['estado'], 'fallido')
+        self.assertEqual(estado['status'], 500)
+        self.assertEqual(self.servicio.estadisticas(), {'en_stream': 0, 'sin_confirmar': 0})
+
+    def test_mensaje_reclamado_ya_guardado_no_duplica(self):
+        from app.services.cola_registros_service import GRUPO, STREAM
+        from app.services.registro_service import RegistroService
+
+        envio = self.encolar(self.equipo)
+        # Un worker lee el mensaje, guarda y cae antes del XACK
+        mensaje = self.redis.xreadgroup(GRUPO, 'caido', {STREAM: '>'}, count=10)[0][1][0]
+        registros = json.loads(mensaje[1][b'registros'])
+        RegistroService().registrar_equipos(self.juez, [{'equipo_id': self.equipo.id, 'registros': registros}])
+
+        self.assertEqual(self.servicio.procesar('worker', espera_ms=1), {'confirmados': 1, 'pendientes': 0})
+
+        estado = self.estado(envio)
+        self.assertEqual(estado['estado'], 'confirmado')
+        self.assertEqual(estado['respuesta']['total_guardados'], 0)
+        self.assertEqual(RegistroTiempo.objects.filter(team=self.equipo).count(), 15)
+        self.assertEqual(self.servicio.estadisticas(), {'en_stream': 0, 'sin_confirmar': 0})
+
+    def test_mensaje_reclamado_sin_guardar_se_guarda(self):
+        from app.services.cola_registros_service import GRUPO, STREAM
+
+        envio = self.encolar(self.equipo)
+        self.redis.xreadgroup(GRUPO, 'caido', {STREAM: '>'}, count=10)
+
+        self.assertEqual(self.servicio.procesar('worker', espera_ms=1), {'confirmados': 1, 'pendientes': 0})
+        self.assertEqual(self.estado(envio)['respuesta']['total_guardados'], 15)
+
+    def test_juez_eliminado_antes_de_guardar(self):
+        envio = self.encolar(self.equipo)
+        self.juez.delete()
+
+        self.assertEqual(self.servicio.procesar('worker', espera_ms=1), {'confirmados': 1, 'pendientes': 0})
+
+        self.assertFalse(RegistroTiempo.objects.exists())
+        self.assertEqual(self.servicio.estadisticas(), {'en_stream': 0, 'sin_confirmar': 0})
+        self.assertEqual(
+            json.loads(self.redis.get(f"registros:envio:{envio['seguimiento']}"))['resultado']['rechazo'],
+            'equipo_ajeno'
+        )
+
+    def test_error_de_base_de_datos_reintenta_hasta_el_maximo(self):
+        from app.services.registro_service import RegistroService
+
+        envio = self.encolar(self.equipo)
+        with mock.patch.object(RegistroService, '_bloquear_equipos', side_effect=Exception('bd caída')):
+            self.assertEqual(self.servicio.procesar('worker', espera_ms=1), {'confirmados': 0, 'pendientes': 1})
+            self.assertEqual(self.estado(envio)['estado'], 'pendiente')
+            self.assertEqual(self.servicio.procesar('worker', espera_ms=1), {'confirmados': 1, 'pendientes': 0})
+
+        estado = self.estado(envio)
+        self.assertEqual(estado['estado'], 'fallido')
+        self.assertIn('bd caída', estado['error'])
+        self.assertEqual(self.servicio.estadisticas(), {'en_stream': 0, 'sin_confirmar': 0})
+
+
+class RegistroTiempoSignalTests(RegistrosTestCase):
+    """Ediciones de registros fuera del flujo de registro (admin)."""
+
+    def setUp(self):
+        super().setUp()
+        self.registros = [RegistroTiempo.objects.create(team=self.equipo, time=100 + i) for i in range(5)]
+
+    def contadores(self, equipo):
+        equipo.refresh_from_db()
+        return equipo.records_count, equipo.total_time
+
+    def test_cambio_de_equipo_recalcula_ambos(self):
+        registro = self.registros[0]
+        registro.team = self.equipo_b
+        registro.save()
+
+        self.assertEqual(self.contadores(self.equipo), (4, 410))
+        self.assertEqual(self.contadores(self.equipo_b), (1, 100))
+
+    def test_borrado_masivo_recalcula_una_vez(self):
+        from django.db import transaction
+        from app.services.registro_service import RegistroService
+
+        with mock.patch.object(
+            RegistroService, 'recalcular_contadores', autospec=True,
+            side_effect=RegistroService.recalcular_contadores
+        ) as recalcular:
+            with transaction.atomic():
+                RegistroTiempo.objects.filter(team=self.equipo).delete()
+
+        self.assertEqual(recalcular.call_count, 1)
+        self.assertEqual(self.contadores(self.equipo), (0, 0))
+
+    def test_borrado_en_cascada_no_recalcula(self):
+        from app.services.registro_service import RegistroService
+
+        with mock.patch.object(RegistroService, 'recalcular_contadores') as recalcular:
+            self.equipo.delete()
+
+        recalcular.assert_not_called()
+        self.assertFalse(RegistroTiempo.objects.exists())
+
+
+def procesar_equipos_referencia(equipos):
+    """
+    Reglas de la clasificación pública antes de la consulta agregada
+    (``_procesar_equipos`` de html_views): equipos sin registros fuera,
+    cualquier 0 descalifica, calificados por total con 0 al final y el orden
+    de entrada (dorsal) como desempate.
+
+    Args:
+        equipos: Lista de (equipo_id, tiempos) en orden de dorsal
+
+    Returns:
+        Tupla (calificados, descalificados) con (equipo_id, total, mejor, ausentes)
+    """
+    calificados, descalificados = [], []
+    for equipo_id, tiempos in equipos:
+        if not tiempos:
+            continue
+        ausentes = sum(1 for t in tiempos if t == 0)
+        positivos = [t for t in tiempos if t > 0]
+        fila = (equipo_id, sum(tiempos), min(positivos) if positivos else 0, ausentes)
+        (descalificados if ausentes else calificados).append(fila)
+    calificados.sort(key=lambda f: f[1] if f[1] > 0 else float('inf'))
+    descalificados.sort(key=lambda f: f[1])
+    return calificados, descalificados
+
+
+@override_settings(**AJUSTES_PRUEBA)
+class ClasificacionTestCase(TestCase):
+    """Competencia con equipos y registros creados sin pasar por el registro."""
+
+    def setUp(self):
+        from django.core.cache import caches
+        for alias in ('default', 'local'):
+            caches[alias].clear()
+        self.competencia = Competencia.objects.create(name='Prueba', datetime=timezone.now(), is_running=True)
+
+    def crear_equipo(self, dorsal, tiempos, categoria='estudiantes'):
+        equipo = Equipo.objects.create(
+            name=f'Equipo {dorsal}', number=dorsal, category=categoria, competition=self.competencia
+        )
+        self.registrar(equipo, tiempos)
+        return equipo
+
+    def registrar(self, equipo, tiempos):
+        RegistroTiempo.objects.bulk_create([RegistroTiempo(team=equipo, time=tiempo) for tiempo in tiempos])
+
+
+class RankingTests(ClasificacionTestCase):
+    """La consulta agregada del ranking sigue las reglas de la clasificación anterior."""
+
+    def setUp(self):
+        super().setUp()
+        # dorsal -> tiempos; los dorsales 4 y 5 empatan y se crean en orden inverso
+        self.tiempos = {
+            5: [1000] * 15,
+            4: [1000] * 15,
+            1: [100, 200, 300],
+            2: [0, 500, 700],
+            3: [0, 0],
+            6: [],
+            7: [2000] * 14 + [1],
+            8: [400, 0],
+        }
+        self.equipos = {dorsal: self.crear_equipo(dorsal, tiempos) for dorsal, tiempos in self.tiempos.items()}
+        self.esperado = procesar_equipos_referencia(
+            [(self.equipos[dorsal].id, self.tiempos[dorsal]) for dorsal in sorted(self.tiempos)]
+        )
+
+    def test_ranking_rest_coincide_con_la_referencia(self):
+        from app.services.results_service import ResultsService
+
+        ranking = ResultsService().obtener_ranking_competencia(self.competencia.id)['ranking']
+        calificados = [r for r in ranking if not r['descalificado']]
+        descalificados = [r for r in ranking if r['descalificado']]
+
+        self.assertEqual(
+            [(r['equipo_id'], r['tiempo_total'], r['mejor_tiempo'] or 0, r['jugadores_ausentes']) for r in calificados],
+            self.esperado[0]
+        )
+        self.assertEqual(
+            [(r['equipo_id'], r['tiempo_total'], r['mejor_tiempo'] or 0, r['jugadores_ausentes']) for r in descalificados],
+            self.esperado[1]
+        )
+        self.assertEqual([r['posicion'] for r in calificados], list(range(1, len(calificados) + 1)))
+        self.assertTrue(all(r['posicion'] is None for r in descalificados))
+
+    def test_clasificacion_en_vivo_coincide_con_la_referencia(self):
+        from app.services.leaderboard_service import LeaderboardService
+
+        calificados, descalificados = LeaderboardService().obtener_clasificacion(self.competencia.id)
+
+        self.assertEqual(
+            [(f['id'], f['tiempo_total_ms'], f['mejor_tiempo_ms'], f['jugadores_ausentes']) for f in calificados],
+            self.esperado[0]
+        )
+        self.assertEqual(
+            [(f['id'], f['tiempo_total_ms'], f['mejor_tiempo_ms'], f['jugadores_ausentes']) for f in descalificados],
+            self.esperado[1]
+        )
+
+    def test_casos_limite(self):
+        from app.services.results_service import ResultsService
+
+        filas = {f['team_id']: f for f in ResultsService().consultar_totales(self.competencia.id)}
+        # Sin registros: no aparece
+        self.assertNotIn(self.equipos[6].id, filas)
+        # Menos de 15 registros: se suman los que hay
+        self.assertEqual((filas[self.equipos[1].id]['tiempo_total'], filas[self.equipos[1].id]['total_registros']), (600, 3))
+        # Solo ceros: descalificado, sin mejor tiempo
+        self.assertEqual(filas[self.equipos[3].id]['total_ausentes'], 2)
+        self.assertIsNone(filas[self.equipos[3].id]['mejor_tiempo'])
+        # El mejor tiempo ignora los ceros
+        self.assertEqual(filas[self.equipos[2].id]['mejor_tiempo'], 500)
+
+    def test_empate_por_dorsal(self):
+        from app.services.results_service import ResultsService
+
+        ranking = ResultsService().obtener_ranking_competencia(self.competencia.id)['ranking']
+        ids = [r['equipo_id'] for r in ranking]
+        self.assertLess(ids.index(self.equipos[4].id), ids.index(self.equipos[5].id))
+
+    def test_filtro_por_categoria(self):
+        from app.services.results_service import ResultsService
+
+        otro = self.crear_equipo(9, [50] * 15, categoria='interfacultades')
+        ranking = ResultsService().obtener_ranking_competencia(self.competencia.id, 'interfacultades')['ranking']
+        self.assertEqual([(r['equipo_id'], r['posicion']) for r in ranking], [(otro.id, 1)])
+
+    def test_total_cero_va_al_final(self):
+        from app.services.results_service import ResultsService
+
+        filas = [
+            {'id': 1, 'total': 0, 'dorsal': 1, 'descalificado': False},
+            {'id': 2, 'total': 900, 'dorsal': 2, 'descalificado': False},
+            {'id': 3, 'total': 900, 'dorsal': 3, 'descalificado': True},
+            {'id': 4, 'total': 100, 'dorsal': 4, 'descalificado': True},
+        ]
+        calificados, descalificados = ResultsService.ordenar_equipos(filas, 'total', 'dorsal')
+        self.assertEqual([f['id'] for f in calificados], [2, 1])
+        self.assertEqual([f['id'] for f in descalificados], [4, 3])
+
+
+class LeaderboardTests(ClasificacionTestCase):
+    """Clasificación en vivo: actualización incremental, generación y deltas."""
+
+    def setUp(self):
+        from app.services.leaderboard_service import LeaderboardService
+
+        super().setUp()
+        self.servicio = LeaderboardService()
+        self.a = self.crear_equipo(1, [1000] * 15)
+        self.b = self.crear_equipo(2, [2000] * 15)
+        self.c = self.crear_equipo(3, [], categoria='interfacultades')
+
+    def ids(self, categoria=''):
+        calificados, _ = self.servicio.obtener_clasificacion(self.competencia.id, categoria)
+        return [f['id'] for f in calificados]
+
+    def test_actualizacion_incremental(self):
+        seq = self.servicio.obtener_instantanea(self.competencia.id)['seq']
+        self.registrar(self.c, [100] * 15)
+
+        delta = self.servicio.actualizar_equipo(self.c)
+
+        self.assertEqual(delta['seq'], seq + 1)
+        self.assertFalse(delta['resync'])
+        self.assertEqual(delta['equipo']['tiempo_total_ms'], 1500)
+        self.assertEqual(delta['posiciones'], {'': 1, 'interfacultades': 1})
+        self.assertEqual(
+            delta['desplazados'][''], [{'id': self.a.id, 'posicion': 2}, {'id': self.b.id, 'posicion': 3}]
+        )
+        self.assertEqual(self.ids(), [self.c.id, self.a.id, self.b.id])
+        self.assertEqual(self.servicio.obtener_instantanea(self.competencia.id)['seq'], seq + 1)
+
+    def test_actualizacion_consulta_solo_el_equipo(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.servicio.obtener_instantanea(self.competencia.id)
+        self.registrar(self.c, [100] * 15)
+        with CaptureQueriesContext(connection) as consultas:
+            self.servicio.actualizar_equipo(self.c)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn(str(self.c.id), consultas[0]['sql'])
+
+    def test_invalidar_cambia_de_generacion(self):
+        self.servicio.obtener_instantanea(self.competencia.id)
+        clave = self.servicio._clave(self.competencia.id)
+        seq = self.servicio.obtener_instantanea(self.competencia.id)['seq']
+        self.registrar(self.c, [100] * 15)
+
+        # Sin invalidar, la caché sigue sirviendo la clasificación anterior
+        self.assertEqual(self.ids(), [self.a.id, self.b.id])
+        self.servicio.invalidar(self.competencia.id)
+
+        self.assertNotEqual(self.servicio._clave(self.competencia.id), clave)
+        self.assertEqual(self.ids(), [self.c.id, self.a.id, self.b.id])
+        self.assertEqual(self.servicio.obtener_instantanea(self.competencia.id)['seq'], seq + 1)
+
+    def test_lock_ocupado_reconstruye(self):
+        from django.core.cache import cache
+        from app.services.leaderboard_service import LeaderboardService
+
+        self.servicio.obtener_instantanea(self.competencia.id)
+        clave = self.servicio._clave(self.competencia.id)
+        cache.add(f'leaderboard:{self.competencia.id}:lock', 1, 60)
+        self.registrar(self.c, [100] * 15)
+
+        with mock.patch.object(LeaderboardService, 'LOCK_INTENTOS', 1):
+            delta = self.servicio.actualizar_equipo(self.c)
+
+        self.assertTrue(delta['resync'])
+        self.assertNotEqual(self.servicio._clave(self.competencia.id), clave)
+        self.assertEqual(self.ids(), [self.c.id, self.a.id, self.b.id])
+
+    def test_deltas_desde_el_historial(self):
+        seq = self.servicio.obtener_instantanea(self.competencia.id)['seq']
+        self.registrar(self.c, [100] * 15)
+        primero = self.servicio.actualizar_equipo(self.c)
+        self.registrar(self.a, [1])
+        segundo = self.servicio.actualizar_equipo(self.a)
+
+        self.assertEqual(self.servicio.deltas_desde(self.competencia.id, seq), [primero, segundo])
+        self.assertEqual(self.servicio.deltas_desde(self.competencia.id, primero['seq']), [segundo])
+        self.assertEqual(self.servicio.deltas_desde(self.competencia.id, segundo['seq']), [])
+        # Un cliente por delante de la secuencia necesita la instantánea
+        self.assertIsNone(self.servicio.deltas_desde(self.competencia.id, segundo['seq'] + 1))
+
+    def test_hueco_en_el_historial_pide_instantanea(self):
+        from django.core.cache import cache
+
+        seq = self.servicio.obtener_instantanea(self.competencia.id)['seq']
+        self.registrar(self.c, [100] * 15)
+        primero = self.servicio.actualizar_equipo(self.c)
+        self.registrar(self.a, [1])
+        self.servicio.actualizar_equipo(self.a)
+
+        cache.delete(self.servicio._clave_delta(self.competencia.id, primero['seq']))
+        self.assertIsNone(self.servicio.deltas_desde(self.competencia.id, seq))
+
+    def test_invalidacion_y_historial_desbordado_piden_instantanea(self):
+        from app.services.leaderboard_service import LeaderboardService
+
+        seq = self.servicio.obtener_instantanea(self.competencia.id)['seq']
+        self.servicio.invalidar(self.competencia.id)
+        self.assertIsNone(self.servicio.deltas_desde(self.competencia.id, seq))
+
+        seq = self.servicio.obtener_instantanea(self.competencia.id)['seq']
+        with mock.patch.object(LeaderboardService, 'HISTORIAL_DELTAS', 2):
+            for tiempo in (1, 2, 3):
+                self.registrar(self.c, [tiempo])
+                self.servicio.actualizar_equipo(self.c)
+            self.assertIsNone(self.servicio.deltas_desde(self.competencia.id, seq))
+
+
+class RenderCacheTests(ClasificacionTestCase):
+    """HTML público cacheado por versión de competencia, con ETag y 304."""
+
+    def setUp(self):
+        super().setUp()
+        self.juez = Juez.objects.create(username='juez')
+        self.equipo = self.crear_equipo(1, [])
+        Equipo.objects.filter(pk=self.equipo.pk).update(judge=self.juez)
+        self.urls = [f'/{self.competencia.id}/', f'/{self.competencia.id}/partial/']
+
+    def etags(self):
+        etags = []
+        for url in self.urls:
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            etags.append(respuesta['ETag'])
+        return etags
+
+    def assertNoModificado(self, etags):
+        for url, etag in zip(self.urls, etags):
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 304)
+            self.assertEqual(respuesta['ETag'], etag)
+
+    def assertRenderNuevo(self, etags):
+        for url, etag in zip(self.urls, etags):
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_version_sin_cambios_responde_304(self):
+        self.assertNoModificado(self.etags())
+
+    def test_304_sin_consultas(self):
+        etags = self.etags()
+        with self.assertNumQueries(0):
+            self.assertNoModificado(etags)
+
+    def test_guardar_competencia_renderiza_de_nuevo(self):
+        etags = self.etags()
+        self.competencia.name = 'Renombrada'
+        self.competencia.save()
+
+        self.assertRenderNuevo(etags)
+        self.assertContains(self.client.get(self.urls[0]), 'Renombrada')
+
+    def test_iniciar_y_detener_renderiza_de_nuevo(self):
+        self.competencia.stop()
+        etags = self.etags()
+        self.competencia.start()
+        self.assertRenderNuevo(etags)
+
+        etags = self.etags()
+        self.competencia.stop()
+        self.assertRenderNuevo(etags)
+
+    def test_registro_de_tiempos_renderiza_de_nuevo(self):
+        from app.services.difusion_service import DifusionService
+        from app.services.registro_service import RegistroService
+
+        etags = self.etags()
+        self.assertNotContains(self.client.get(self.urls[1]), 'Equipo 1')
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = RegistroService().registrar_batch_sync(self.juez, self.equipo.id, registros_validos())
+        self.assertEqual(resultado['total_guardados'], 15)
+        # Cierra la ventana de difusión como lo haría su temporizador
+        DifusionService().vaciar(self.competencia.id)
+
+        self.assertRenderNuevo(etags)
+        self.assertContains(self.client.get(self.urls[1]), 'Equipo 1')
+
+
+class ContextoConexionTests(RegistrosTestCase):
+    """Contexto del handshake WebSocket del juez, cacheado por proceso."""
+
+    def obtener(self):
+        from asgiref.sync import async_to_sync
+        from app.websocket.validators import obtener_contexto_conexion
+
+        return async_to_sync(obtener_contexto_conexion)(self.token)
+
+    def test_contexto_en_cache_hasta_invalidar(self):
+        from django.core.cache import cache
+        from app.websocket.validators import CLAVE_GENERACION
+
+        contexto = self.obtener()
+        self.assertEqual(contexto['juez'].id, self.juez.id)
+        self.assertEqual(contexto['estado_competencia']['en_curso'], True)
+
+        # update() no dispara señales: el contexto sigue en caché
+        Juez.objects.filter(pk=self.juez.pk).update(is_active=False)
+        self.assertIsNotNone(self.obtener())
+
+        # Otro proceso guarda el juez: solo avanza la generación compartida
+        cache.incr(CLAVE_GENERACION)
+        self.assertIsNone(self.obtener())
+
+    def test_guardar_competencia_invalida(self):
+        self.obtener()
+        self.competencia.stop()
+        self.assertEqual(self.obtener()['estado_competencia']['en_curso'], False)
@@ -3,10 +3,18 @@ Módulo: utils
 Utilidades y funciones auxiliares de la aplicación.
 """
 
-from .idempotency import (
-    generar_hash_registro,
-    verificar_duplicado,
-    limpiar_registros_antiguos,
+from .idempotency import idempotente
+from .render_cache import (
+    obtener_version,
+    incrementar_version,
+    cachear_por_version,
+)
+from .bd_async import (
+    PoolAsync,
+    pool_registro,
+    PoolHilosBD,
+    pool_bd,
+    en_pool_bd,
 )
 from .timestamps import (
     formatear_tiempo_ms,
@@ -15,9 +23,15 @@ from .timestamps import (
 )
 
 __all__ = [
-    'generar_hash_registro',
-    'verificar_duplicado',
-    'limpiar_registros_antiguos',
+    'idempotente',
+    'obtener_version',
+    'incrementar_version',
+    'cachear_por_version',
+    'PoolAsync',
+    'pool_registro',
+    'PoolHilosBD',
+    'pool_bd',
+    'en_pool_bd',
     'formatear_tiempo_ms',
     'parsear_tiempo_a_ms',
     'obtener_timestamp_actual',
@@ -0,0 +1,315 @@
+"""
+Módulo: bd_async
+Acceso a la base de datos desde código asíncrono sin pasar por el executor
+de hilos de Django.
+
+Características:
+- PoolAsync: conexiones psycopg.AsyncConnection abiertas bajo demanda, hasta
+  un máximo por worker (REGISTRO_POOL_ASYNC); un pool por bucle de eventos;
+  las conexiones rotas se descartan al devolverse; solo PostgreSQL
+- PoolHilosBD: pool acotado de hilos para el ORM síncrono de los consumers y
+  del registro (``@en_pool_bd`` en lugar de ``@database_sync_to_async``)
+  - Cada hilo mantiene su propia conexión de Django, así que el tamaño se
+    deduce del presupuesto de conexiones del worker (BD_CONEXIONES_POR_WORKER)
+  - Medidores: cola, en curso, espera y latencia por función (p50/p95)
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+MOTOR_POSTGRESQL = 'django.db.backends.postgresql'
+
+
+class PoolAsync:
+    """
+    Pool mínimo de psycopg.AsyncConnection en modo autocommit: quien toma una
+    conexión abre su transacción con ``conexion.transaction()``.
+
+    Uso:
+        async with pool.conexion() as conexion:
+            async with conexion.transaction():
+                ...
+    """
+
+    def __init__(self, alias: str = 'default', maximo: Optional[int] = None):
+        self.alias = alias
+        self._maximo = maximo
+        self._bucle = None
+        self._libres: List[Any] = []
+        self._espera: Optional[asyncio.Condition] = None
+        self._abiertas = 0
+        self._contadores = {'prestamos': 0, 'esperas': 0, 'descartadas': 0}
+        self._aviso_opciones = False
+
+    @property
+    def maximo(self) -> int:
+        if self._maximo is not None:
+            return self._maximo
+        return getattr(settings, 'REGISTRO_POOL_ASYNC', 10)
+
+    def disponible(self) -> bool:
+        """True si la base de datos del alias es PostgreSQL."""
+        return settings.DATABASES.get(self.alias, {}).get('ENGINE') == MOTOR_POSTGRESQL
+
+    def _parametros(self) -> Dict[str, Any]:
+        bd = settings.DATABASES[self.alias]
+        parametros = {
+            'dbname': bd.get('NAME'),
+            'user': bd.get('USER'),
+            'password': bd.get('PASSWORD'),
+            'host': bd.get('HOST'),
+            'port': bd.get('PORT'),
+        }
+        # OPTIONS mezcla parámetros de libpq (sslmode, connect_timeout...) con
+        # opciones propias del backend de Django (pool, isolation_level,
+        # server_side_binding, assume_role...) que psycopg.connect rechaza
+        opciones = bd.get('OPTIONS', {})
+        libpq = self._parametros_libpq()
+        parametros.update({clave: valor for clave, valor in opciones.items() if clave in libpq})
+        ignoradas = sorted(set(opciones) - libpq)
+        if ignoradas and not self._aviso_opciones:
+            self._aviso_opciones = True
+            logger.warning("El pool asíncrono ignora las opciones de DATABASES que no son de libpq: %s", ignoradas)
+        return {clave: valor for clave, valor in parametros.items() if valor not in (None, '')}
+
+    @staticmethod
+    @functools.cache
+    def _parametros_libpq() -> frozenset:
+        # Las palabras clave que acepta la libpq instalada
+        from psycopg import pq
+        return frozenset(opcion.keyword.decode() for opcion in pq.Conninfo.get_defaults())
+
+    def _preparar_bucle(self) -> asyncio.Condition:
+        bucle = asyncio.get_running_loop()
+        if self._espera is None or self._bucle is not bucle:
+            # Las conexiones de otro bucle no se pueden usar desde este
+            self._bucle = bucle
+            self._libres = []
+            self._abiertas = 0
+            self._espera = asyncio.Condition()
+        return self._espera
+
+    async def _tomar(self):
+        import psycopg
+
+        espera = self._preparar_bucle()
+        async with espera:
+            while not self._libres and self._abiertas >= self.maximo:
+                self._contadores['esperas'] += 1
+                await espera.wait()
+            if self._libres:
+                return self._libres.pop()
+            self._abiertas += 1
+
+        try:
+            return await psycopg.AsyncConnection.connect(autocommit=True, **self._parametros())
+        except Exception:
+            async with espera:
+                self._abiertas -= 1
+                espera.notify()
+            raise
+
+    async def _devolver(self, conexion) -> None:
+        from psycopg.pq import TransactionStatus
+
+        espera = self._espera
+        if conexion.closed or conexion.info.transaction_status != TransactionStatus.IDLE:
+            # Rota o con una transacción a medias: no se reutiliza
+            self._contadores['descartadas'] += 1
+            try:
+                await conexion.close()
+            except Exception:
+                pass
+            async with espera:
+                self._abiertas -= 1
+                espera.notify()
+            return
+        async with espera:
+            self._libres.append(conexion)
+            espera.notify()
+
+    @asynccontextmanager
+    async def conexion(self):
+        """Presta una conexión del pool y la devuelve al salir."""
+        conexion = await self._tomar()
+        self._contadores['prestamos'] += 1
+        try:
+            yield conexion
+        finally:
+            await self._devolver(conexion)
+
+    async def cerrar(self) -> None:
+        """Cierra las conexiones libres (al terminar el bucle de eventos)."""
+        libres, self._libres = self._libres, []
+        for conexion in libres:
+            self._abiertas -= 1
+            try:
+                await conexion.close()
+            except Exception as e:
+                logger.debug("Error cerrando conexión del pool: %s", e)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Instantánea de los contadores de este proceso."""
+        datos = dict(self._contadores)
+        datos['abiertas'] = self._abiertas
+        datos['libres'] = len(self._libres)
+        datos['maximo'] = self.maximo
+        return datos
+
+
+pool_registro = PoolAsync()
+
+
+class PoolHilosBD:
+    """
+    Executor acotado para el trabajo síncrono con la base de datos de los
+    consumers y del registro.
+
+    El executor por defecto de asgiref con ``thread_sensitive=True`` atiende
+    todas esas llamadas en un solo hilo; aquí corren en paralelo en hasta
+    ``tamano()`` hilos, cada uno con su conexión. Igual que
+    ``database_sync_to_async``, cierra las conexiones caducadas antes y
+    después de cada llamada.
+    """
+
+    MUESTRAS = 512
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tamano = 0
+        self._lock = threading.Lock()
+        self._en_cola = 0
+        self._en_curso = 0
+        self._esperas_ms = deque(maxlen=self.MUESTRAS)
+        self._funciones: Dict[str, Dict[str, Any]] = {}
+
+    def tamano(self) -> int:
+        """
+        Hilos del pool: WS_BD_HILOS, recortado para que este pool, el pool
+        asíncrono del registro nativo y el hilo de las vistas síncronas de
+        Django no pasen de BD_CONEXIONES_POR_WORKER conexiones.
+        """
+        deseado = getattr(settings, 'WS_BD_HILOS', 8)
+        presupuesto = getattr(settings, 'BD_CONEXIONES_POR_WORKER', 20) - 1
+        if getattr(settings, 'REGISTRO_MODO', 'hilo') == 'nativo':
+            presupuesto -= getattr(settings, 'REGISTRO_POOL_ASYNC', 10)
+        return max(1, min(deseado, presupuesto))
+
+    def _obtener_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._tamano = self.tamano()
+                    if self._tamano < getattr(settings, 'WS_BD_HILOS', 8):
+                        logger.warning(
+                            "Pool de hilos de BD recortado a %s por BD_CONEXIONES_POR_WORKER", self._tamano
+                        )
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._tamano, thread_name_prefix='bd-consumer'
+                    )
+        return self._executor
+
+    def _funcion(self, nombre: str) -> Dict[str, Any]:
+        # Llamar con self._lock tomado
+        funcion = self._funciones.get(nombre)
+        if funcion is None:
+            funcion = self._funciones[nombre] = {
+                'llamadas': 0, 'errores': 0, 'duraciones': deque(maxlen=self.MUESTRAS)
+            }
+        return funcion
+
+    async def ejecutar(self, func: Callable, *args, **kwargs) -> Any:
+        """Ejecuta ``func(*args, **kwargs)`` en el pool y espera su resultado."""
+        nombre = _nombre(func)
+        encolado = time.perf_counter()
+        with self._lock:
+            self._en_cola += 1
+
+        def en_hilo():
+            inicio = time.perf_counter()
+            with self._lock:
+                self._en_cola -= 1
+                self._en_curso += 1
+            close_old_connections()
+            error = False
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                close_old_connections()
+                fin = time.perf_counter()
+                with self._lock:
+                    self._en_curso -= 1
+                    self._esperas_ms.append((inicio - encolado) * 1000)
+                    funcion = self._funcion(nombre)
+                    funcion['llamadas'] += 1
+                    funcion['errores'] += error
+                    funcion['duraciones'].append((fin - inicio) * 1000)
+
+        return await asyncio.get_running_loop().run_in_executor(self._obtener_executor(), en_hilo)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Instantánea de los medidores de este proceso (tiempos en ms)."""
+        with self._lock:
+            esperas = sorted(self._esperas_ms)
+            funciones = {
+                nombre: {
+                    'llamadas': datos['llamadas'],
+                    'errores': datos['errores'],
+                    **_percentiles(sorted(datos['duraciones'])),
+                }
+                for nombre, datos in self._funciones.items()
+            }
+            return {
+                'hilos': self._tamano or self.tamano(),
+                'en_cola': self._en_cola,
+                'en_curso': self._en_curso,
+                'espera_ms': _percentiles(esperas),
+                'funciones': funciones,
+            }
+
+
+def _nombre(func: Callable) -> str:
+    # Las vistas de Django (as_view) se identifican por su clase
+    vista = getattr(func, 'view_class', None)
+    if vista is not None:
+        return vista.__name__
+    return getattr(func, '__qualname__', repr(func))
+
+
+def _percentiles(valores: List[float]) -> Dict[str, float]:
+    if not valores:
+        return {'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    return {
+        'p50': round(valores[len(valores) // 2], 2),
+        'p95': round(valores[min(len(valores) - 1, int(len(valores) * 0.95))], 2),
+        'max': round(valores[-1], 2),
+    }
+
+
+pool_bd = PoolHilosBD()
+
+
+def en_pool_bd(func: Callable) -> Callable:
+    """
+    Decorador equivalente a ``database_sync_to_async`` que ejecuta la función
+    en el pool acotado ``pool_bd``. Sirve también para métodos.
+    """
+    @functools.wraps(func)
+    async def envoltura(*args, **kwargs):
+        return await pool_bd.ejecutar(func, *args, **kwargs)
+    return envoltura
@@ -1,171 +1,249 @@
 """
 Módulo: idempotency
-Utilidades para garantizar idempotencia en operaciones de registro de tiempos.
+Claves de idempotencia (cabecera ``Idempotency-Key``) para los envíos de
+registros de tiempo.
 
 Características:
-- Generar hash único por registro
-- Verificar duplicados
-- Limpiar registros antiguos
+- La primera respuesta de cada (juez, clave) se guarda en la caché
+  compartida ('default', Redis) durante IDEMPOTENCIA_TTL segundos
+- Un reintento con la misma clave y el mismo cuerpo recibe la respuesta
+  guardada sin tocar la base de datos (cabecera ``Idempotent-Replayed``)
+- El juez sale de la firma del token, sin consultar la base de datos
+- Misma clave con otro cuerpo u otra ruta: 422; con el primer envío aún en
+  curso: 409 con Retry-After
+- Las respuestas 5xx no se guardan: el reintento vuelve a ejecutarse
+- Sin cabecera, o si la caché no responde, la vista se ejecuta como siempre
 """
 
 import hashlib
-import json
-from typing import Dict, Any, Optional
-from datetime import timedelta
-from django.utils import timezone
+import logging
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple
 
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse, HttpResponse
 
-def generar_hash_registro(equipo_id: int, tiempo: int, timestamp: str = None) -> str:
-    """
-    Genera un hash único para un registro de tiempo basado en sus datos.
-    
-    Args:
-        equipo_id: ID del equipo
-        tiempo: Tiempo en milisegundos
-        timestamp: Timestamp ISO opcional
-        
-    Returns:
-        String hash SHA256
-    """
-    datos = {
-        'equipo_id': equipo_id,
-        'tiempo': tiempo,
-        'timestamp': timestamp or timezone.now().isoformat()
-    }
-    
-    datos_str = json.dumps(datos, sort_keys=True)
-    return hashlib.sha256(datos_str.encode()).hexdigest()
+logger = logging.getLogger(__name__)
+
+CABECERA = 'Idempotency-Key'
+CABECERA_REPETIDA = 'Idempotent-Replayed'
+LONGITUD_MAXIMA = 255
+# Lo que puede durar un envío antes de que otro intento con la misma clave lo
+# dé por perdido
+TIMEOUT_EN_CURSO = 60
+EN_CURSO = 'en_curso'
+
+
+def _cache():
+    return caches['default']
 
 
-def verificar_duplicado(
-    equipo_id: int,
-    tiempo: int,
-    competencia_id: int,
-    ventana_minutos: int = 5
-) -> Optional[Any]:
+def _ttl() -> int:
+    return getattr(settings, 'IDEMPOTENCIA_TTL', 86400)
+
+
+def juez_del_token(request) -> Optional[int]:
     """
-    Verifica si existe un registro duplicado reciente.
-    
-    Args:
-        equipo_id: ID del equipo
-        tiempo: Tiempo en milisegundos
-        competencia_id: ID de la competencia
-        ventana_minutos: Ventana de tiempo en minutos para considerar duplicado
-        
+    Obtiene el ``juez_id`` del token Bearer validando solo firma y expiración.
+
     Returns:
-        RegistroTiempo si se encuentra duplicado, None en caso contrario
+        ID del juez o None si no hay token válido
     """
-    from app.models import RegistroTiempo
-    
-    # Calcular ventana de tiempo
-    tiempo_limite = timezone.now() - timedelta(minutes=ventana_minutos)
-    
-    # Buscar registros similares recientes
-    # Consideramos duplicado si el tiempo es exactamente igual y está en la ventana
-    registro_existente = RegistroTiempo.objects.filter(
-        equipo_id=equipo_id,
-        tiempo=tiempo,
-        competencia_id=competencia_id,
-        timestamp__gte=tiempo_limite
-    ).first()
-    
-    return registro_existente
-
-
-def limpiar_registros_antiguos(dias: int = 90) -> int:
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    tipo, _, token = request.headers.get('Authorization', '').partition(' ')
+    if tipo != 'Bearer' or not token:
+        return None
+    try:
+        return AccessToken(token).get('juez_id')
+    except Exception:
+        return None
+
+
+def preparar(request, ambito: str) -> Tuple[Optional[str], Optional[str], Optional[HttpResponse]]:
     """
-    Limpia registros de tiempos más antiguos que el número de días especificado.
-    
+    Calcula la clave de caché y la huella del envío.
+
     Args:
-        dias: Número de días de antigüedad para considerar un registro como antiguo
-        
+        request: HttpRequest con la cabecera Idempotency-Key
+        ambito: Nombre corto del endpoint
+
     Returns:
-        Número de registros eliminados
-    """
-    from app.models import RegistroTiempo
-    
-    fecha_limite = timezone.now() - timedelta(days=dias)
-    
-    # Eliminar solo registros de competencias finalizadas
-    registros_antiguos = RegistroTiempo.objects.filter(
-        timestamp__lt=fecha_limite,
-        competencia__en_curso=False
-    )
-    
-    count = registros_antiguos.count()
-    registros_antiguos.delete()
-    
-    return count
-
-
-def generar_id_idempotente(equipo_id: int, juez_id: int, tiempo: int) -> str:
+        Tupla (clave, huella, respuesta de error). Clave None si la petición
+        no usa idempotencia.
     """
-    Genera un ID idempotente para evitar duplicados en el mismo request.
-    
-    Args:
-        equipo_id: ID del equipo
-        juez_id: ID del juez
-        tiempo: Tiempo en milisegundos
-        
-    Returns:
-        String hash único
+    valor = request.headers.get(CABECERA)
+    if valor is None or request.method != 'POST':
+        return None, None, None
+    valor = valor.strip()
+    if not valor or len(valor) > LONGITUD_MAXIMA or not valor.isprintable():
+        return None, None, JsonResponse(
+            {"exito": False, "error": f"{CABECERA} debe tener entre 1 y {LONGITUD_MAXIMA} caracteres imprimibles"},
+            status=400
+        )
+
+    juez_id = juez_del_token(request)
+    if juez_id is None:
+        # Sin juez identificable la vista responderá 401
+        return None, None, None
+
+    clave = 'idempotencia:{}:{}'.format(juez_id, hashlib.sha256(valor.encode()).hexdigest())
+    huella = hashlib.sha256(f'{ambito}:{request.path}:'.encode() + request.body).hexdigest()
+    return clave, huella, None
+
+
+def resolver_existente(entrada: Optional[Dict[str, Any]], huella: str) -> Optional[HttpResponse]:
     """
-    datos = f"{juez_id}:{equipo_id}:{tiempo}:{timezone.now().timestamp()}"
-    return hashlib.md5(datos.encode()).hexdigest()
+    Traduce una entrada ya guardada a la respuesta del reintento.
 
-
-def es_registro_valido(tiempo: int, min_tiempo: int = 0, max_tiempo: int = 86400000) -> bool:
-    """
-    Valida que un tiempo esté dentro de rangos razonables.
-    
-    Args:
-        tiempo: Tiempo en milisegundos
-        min_tiempo: Tiempo mínimo permitido (default: 0ms)
-        max_tiempo: Tiempo máximo permitido (default: 24 horas en ms)
-        
     Returns:
-        bool: True si el tiempo es válido
+        Respuesta guardada, 409 si el envío original sigue en curso, 422 si
+        la clave se usó con otro envío, o None si la entrada caducó
     """
-    return min_tiempo <= tiempo <= max_tiempo
+    if entrada is None:
+        return None
+    if entrada['huella'] != huella:
+        return JsonResponse(
+            {"exito": False, "error": f"{CABECERA} ya se usó con otro envío"},
+            status=422
+        )
+    if entrada['estado'] == EN_CURSO:
+        respuesta = JsonResponse(
+            {"exito": False, "error": "Un envío con la misma clave de idempotencia está en curso"},
+            status=409
+        )
+        respuesta['Retry-After'] = '1'
+        return respuesta
+
+    respuesta = HttpResponse(entrada['contenido'], status=entrada['status'], content_type=entrada['content_type'])
+    respuesta[CABECERA_REPETIDA] = 'true'
+    return respuesta
+
+
+def _entrada_en_curso(huella: str) -> Dict[str, Any]:
+    return {'estado': EN_CURSO, 'huella': huella}
+
+
+def _entrada_final(respuesta, huella: str) -> Optional[Dict[str, Any]]:
+    # Las respuestas de DRF se renderizan antes de guardarlas
+    if hasattr(respuesta, 'render') and not getattr(respuesta, 'is_rendered', True):
+        respuesta.render()
+    if respuesta.status_code >= 500 or getattr(respuesta, 'streaming', False):
+        return None
+    return {
+        'estado': 'completo',
+        'huella': huella,
+        'status': respuesta.status_code,
+        'contenido': respuesta.content,
+        'content_type': respuesta.get('Content-Type', 'application/json'),
+    }
 
 
-def normalizar_tiempo(horas: int, minutos: int, segundos: int, milisegundos: int) -> int:
-    """
-    Normaliza componentes de tiempo a milisegundos totales.
-    
-    Args:
-        horas: Componente de horas
-        minutos: Componente de minutos
-        segundos: Componente de segundos
-        milisegundos: Componente de milisegundos
-        
-    Returns:
-        Tiempo total en milisegundos
+def idempotente(ambito: str):
     """
-    total_segundos = (horas * 3600) + (minutos * 60) + segundos
-    return (total_segundos * 1000) + milisegundos
+    Decorador para vistas POST de registro (síncronas o asíncronas).
 
+    El reintento de un envío que ya terminó se responde desde la caché
+    compartida, antes de autenticar contra la base de datos o abrir una
+    transacción. Cada envío reserva su clave con ``add`` (atómico en Redis),
+    así dos intentos simultáneos no se ejecutan los dos.
 
-def descomponer_tiempo(tiempo_ms: int) -> Dict[str, int]:
-    """
-    Descompone un tiempo en milisegundos a sus componentes.
-    
     Args:
-        tiempo_ms: Tiempo en milisegundos
-        
-    Returns:
-        Dict con componentes: horas, minutos, segundos, milisegundos
+        ambito: Nombre corto del endpoint, forma parte de la huella del envío
     """
-    ms = tiempo_ms % 1000
-    total_seconds = tiempo_ms // 1000
-    s = total_seconds % 60
-    total_minutes = total_seconds // 60
-    m = total_minutes % 60
-    h = total_minutes // 60
-    
-    return {
-        'horas': h,
-        'minutos': m,
-        'segundos': s,
-        'milisegundos': ms
-    }
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_async(request, *args, **kwargs):
+                clave, huella, error = preparar(request, ambito)
+                if error is not None:
+                    return error
+                if clave is None:
+                    return await vista(request, *args, **kwargs)
+
+                cache = _cache()
+                try:
+                    if not await cache.aadd(clave, _entrada_en_curso(huella), TIMEOUT_EN_CURSO):
+                        respuesta = resolver_existente(await cache.aget(clave), huella)
+                        if respuesta is not None:
+                            return respuesta
+                        await cache.aset(clave, _entrada_en_curso(huella), TIMEOUT_EN_CURSO)
+                except Exception as e:
+                    logger.warning("Caché de idempotencia no disponible: %s", e)
+                    return await vista(request, *args, **kwargs)
+
+                try:
+                    respuesta = await vista(request, *args, **kwargs)
+                except BaseException:
+                    await _aliberar(cache, clave)
+                    raise
+                await _aguardar(cache, clave, respuesta, huella)
+                return respuesta
+            return envoltura_async
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            clave, huella, error = preparar(request, ambito)
+            if error is not None:
+                return error
+            if clave is None:
+                return vista(request, *args, **kwargs)
+
+            cache = _cache()
+            try:
+                if not cache.add(clave, _entrada_en_curso(huella), TIMEOUT_EN_CURSO):
+                    respuesta = resolver_existente(cache.get(clave), huella)
+                    if respuesta is not None:
+                        return respuesta
+                    cache.set(clave, _entrada_en_curso(huella), TIMEOUT_EN_CURSO)
+            except Exception as e:
+                logger.warning("Caché de idempotencia no disponible: %s", e)
+                return vista(request, *args, **kwargs)
+
+            try:
+                respuesta = vista(request, *args, **kwargs)
+            except BaseException:
+                _liberar(cache, clave)
+                raise
+            _guardar(cache, clave, respuesta, huella)
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def _guardar(cache, clave: str, respuesta, huella: str) -> None:
+    entrada = _entrada_final(respuesta, huella)
+    if entrada is None:
+        _liberar(cache, clave)
+        return
+    try:
+        cache.set(clave, entrada, _ttl())
+    except Exception as e:
+        logger.warning("No se pudo guardar la respuesta idempotente: %s", e)
+
+
+def _liberar(cache, clave: str) -> None:
+    try:
+        cache.delete(clave)
+    except Exception as e:
+        logger.warning("No se pudo liberar la clave de idempotencia: %s", e)
+
+
+async def _aguardar(cache, clave: str, respuesta, huella: str) -> None:
+    entrada = _entrada_final(respuesta, huella)
+    if entrada is None:
+        await _aliberar(cache, clave)
+        return
+    try:
+        await cache.aset(clave, entrada, _ttl())
+    except Exception as e:
+        logger.warning("No se pudo guardar la respuesta idempotente: %s", e)
+
+
+async def _aliberar(cache, clave: str) -> None:
+    try:
+        await cache.adelete(clave)
+    except Exception as e:
+        logger.warning("No se pudo liberar la clave de idempotencia: %s", e)
@@ -0,0 +1,151 @@
+"""
+Módulo: render_cache
+Caché compartida del HTML público de resultados.
+
+Características:
+- Versión por competencia que se incrementa al guardar tiempos o al cambiar su estado
+- HTML renderizado por (vista, competencia, categoría, versión)
+- Dos niveles: memoria local del proceso y Redis (caché 'default')
+- ETag por versión para responder 304 sin tocar la base de datos
+"""
+
+import hashlib
+import logging
+from functools import wraps
+from typing import Optional, Tuple
+
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_LOCAL = 60
+TIMEOUT_COMPARTIDO = 300
+
+
+def _cache_compartida():
+    return caches['default']
+
+
+def _cache_local():
+    return caches['local']
+
+
+def _clave_version(competencia_id: int) -> str:
+    return f'render:competencia:{competencia_id}:version'
+
+
+def obtener_version(competencia_id: int) -> int:
+    """
+    Obtiene la versión actual del contenido público de una competencia.
+
+    Args:
+        competencia_id: ID de la competencia
+
+    Returns:
+        Número de versión (0 si nunca se modificó)
+    """
+    return _cache_compartida().get_or_set(_clave_version(competencia_id), 0, None)
+
+
+def incrementar_version(competencia_id: int) -> None:
+    """
+    Marca como obsoleto todo el HTML cacheado de una competencia.
+
+    Args:
+        competencia_id: ID de la competencia
+    """
+    cache = _cache_compartida()
+    clave = _clave_version(competencia_id)
+    try:
+        cache.add(clave, 0, None)
+        cache.incr(clave)
+    except Exception as e:
+        logger.warning("No se pudo incrementar la versión de render (competencia=%s): %s", competencia_id, e)
+
+
+def obtener_render(clave: str) -> Optional[Tuple[bytes, str]]:
+    """
+    Busca un render en memoria local y, si no está, en Redis.
+    Un acierto en Redis se copia a memoria local.
+
+    Returns:
+        Tupla (contenido, content_type) o None
+    """
+    local = _cache_local()
+    render = local.get(clave)
+    if render is not None:
+        return render
+
+    render = _cache_compartida().get(clave)
+    if render is not None:
+        local.set(clave, render, TIMEOUT_LOCAL)
+    return render
+
+
+def guardar_render(clave: str, contenido: bytes, content_type: str) -> None:
+    """Guarda un render en ambos niveles de caché."""
+    render = (contenido, content_type)
+    _cache_local().set(clave, render, TIMEOUT_LOCAL)
+    _cache_compartida().set(clave, render, TIMEOUT_COMPARTIDO)
+
+
+def cachear_por_version(nombre_vista: str):
+    """
+    Decorador para vistas públicas de competencia ``vista(request, pk)``.
+
+    El HTML es el mismo para todos los espectadores de un par
+    (competencia, categoría), así que se reutiliza mientras la versión de la
+    competencia no cambie. El navegador revalida con If-None-Match y recibe
+    304 si la versión sigue siendo la misma.
+
+    Args:
+        nombre_vista: Nombre corto que distingue las claves de cada vista
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, pk, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return vista(request, pk, *args, **kwargs)
+
+            categoria = request.GET.get('categoria', '')
+            try:
+                version = obtener_version(pk)
+            except Exception as e:
+                logger.warning("Caché de render no disponible: %s", e)
+                return vista(request, pk, *args, **kwargs)
+
+            huella = hashlib.sha1(f'{nombre_vista}:{pk}:{categoria}:{version}'.encode()).hexdigest()[:16]
+            etag = f'"{huella}"'
+
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                respuesta = HttpResponseNotModified()
+                respuesta['ETag'] = etag
+                return respuesta
+
+            clave = f'render:{huella}'
+            try:
+                render = obtener_render(clave)
+            except Exception as e:
+                logger.warning("Caché de render no disponible: %s", e)
+                render = None
+
+            if render is not None:
+                contenido, content_type = render
+                respuesta = HttpResponse(contenido, content_type=content_type)
+            else:
+                respuesta = vista(request, pk, *args, **kwargs)
+                if respuesta.status_code != 200:
+                    return respuesta
+                try:
+                    guardar_render(clave, respuesta.content, respuesta['Content-Type'])
+                except Exception as e:
+                    logger.warning("No se pudo guardar el render: %s", e)
+
+            respuesta['ETag'] = etag
+            # El navegador siempre revalida; el ETag cambia con cada versión.
+            respuesta['Cache-Control'] = 'no-cache'
+            return respuesta
+        return envoltura
+    return decorador
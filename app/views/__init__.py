@@ -8,7 +8,7 @@ from .competencia_views import CompetenciaViewSet
 from .equipo_views import EquipoViewSet
 from .html_views import competencia_list_view, competencia_detail_view, competencia_results_partial_view, equipo_detail_view
 from .admin_views import EstadoCompetenciaAdminView
-from .registro_views import RegistrarTiemposView, EstadoEquipoRegistrosView
+from .registro_views import RegistrarTiemposView, RegistrarTiemposEquiposView, EstadoEnvioRegistrosView, EstadoEquipoRegistrosView, SincronizarRegistrosView
 
 __all__ = [
     'LoginView',
@@ -23,5 +23,8 @@ __all__ = [
     'equipo_detail_view',
     'EstadoCompetenciaAdminView',
     'RegistrarTiemposView',
+    'RegistrarTiemposEquiposView',
+    'EstadoEnvioRegistrosView',
     'EstadoEquipoRegistrosView',
+    'SincronizarRegistrosView',
 ]
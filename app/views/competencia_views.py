@@ -3,12 +3,20 @@ Módulo: competencia_views
 ViewSets relacionados con la gestión de competencias.
 """
 
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 from app.serializers import CompetenciaSerializer
 from app.models import Competencia
+from app.models.equipo import CATEGORIA_CHOICES
+from app.auth import asignaciones
+from app.services import ResultsService
+
+
+TAMANO_PAGINA_MAXIMO = 100
 
 
 class CompetenciaViewSet(viewsets.ReadOnlyModelViewSet):
@@ -20,6 +28,9 @@ class CompetenciaViewSet(viewsets.ReadOnlyModelViewSet):
     Filtros disponibles:
     - ?activa=true/false - Filtra por competencias activas
     - ?en_curso=true/false - Filtra por competencias en curso
+
+    Acciones adicionales:
+    - GET /competencias/{id}/ranking/?categoria=&pagina=&tamano= - Ranking paginado
     """
     queryset = Competencia.objects.all().order_by('-datetime')
     serializer_class = CompetenciaSerializer
@@ -62,6 +73,80 @@ class CompetenciaViewSet(viewsets.ReadOnlyModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
     
+    @extend_schema(
+        summary="Ranking de la competencia",
+        description=(
+            "Obtiene el ranking de equipos calculado en una sola consulta. "
+            "Los equipos descalificados aparecen al final sin posición."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name='categoria',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Filtrar por categoría',
+                required=False,
+                enum=[codigo for codigo, _ in CATEGORIA_CHOICES],
+            ),
+            OpenApiParameter(
+                name='pagina',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description='Número de página (default: 1)',
+                required=False,
+            ),
+            OpenApiParameter(
+                name='tamano',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description=f'Equipos por página (default: todos, máx: {TAMANO_PAGINA_MAXIMO})',
+                required=False,
+            ),
+        ],
+        responses={
+            200: {'description': 'Ranking de la competencia'},
+            400: {'description': 'Parámetros inválidos'},
+            404: {'description': 'Competencia no encontrada'},
+        },
+        tags=['Competencias']
+    )
+    @action(detail=True, methods=['get'], url_path='ranking')
+    def ranking(self, request, pk=None):
+        competencia = self.get_object()
+
+        categoria = request.query_params.get('categoria', '')
+        if categoria and categoria not in dict(CATEGORIA_CHOICES):
+            return Response(
+                {'error': f'Categoría inválida: {categoria}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            pagina = int(request.query_params.get('pagina', 1))
+            tamano = request.query_params.get('tamano')
+            tamano = int(tamano) if tamano else None
+        except ValueError:
+            return Response(
+                {'error': 'pagina y tamano deben ser números enteros'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if pagina < 1 or (tamano is not None and not 1 <= tamano <= TAMANO_PAGINA_MAXIMO):
+            return Response(
+                {'error': f'pagina debe ser >= 1 y tamano entre 1 y {TAMANO_PAGINA_MAXIMO}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultado = ResultsService().obtener_ranking_competencia(
+            competencia.id,
+            categoria=categoria,
+            pagina=pagina,
+            tamano_pagina=tamano
+        )
+        if not resultado['exito']:
+            return Response(resultado, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(resultado)
+
     def get_queryset(self):
         """
         Permite filtrar competencias por is_active y is_running.
@@ -72,8 +157,9 @@ class CompetenciaViewSet(viewsets.ReadOnlyModelViewSet):
         # Filtrar por la competencia del equipo del juez autenticado
         juez = self.request.user
         # Si es un juez autenticado, filtrar por las competencias de sus equipos
+        # (ids ya cargados por la autenticación)
         if hasattr(juez, 'teams'):
-            competition_ids = juez.teams.values_list('competition_id', flat=True)
+            competition_ids = asignaciones(juez)['competencia_ids']
             queryset = queryset.filter(id__in=competition_ids)
         else:
             # Si el juez no tiene equipo asignado, no mostrar ninguna competencia
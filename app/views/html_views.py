@@ -4,9 +4,11 @@ Vistas HTML para la interfaz web pública.
 """
 
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Prefetch
-from app.models import Competencia, Equipo, RegistroTiempo
+from app.models import Competencia, Equipo
 from app.models.equipo import CATEGORIA_CHOICES
+from app.services.leaderboard_service import LeaderboardService
+from app.utils.render_cache import cachear_por_version
+from app.websocket.codificacion import CLAVES_LARGAS
 
 
 def competencia_list_view(request):
@@ -15,61 +17,7 @@ def competencia_list_view(request):
     return render(request, 'app/competencia_list.html', {'competencias': competencias})
 
 
-def _procesar_equipos(equipos_queryset):
-    """Procesa los equipos y calcula tiempos, posiciones y descalificaciones."""
-    equipos_calificados = []
-    equipos_descalificados = []
-    
-    for equipo in equipos_queryset:
-        tiempos_competencia = [t for t in equipo.prefetched_tiempos]
-
-        # IMPORTANTE UX: si todavía no hay registros enviados para este equipo,
-        # no se muestra en resultados (pantalla vacía hasta el primer envío).
-        if not tiempos_competencia:
-            continue
-        
-        # Detectar jugadores ausentes (tiempo = 0 ms)
-        jugadores_ausentes = sum(1 for t in tiempos_competencia if t.time == 0)
-        equipo.jugadores_ausentes = jugadores_ausentes
-        equipo.descalificado = jugadores_ausentes > 0
-        
-        equipo.tiempo_total_ms = sum(t.time for t in tiempos_competencia)
-        equipo.mejor_tiempo_ms = min(t.time for t in tiempos_competencia if t.time > 0) if any(t.time > 0 for t in tiempos_competencia) else 0
-        
-        # Formatear sin milisegundos
-        total_seconds = equipo.tiempo_total_ms // 1000
-        s = total_seconds % 60
-        total_minutes = total_seconds // 60
-        m = total_minutes % 60
-        h = total_minutes // 60
-        equipo.tiempo_total_formateado = f"{h:02d}:{m:02d}:{s:02d}"
-        
-        # Mejor tiempo sin milisegundos
-        mejor_seconds = equipo.mejor_tiempo_ms // 1000
-        mejor_s = mejor_seconds % 60
-        mejor_m = (mejor_seconds // 60) % 60
-        mejor_h = mejor_seconds // 3600
-        equipo.mejor_tiempo_formateado = f"{mejor_h:02d}:{mejor_m:02d}:{mejor_s:02d}"
-        
-        equipo.num_registros = len(equipo.prefetched_tiempos)
-        equipo.jugadores_completados = equipo.num_registros - jugadores_ausentes
-        
-        if equipo.descalificado:
-            equipos_descalificados.append(equipo)
-        else:
-            equipos_calificados.append(equipo)
-    
-    # Ordenar calificados por tiempo total (menor a mayor)
-    equipos_calificados.sort(key=lambda e: e.tiempo_total_ms if e.tiempo_total_ms > 0 else float('inf'))
-    equipos_descalificados.sort(key=lambda e: e.tiempo_total_ms)
-    
-    # Asignar posiciones
-    for idx, equipo in enumerate(equipos_calificados, 1):
-        equipo.posicion = idx
-    
-    return equipos_calificados, equipos_descalificados
-
-
+@cachear_por_version('detalle')
 def competencia_detail_view(request, pk):
     """Detalle de competencia con resultados en tiempo real y filtro por categoría."""
     competencia = get_object_or_404(Competencia, pk=pk, is_active=True)
@@ -77,20 +25,10 @@ def competencia_detail_view(request, pk):
     # Obtener filtro de categoría desde query params
     categoria_filtro = request.GET.get('categoria', '')
     
-    # Obtener equipos con tiempos
-    tiempos_qs = RegistroTiempo.objects.all().order_by('time')
-    equipos_qs = Equipo.objects.filter(
-        competition=competencia
-    ).select_related('judge').prefetch_related(
-        Prefetch('times', queryset=tiempos_qs, to_attr='prefetched_tiempos')
-    )
-    
-    # Aplicar filtro de categoría si existe
-    if categoria_filtro:
-        equipos_qs = equipos_qs.filter(category=categoria_filtro)
-    
-    # Procesar equipos
-    equipos_calificados, equipos_descalificados = _procesar_equipos(equipos_qs)
+    # Clasificación precalculada (se actualiza de forma incremental al guardar tiempos)
+    instantanea = LeaderboardService().obtener_instantanea(competencia.id, categoria_filtro)
+    equipos_calificados = instantanea['calificados']
+    equipos_descalificados = instantanea['descalificados']
     equipos_list = equipos_calificados + equipos_descalificados
     
     # Obtener categorías disponibles en esta competencia
@@ -113,28 +51,24 @@ def competencia_detail_view(request, pk):
         'total_equipos': len(equipos_list),
         'categorias': categorias,
         'categoria_filtro': categoria_filtro,
+        'clasificacion': {'seq': instantanea['seq'], 'equipos': equipos_list},
+        # La página recibe el WebSocket en formato compacto (claves cortas)
+        'claves_compactas': CLAVES_LARGAS,
     }
 
     return render(request, 'app/competencia_detail.html', context)
 
 
+@cachear_por_version('parcial')
 def competencia_results_partial_view(request, pk):
     """Partial HTML del bloque de resultados para refresco en tiempo real por WebSocket."""
     competencia = get_object_or_404(Competencia, pk=pk, is_active=True)
 
     categoria_filtro = request.GET.get('categoria', '')
 
-    tiempos_qs = RegistroTiempo.objects.all().order_by('time')
-    equipos_qs = Equipo.objects.filter(
-        competition=competencia
-    ).select_related('judge').prefetch_related(
-        Prefetch('times', queryset=tiempos_qs, to_attr='prefetched_tiempos')
-    )
-
-    if categoria_filtro:
-        equipos_qs = equipos_qs.filter(category=categoria_filtro)
-
-    equipos_calificados, equipos_descalificados = _procesar_equipos(equipos_qs)
+    instantanea = LeaderboardService().obtener_instantanea(competencia.id, categoria_filtro)
+    equipos_calificados = instantanea['calificados']
+    equipos_descalificados = instantanea['descalificados']
     equipos_list = equipos_calificados + equipos_descalificados
 
     return render(request, 'app/partials/competencia_results.html', {
@@ -145,6 +79,7 @@ def competencia_results_partial_view(request, pk):
         'en_curso': competencia.is_running,
         'total_equipos': len(equipos_list),
         'categoria_filtro': categoria_filtro,
+        'clasificacion': {'seq': instantanea['seq'], 'equipos': equipos_list},
     })
 
 
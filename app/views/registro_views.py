@@ -2,19 +2,29 @@
 Módulo: registro_views
 Vistas API REST para el registro de tiempos.
 Implementa endpoints HTTP para enviar registros (más confiable que WebSocket).
+El POST de registros admite un camino asíncrono nativo (REGISTRO_MODO='nativo').
+Un juez puede enviar los lotes de todos sus equipos en una sola petición.
+Los POST de registros aceptan la cabecera Idempotency-Key.
+Con REGISTRO_MODO='cola' el registro responde 202 y se consulta su estado.
 """
 
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db import transaction
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple
+import json
 import uuid
 import logging
 
 from app.models import Equipo, RegistroTiempo, Juez
+from app.utils.bd_async import pool_bd
+from app.utils.idempotency import idempotente
 
 logger = logging.getLogger(__name__)
 
@@ -54,7 +64,32 @@ class RegistrarTiemposView(APIView):
     
     permission_classes = [IsAuthenticated]
     MAX_REGISTROS = 15
+
+    # Rechazos del lote completo: código del servicio -> (status HTTP, mensaje)
+    RECHAZOS = {
+        'sin_equipos': (status.HTTP_403_FORBIDDEN, "No tienes equipos asignados"),
+        'equipo_inexistente': (status.HTTP_404_NOT_FOUND, "Equipo {equipo_id} no existe"),
+        'equipo_ajeno': (status.HTTP_403_FORBIDDEN, "Este equipo no te pertenece"),
+        'competencia_detenida': (status.HTTP_400_BAD_REQUEST, "La competencia no está en curso"),
+        # Fallo de la base de datos: 5xx para que el cliente reintente el envío
+        'error': (status.HTTP_500_INTERNAL_SERVER_ERROR, "{error}"),
+    }
     
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """
+        Punto de entrada de la ruta: el despachador asíncrono
+        ``registrar_tiempos`` delante de la vista DRF síncrona. ``wraps``
+        conserva los atributos de la vista DRF (cls, initkwargs, csrf_exempt)
+        con los que drf-spectacular documenta el endpoint.
+        """
+        vista_hilo = super().as_view(**initkwargs)
+
+        @wraps(vista_hilo)
+        async def vista(request, *args, **kwargs):
+            return await registrar_tiempos(request, vista_hilo, *args, **kwargs)
+        return vista
+
     def post(self, request, equipo_id):
         juez = request.user
         
@@ -73,84 +108,18 @@ class RegistrarTiemposView(APIView):
         # Obtener registros del body
         registros = request.data.get('registros', [])
         
-        if not registros:
-            return Response(
-                {"exito": False, "error": "No se enviaron registros"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # VALIDACIÓN ESTRICTA: Deben ser exactamente 15 registros
-        if len(registros) != self.MAX_REGISTROS:
-            return Response(
-                {"exito": False, "error": f"Se requieren exactamente {self.MAX_REGISTROS} registros. Recibidos: {len(registros)}"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        error = self.validar_registros(registros)
+        if error:
+            return Response({"exito": False, "error": error}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            with transaction.atomic():
-                # Verificar que el juez tenga equipos asignados
-                equipos_juez = juez.teams.select_related('competition').all()
-                if not equipos_juez.exists():
-                    return Response(
-                        {"exito": False, "error": "No tienes equipos asignados"},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-                
-                # Verificar que la competencia esté en curso
-                competencia = equipos_juez.first().competition
-                if not competencia or not competencia.is_running:
-                    return Response(
-                        {"exito": False, "error": "La competencia no está en curso"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Obtener el equipo y verificar pertenencia
-                try:
-                    equipo = Equipo.objects.select_for_update().get(id=equipo_id)
-                except Equipo.DoesNotExist:
-                    return Response(
-                        {"exito": False, "error": f"Equipo {equipo_id} no existe"},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-                
-                if equipo.judge_id != juez.id:
-                    return Response(
-                        {"exito": False, "error": "Este equipo no te pertenece"},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-                
-                # Delegar creación en el servicio (usa bulk_create + idempotencia)
-                from app.services.registro_service import RegistroService
-                servicio = RegistroService()
-                # Usar versión SÍNCRONA para evitar problemas de conexión en vistas HTTP
-                resultado = servicio.registrar_batch_sync(juez=juez, equipo_id=equipo.id, registros=registros)
-
-                logger.info(
-                    "[HTTP] Registros procesados: guardados=%s fallidos=%s equipo=%s(%s) juez=%s(%s)",
-                    resultado['total_guardados'],
-                    resultado['total_fallidos'],
-                    equipo.name,
-                    equipo.id,
-                    juez.username,
-                    juez.id,
-                )
-
-                if resultado['total_guardados'] == 0 and resultado['total_fallidos'] > 0:
-                    return Response({"exito": False, "error": resultado['registros_fallidos']}, status=status.HTTP_400_BAD_REQUEST)
-
-                # Notificar por WebSocket a la UI pública
-                self._notificar_actualizacion(equipo, resultado['registros_guardados'])
-                
-                return Response({
-                    "exito": True,
-                    "mensaje": "Registros guardados exitosamente",
-                    "equipo_id": equipo.id,
-                    "equipo_nombre": equipo.name,
-                    "equipo_dorsal": equipo.number,
-                    "total_guardados": resultado['total_guardados'],
-                    "registros": resultado['registros_guardados'],
-                    "registros_fallidos": resultado['registros_fallidos'],
-                }, status=status.HTTP_201_CREATED)
+            # El servicio valida, bloquea el equipo e inserta en una sola transacción
+            from app.services.registro_service import RegistroService
+            servicio = RegistroService()
+            # Usar versión SÍNCRONA para evitar problemas de conexión en vistas HTTP
+            resultado = servicio.registrar_batch_sync(juez=juez, equipo_id=equipo_id, registros=registros)
+            cuerpo, codigo_http = self.construir_respuesta(resultado, equipo_id, juez)
+            return Response(cuerpo, status=codigo_http)
                 
         except Exception as e:
             logger.error(f"[HTTP] Error guardando registros: {str(e)}")
@@ -158,36 +127,354 @@ class RegistrarTiemposView(APIView):
                 {"exito": False, "error": f"Error interno: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def _notificar_actualizacion(self, equipo, registros):
+
+    @classmethod
+    def validar_registros(cls, registros) -> Optional[str]:
         """
-        Notifica a los clientes conectados que hay nuevos registros.
-        Esto permite actualizar la UI pública en tiempo real.
+        Retorna el error de validación del cuerpo, o None si es válido. Cada
+        registro se valida aquí (id_registro UUID, tiempo entero >= 0): en el
+        modo cola no llega a encolarse un envío que el worker no pueda guardar.
         """
-        try:
-            channel_layer = get_channel_layer()
-            if channel_layer:
-                competencia_group = f'competencia_{equipo.competition_id}'
-                
-                # Calcular tiempo total
-                tiempo_total = sum(r['tiempo'] for r in registros if not r.get('duplicado', False))
-                
-                async_to_sync(channel_layer.group_send)(
-                    competencia_group,
-                    {
-                        'type': 'registros_actualizados',
-                        'data': {
-                            'equipo_id': equipo.id,
-                            'equipo_nombre': equipo.name,
-                            'equipo_dorsal': equipo.number,
-                            'total_registros': len(registros),
-                            'tiempo_total': tiempo_total,
-                        }
-                    }
+        from app.services.registro_service import RegistroService
+
+        if not registros:
+            return "No se enviaron registros"
+        if not isinstance(registros, list):
+            return "'registros' debe ser una lista"
+        # VALIDACIÓN ESTRICTA: Deben ser exactamente 15 registros
+        if len(registros) != cls.MAX_REGISTROS:
+            return f"Se requieren exactamente {cls.MAX_REGISTROS} registros. Recibidos: {len(registros)}"
+        for indice, registro in enumerate(registros):
+            _, error = RegistroService.validar_registro(registro)
+            if error:
+                return f"Registro {indice}: {error}"
+        return None
+
+    @classmethod
+    def construir_respuesta(cls, resultado: Dict[str, Any], equipo_id: int, juez) -> Tuple[Dict[str, Any], int]:
+        """
+        Traduce el resultado del servicio a (cuerpo, status HTTP). Compartido
+        por esta vista y la vista asíncrona del modo nativo.
+        """
+        rechazo = cls.RECHAZOS.get(resultado.get('rechazo'))
+        if rechazo:
+            codigo_http, error = rechazo
+            if codigo_http >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+                logger.error(f"[HTTP] {resultado['error']} (equipo {equipo_id})")
+            return {"exito": False, "error": error.format(equipo_id=equipo_id, error=resultado.get('error'))}, codigo_http
+
+        logger.info(
+            "[HTTP] Registros procesados: guardados=%s fallidos=%s equipo=%s(%s) juez=%s(%s)",
+            resultado['total_guardados'],
+            resultado['total_fallidos'],
+            resultado.get('equipo_nombre'),
+            equipo_id,
+            juez.username,
+            juez.id,
+        )
+
+        if resultado['total_guardados'] == 0 and resultado['total_fallidos'] > 0:
+            return {"exito": False, "error": resultado['registros_fallidos']}, status.HTTP_400_BAD_REQUEST
+
+        # La notificación por WebSocket (deltas de clasificación) se agrupa
+        # por competencia y se envía en segundo plano tras el commit.
+
+        return {
+            "exito": True,
+            "mensaje": "Registros guardados exitosamente",
+            "equipo_id": equipo_id,
+            "equipo_nombre": resultado['equipo_nombre'],
+            "equipo_dorsal": resultado['equipo_dorsal'],
+            "total_guardados": resultado['total_guardados'],
+            "registros": resultado['registros_guardados'],
+            "registros_fallidos": resultado['registros_fallidos'],
+        }, status.HTTP_201_CREATED
+
+
+@csrf_exempt
+@idempotente('registros')
+async def registrar_tiempos(request, vista_hilo, equipo_id):
+    """
+    Despachador de /api/equipos/{equipo_id}/registros/ (ver
+    ``RegistrarTiemposView.as_view``); ``vista_hilo`` es la vista DRF síncrona.
+
+    Con REGISTRO_MODO='nativo' (y PostgreSQL) el POST se atiende en el bucle
+    de eventos: juez de la caché compartida de jueces (como la autenticación
+    de DRF) y escritura con psycopg asíncrono. Con REGISTRO_MODO='cola' se
+    valida igual, se encola en Redis y se responde 202 con un id de
+    seguimiento. Si no, se delega en la vista DRF dentro del pool acotado de
+    hilos de BD, donde los envíos de varios jueces corren en paralelo (el
+    executor de Django para vistas síncronas los atiende de uno en uno).
+    """
+    from app.services.registro_service import RegistroService, MODO_COLA
+
+    servicio = RegistroService()
+    modo_cola = getattr(settings, 'REGISTRO_MODO', None) == MODO_COLA
+    if request.method != 'POST' or not (modo_cola or servicio.modo_nativo()):
+        return await pool_bd.ejecutar(vista_hilo, request, equipo_id=equipo_id)
+
+    juez, registros, error = await _leer_envio(request, equipo_id)
+    if error is not None:
+        return error
+
+    if modo_cola:
+        return await _encolar_registros(request, vista_hilo, juez, equipo_id, registros)
+
+    try:
+        resultado = await servicio.registrar_batch(juez=juez, equipo_id=equipo_id, registros=registros)
+        cuerpo, codigo_http = RegistrarTiemposView.construir_respuesta(resultado, equipo_id, juez)
+        return JsonResponse(cuerpo, status=codigo_http)
+    except Exception as e:
+        logger.error(f"[HTTP] Error guardando registros: {str(e)}")
+        return JsonResponse(
+            {"exito": False, "error": f"Error interno: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+async def _leer_envio(request, equipo_id):
+    """
+    Autentica al juez como JuezJWTAuthentication (firma en el bucle, juez y
+    asignaciones de la caché compartida de jueces, que se invalida al guardar
+    un Juez o un Equipo) y valida el cuerpo del envío.
+
+    Returns:
+        Tupla (juez, registros, respuesta de error o None)
+    """
+    from rest_framework_simplejwt.tokens import AccessToken
+    from app.auth.juez_cache import obtener_juez
+
+    no_autorizado = JsonResponse(
+        {"detail": "Token inválido, expirado o ausente"},
+        status=status.HTTP_401_UNAUTHORIZED
+    )
+    tipo, _, token = request.headers.get('Authorization', '').partition(' ')
+    if tipo != 'Bearer' or not token:
+        return None, None, no_autorizado
+    try:
+        access_token = AccessToken(token)
+    except Exception:
+        return None, None, no_autorizado
+    juez_id = access_token.get('juez_id')
+    if juez_id is None:
+        return None, None, no_autorizado
+    try:
+        # Caché en Redis: la consulta solo ocurre si la entrada falta o caducó
+        juez = await pool_bd.ejecutar(obtener_juez, juez_id, access_token.get('jti'))
+    except Juez.DoesNotExist:
+        return None, None, no_autorizado
+
+    logger.info(f"[HTTP] Juez {juez.username} enviando registros para equipo {equipo_id}")
+
+    try:
+        registros = json.loads(request.body or b'{}').get('registros', [])
+    except (ValueError, AttributeError):
+        return juez, None, JsonResponse({"exito": False, "error": "JSON inválido"}, status=status.HTTP_400_BAD_REQUEST)
+
+    error = RegistrarTiemposView.validar_registros(registros)
+    if error:
+        return juez, None, JsonResponse({"exito": False, "error": error}, status=status.HTTP_400_BAD_REQUEST)
+    return juez, registros, None
+
+
+async def _encolar_registros(request, vista_hilo, juez, equipo_id, registros):
+    """
+    REGISTRO_MODO='cola': comprueba el equipo con las asignaciones del juez
+    de la caché compartida de jueces (invalidada al guardar un Juez o un
+    Equipo, así que una reasignación se ve al momento), añade el envío al
+    stream y responde 202. La validación definitiva (competencia en curso,
+    registros previos) la hace el worker.
+    Si Redis no responde, el envío se guarda por el camino síncrono.
+    """
+    from app.services.cola_registros_service import ColaRegistrosService
+
+    if not juez.equipo_ids:
+        codigo_http, error = RegistrarTiemposView.RECHAZOS['sin_equipos']
+        return JsonResponse({"exito": False, "error": error}, status=codigo_http)
+    if equipo_id not in juez.equipo_ids:
+        codigo_http, error = RegistrarTiemposView.RECHAZOS['equipo_ajeno']
+        return JsonResponse({"exito": False, "error": error}, status=codigo_http)
+
+    try:
+        envio = await ColaRegistrosService().encolar(juez, equipo_id, registros)
+    except Exception as e:
+        logger.error("[COLA] No se pudo encolar el envío (equipo=%s): %s; se guarda directamente", equipo_id, e)
+        return await pool_bd.ejecutar(vista_hilo, request, equipo_id=equipo_id)
+
+    logger.info("[COLA] Envío %s encolado: equipo=%s juez=%s", envio['seguimiento'], equipo_id, juez.id)
+    return JsonResponse({
+        "exito": True,
+        "mensaje": "Registros recibidos; se guardarán en breve",
+        "equipo_id": equipo_id,
+        "seguimiento": envio['seguimiento'],
+        "estado": envio['estado'],
+        "url_estado": reverse('estado_envio_registros', args=[envio['seguimiento']]),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+class RegistrarTiemposEquiposView(APIView):
+    """
+    POST /api/registros/lote/
+
+    Registra los tiempos de varios equipos del juez en una sola petición: un
+    bloqueo para todos los equipos, un único INSERT y una sola actualización
+    de la clasificación. Cada equipo sigue las reglas de
+    /api/equipos/{equipo_id}/registros/ y tiene su propio resultado; un
+    equipo rechazado no impide guardar los demás.
+
+    Request Body:
+    {
+        "equipos": [
+            {"equipo_id": 1, "registros": [{"id_registro": "uuid", "tiempo": 125000, ...}, ...]},
+            {"equipo_id": 2, "registros": [...]}
+        ]
+    }
+
+    Response (201 Created si se guardó algún equipo; si ninguno, 500 cuando
+    algún equipo falló por un error de la base de datos y 400 en otro caso):
+    {
+        "exito": true,
+        "equipos": [
+            {"equipo_id": 1, "status": 201, "exito": true, "total_guardados": 15, ...},
+            {"equipo_id": 2, "status": 403, "exito": false, "error": "Este equipo no te pertenece"}
+        ]
+    }
+
+    Un equipo con status 5xx no se guardó y debe reenviarse; si el lote se
+    guardó en parte, con una clave de idempotencia nueva.
+    """
+
+    permission_classes = [IsAuthenticated]
+    MAX_EQUIPOS = 20
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """
+        Como en ``RegistrarTiemposView.as_view``: la vista DRF síncrona corre
+        en el pool acotado de hilos de BD y la clave de idempotencia se
+        resuelve antes, en el bucle de eventos.
+        """
+        vista_hilo = super().as_view(**initkwargs)
+
+        @csrf_exempt
+        @idempotente('lote')
+        @wraps(vista_hilo)
+        async def vista(request, *args, **kwargs):
+            return await pool_bd.ejecutar(vista_hilo, request, *args, **kwargs)
+        return vista
+
+    def post(self, request):
+        juez = request.user
+        if not isinstance(juez, Juez):
+            return Response(
+                {"exito": False, "error": "Usuario no es un juez válido"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        equipos = request.data.get('equipos')
+        if not isinstance(equipos, list) or not equipos:
+            return Response(
+                {"exito": False, "error": "'equipos' debe ser una lista no vacía"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(equipos) > self.MAX_EQUIPOS:
+            return Response(
+                {"exito": False, "error": f"Se permiten como máximo {self.MAX_EQUIPOS} equipos por envío"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        logger.info(f"[HTTP] Juez {juez.username} enviando registros de {len(equipos)} equipos")
+
+        # Los envíos mal formados se responden aquí; el resto va al servicio
+        respuestas = [None] * len(equipos)
+        envios = []
+        posiciones = []
+        for posicion, envio in enumerate(equipos):
+            equipo_id = envio.get('equipo_id') if isinstance(envio, dict) else None
+            if not isinstance(equipo_id, int) or isinstance(equipo_id, bool):
+                respuestas[posicion] = {
+                    "equipo_id": equipo_id, "status": status.HTTP_400_BAD_REQUEST,
+                    "exito": False, "error": "'equipo_id' debe ser un entero",
+                }
+                continue
+            registros = envio.get('registros', [])
+            error = RegistrarTiemposView.validar_registros(registros)
+            if error:
+                respuestas[posicion] = {
+                    "equipo_id": equipo_id, "status": status.HTTP_400_BAD_REQUEST,
+                    "exito": False, "error": error,
+                }
+                continue
+            envios.append({'equipo_id': equipo_id, 'registros': registros})
+            posiciones.append(posicion)
+
+        if envios:
+            from app.services.registro_service import RegistroService
+
+            resultados = RegistroService().registrar_equipos(juez, envios)
+            for posicion, resultado in zip(posiciones, resultados):
+                cuerpo, codigo_http = RegistrarTiemposView.construir_respuesta(
+                    resultado, resultado['equipo_id'], juez
                 )
-                logger.info(f"[WS] Notificación enviada al grupo {competencia_group}")
+                respuestas[posicion] = {"equipo_id": resultado['equipo_id'], "status": codigo_http, **cuerpo}
+
+        guardado = any(respuesta['status'] == status.HTTP_201_CREATED for respuesta in respuestas)
+        if guardado:
+            codigo_http = status.HTTP_201_CREATED
+        elif any(respuesta['status'] >= status.HTTP_500_INTERNAL_SERVER_ERROR for respuesta in respuestas):
+            codigo_http = status.HTTP_500_INTERNAL_SERVER_ERROR
+        else:
+            codigo_http = status.HTTP_400_BAD_REQUEST
+        return Response({"exito": guardado, "equipos": respuestas}, status=codigo_http)
+
+
+class EstadoEnvioRegistrosView(APIView):
+    """
+    GET /api/registros/envios/{seguimiento}/
+
+    Estado de un envío aceptado con 202 (REGISTRO_MODO='cola'). Mientras el
+    worker no lo guarda, 'pendiente'; después, 'confirmado' con la misma
+    respuesta que habría dado el registro directo y su status HTTP; o
+    'fallido' (status 500) si el worker lo descartó sin poder guardarlo.
+
+    Response (200 OK):
+    {
+        "exito": true,
+        "seguimiento": "hex",
+        "estado": "confirmado",
+        "status": 201,
+        "respuesta": {"exito": true, "total_guardados": 15, ...}
+    }
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, seguimiento):
+        from app.services.cola_registros_service import ColaRegistrosService, ESTADO_CONFIRMADO, ESTADO_FALLIDO
+
+        try:
+            envio = ColaRegistrosService().estado(seguimiento, request.user.id)
         except Exception as e:
-            logger.warning(f"[WS] No se pudo notificar por WebSocket: {e}")
+            logger.error(f"[COLA] Error consultando el envío {seguimiento}: {str(e)}")
+            return Response(
+                {"exito": False, "error": "Estado de envíos no disponible"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        if envio is None:
+            return Response(
+                {"exito": False, "error": "Envío no encontrado o caducado"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        cuerpo = {"exito": True, "seguimiento": seguimiento, "estado": envio['estado'], "equipo_id": envio['equipo_id']}
+        if envio['estado'] == ESTADO_CONFIRMADO:
+            respuesta, codigo_http = RegistrarTiemposView.construir_respuesta(
+                envio['resultado'], envio['equipo_id'], request.user
+            )
+            cuerpo.update({"status": codigo_http, "respuesta": respuesta})
+        elif envio['estado'] == ESTADO_FALLIDO:
+            cuerpo.update({"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "error": envio['error']})
+        return Response(cuerpo)
 
 
 class EstadoEquipoRegistrosView(APIView):
@@ -211,11 +498,11 @@ class EstadoEquipoRegistrosView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Contar registros
-        total_registros = RegistroTiempo.objects.filter(team=equipo).count()
+        # Contador mantenido al insertar: sin COUNT(*)
+        total_registros = equipo.records_count
         
-        # Obtener registros ordenados
-        registros = RegistroTiempo.objects.filter(team=equipo).order_by('time')
+        # Obtener registros ordenados (solo si hay alguno)
+        registros = RegistroTiempo.objects.filter(team=equipo).order_by('time') if total_registros else []
         
         registros_data = [{
             'id_registro': str(r.record_id),
@@ -231,6 +518,87 @@ class EstadoEquipoRegistrosView(APIView):
             "equipo_nombre": equipo.name,
             "total_registros": total_registros,
             "maximo_registros": 15,
+            "tiempo_total": equipo.total_time,
             "puede_enviar": total_registros == 0,
             "registros": registros_data
         })
+
+
+class SincronizarRegistrosView(APIView):
+    """
+    GET  /api/equipos/{equipo_id}/registros/sincronizar/
+    POST /api/equipos/{equipo_id}/registros/sincronizar/
+
+    Sincronización por id_registro para clientes con conexión intermitente:
+    el cliente consulta los ids que el servidor ya tiene y envía solo los
+    que faltan, en uno o varios envíos parciales. Reenviar registros ya
+    guardados no escribe nada, así los reintentos son seguros.
+
+    Request Body (POST):
+    {
+        "registros": [
+            {"id_registro": "uuid", "tiempo": 125000, ...},
+            ...
+        ]
+    }
+
+    Response (200 OK):
+    {
+        "exito": true,
+        "equipo_id": 1,
+        "ids_conocidos": ["uuid", ...],
+        "total_registros": 12,
+        "maximo_registros": 15,
+        "completo": false,
+        "guardados": ["uuid", ...],          (solo POST)
+        "ya_conocidos": ["uuid", ...],       (solo POST)
+        "registros_fallidos": [{"indice": 0, "error": "..."}]  (solo POST)
+    }
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, equipo_id):
+        from app.services.registro_service import RegistroService
+
+        resultado = RegistroService().estado_sincronizacion(request.user, equipo_id)
+        return self._responder(resultado, equipo_id)
+
+    def post(self, request, equipo_id):
+        from app.services.registro_service import RegistroService
+
+        registros = request.data.get('registros', [])
+        if not isinstance(registros, list):
+            return Response(
+                {"exito": False, "error": "'registros' debe ser una lista"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(registros) > RegistrarTiemposView.MAX_REGISTROS:
+            return Response(
+                {"exito": False, "error": f"Se permiten como máximo {RegistrarTiemposView.MAX_REGISTROS} registros por envío"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultado = RegistroService().sincronizar(request.user, equipo_id, registros)
+        if 'guardados' in resultado:
+            logger.info(
+                "[HTTP] Sincronización: nuevos=%s conocidos=%s fallidos=%s equipo=%s juez=%s",
+                len(resultado['guardados']),
+                len(resultado['ya_conocidos']),
+                len(resultado['registros_fallidos']),
+                equipo_id,
+                request.user.id,
+            )
+        return self._responder(resultado, equipo_id)
+
+    def _responder(self, resultado: Dict[str, Any], equipo_id: int) -> Response:
+        codigo = resultado.get('rechazo')
+        if codigo:
+            codigo_http, error = RegistrarTiemposView.RECHAZOS[codigo]
+            if codigo_http >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+                logger.error(f"[HTTP] {resultado['error']}")
+            return Response(
+                {"exito": False, "error": error.format(equipo_id=equipo_id, error=resultado.get('error'))},
+                status=codigo_http
+            )
+        return Response({"exito": True, **resultado})
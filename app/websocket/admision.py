@@ -0,0 +1,155 @@
+"""
+Módulo: admision
+Control de admisión de conexiones WebSocket frente a tormentas de reconexión.
+
+Características:
+- Límite de handshakes simultáneos por worker (proceso)
+- El exceso espera en una cola acotada un tiempo máximo
+- Sin turno a tiempo se rechaza con una espera sugerida (con jitter)
+- Contadores de admitidos, encolados, rechazados y en curso
+"""
+
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Código de cierre para "servidor ocupado, reintentar" (análogo a HTTP 429)
+CODIGO_OCUPADO = 4029
+
+
+class ControlAdmision:
+    """
+    Semáforo de handshakes por proceso con cola acotada.
+
+    Uso:
+        async with control.turno() as admitido:
+            if not admitido:
+                ...  # rechazar con control.reintentar_en_ms()
+            ...  # handshake (validación, base de datos, grupos)
+    """
+
+    def __init__(
+        self,
+        maximo: int,
+        cola_maxima: int,
+        espera_maxima_ms: int,
+        reintento_base_ms: int,
+        reintento_maximo_ms: int = 30000,
+    ):
+        self.maximo = maximo
+        self.cola_maxima = cola_maxima
+        self.espera_maxima_ms = espera_maxima_ms
+        self.reintento_base_ms = reintento_base_ms
+        self.reintento_maximo_ms = reintento_maximo_ms
+
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._bucle = None
+        self._en_curso = 0
+        self._esperando = 0
+        self._contadores = {
+            'admitidos': 0,
+            'encolados': 0,
+            'rechazados_cola_llena': 0,
+            'rechazados_espera': 0,
+        }
+
+    def _obtener_semaforo(self) -> asyncio.Semaphore:
+        # Un semáforo por bucle de eventos (Daphne tiene uno por proceso)
+        bucle = asyncio.get_running_loop()
+        if self._semaforo is None or self._bucle is not bucle:
+            self._semaforo = asyncio.Semaphore(self.maximo)
+            self._bucle = bucle
+        return self._semaforo
+
+    async def _esperar_turno(self, semaforo: asyncio.Semaphore) -> bool:
+        if not semaforo.locked():
+            await semaforo.acquire()
+            return True
+
+        if self._esperando >= self.cola_maxima:
+            self._contadores['rechazados_cola_llena'] += 1
+            return False
+
+        self._contadores['encolados'] += 1
+        self._esperando += 1
+        try:
+            await asyncio.wait_for(semaforo.acquire(), self.espera_maxima_ms / 1000)
+            return True
+        except asyncio.TimeoutError:
+            self._contadores['rechazados_espera'] += 1
+            return False
+        finally:
+            self._esperando -= 1
+
+    @asynccontextmanager
+    async def turno(self):
+        """
+        Espera un turno de handshake.
+
+        Yields:
+            bool: True si se obtuvo turno, False si hay que rechazar
+        """
+        semaforo = self._obtener_semaforo()
+        if not await self._esperar_turno(semaforo):
+            yield False
+            return
+
+        self._contadores['admitidos'] += 1
+        self._en_curso += 1
+        try:
+            yield True
+        finally:
+            self._en_curso -= 1
+            semaforo.release()
+
+    def reintentar_en_ms(self) -> int:
+        """
+        Espera sugerida al cliente rechazado.
+
+        Crece con la cola actual y lleva jitter (±50 %) para que los clientes
+        rechazados no vuelvan todos a la vez.
+        """
+        presion = 1 + self._esperando / max(self.maximo, 1)
+        espera = min(self.reintento_base_ms * presion, self.reintento_maximo_ms)
+        return int(espera * random.uniform(0.5, 1.5))
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Instantánea de los contadores de este proceso."""
+        datos = dict(self._contadores)
+        datos['en_curso'] = self._en_curso
+        datos['esperando'] = self._esperando
+        datos['maximo'] = self.maximo
+        return datos
+
+
+control_admision = ControlAdmision(
+    maximo=getattr(settings, 'WS_HANDSHAKES_SIMULTANEOS', 32),
+    cola_maxima=getattr(settings, 'WS_HANDSHAKES_COLA', 256),
+    espera_maxima_ms=getattr(settings, 'WS_HANDSHAKE_ESPERA_MS', 3000),
+    reintento_base_ms=getattr(settings, 'WS_REINTENTO_BASE_MS', 1000),
+)
+
+
+async def rechazar_ocupado(consumer) -> None:
+    """
+    Rechaza una conexión por falta de turno indicando cuándo reintentar.
+
+    Se acepta la conexión para poder enviar la espera sugerida como primer
+    mensaje (un rechazo antes de aceptar llega al cliente como un 403 sin
+    detalle) y se cierra con CODIGO_OCUPADO, repitiendo la espera en el motivo.
+    """
+    reintentar_en_ms = control_admision.reintentar_en_ms()
+    logger.warning("WebSocket rejected: handshake queue full, retry in %sms", reintentar_en_ms)
+    await consumer.accept()
+    await consumer.send_json({
+        'tipo': 'reintentar',
+        'mensaje': 'Servidor ocupado, reintente más tarde',
+        'reintentar_en_ms': reintentar_en_ms,
+    })
+    await consumer.close(code=CODIGO_OCUPADO, reason=f'reintentar_en_ms={reintentar_en_ms}')
@@ -0,0 +1,239 @@
+"""
+Módulo: codificacion
+Codificación negociable de los mensajes WebSocket.
+
+Características:
+- 'json' (por defecto): el formato de siempre, claves completas
+- 'compacto': JSON con claves cortas (tipo -> t, equipo_nombre -> en, ...)
+- 'msgpack': MessagePack binario con las mismas claves cortas
+- Se elige con el subprotocolo (server5k.compacto, server5k.msgpack) o con
+  el parámetro ?formato= de la URL
+- Las claves de 'posiciones' y 'desplazados' son códigos de categoría y no
+  se traducen
+- Caché de tramas por worker: un evento de grupo se construye y codifica una
+  vez por (evento, tipo de consumer, formato) y se reutiliza en todos los
+  sockets del proceso
+"""
+
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+import msgpack
+
+FORMATO_JSON = 'json'
+FORMATO_COMPACTO = 'compacto'
+FORMATO_MSGPACK = 'msgpack'
+FORMATOS = (FORMATO_JSON, FORMATO_COMPACTO, FORMATO_MSGPACK)
+
+PREFIJO_SUBPROTOCOLO = 'server5k.'
+
+CLAVES_CORTAS = {
+    # Mensajes
+    'tipo': 't',
+    'mensaje': 'm',
+    'data': 'dt',
+    'error': 'er',
+    'usar_http': 'uh',
+    'reintentar_en_ms': 'rm',
+    # Competencia
+    'competencia': 'c',
+    'competencia_id': 'ci',
+    'competencia_nombre': 'cn',
+    'id': 'i',
+    'nombre': 'n',
+    'en_curso': 'ec',
+    'activa': 'a',
+    'started_at': 'sa',
+    'finished_at': 'fa',
+    # Equipos (jueces)
+    'equipo': 'e',
+    'equipos': 'es',
+    'equipo_id': 'ei',
+    'equipo_nombre': 'en',
+    'equipo_dorsal': 'ed',
+    'dorsal': 'd',
+    'total_registros': 'tr',
+    'tiempo_total': 'tt',
+    # Clasificación
+    'seq': 's',
+    'deltas': 'ds',
+    'resync': 'rs',
+    'posiciones': 'ps',
+    'desplazados': 'dz',
+    'posicion': 'p',
+    'pk': 'pk',
+    'name': 'nm',
+    'number': 'nu',
+    'category': 'ca',
+    'get_category_display': 'cd',
+    'jugadores_ausentes': 'ja',
+    'jugadores_completados': 'jc',
+    'descalificado': 'dq',
+    'tiempo_total_ms': 'tm',
+    'mejor_tiempo_ms': 'mm',
+    'tiempo_total_formateado': 'tf',
+    'mejor_tiempo_formateado': 'mf',
+    'num_registros': 'nr',
+    # Lotes de registros
+    'total_enviados': 'te',
+    'total_guardados': 'tg',
+    'total_fallidos': 'tx',
+    'registros_guardados': 'rg',
+    'registros_fallidos': 'rf',
+    'indice': 'ix',
+    'id_registro': 'ir',
+    'duplicado': 'du',
+}
+
+CLAVES_LARGAS = {corta: larga for larga, corta in CLAVES_CORTAS.items()}
+
+# Diccionarios indexados por código de categoría: sus claves son datos
+CLAVES_POR_CATEGORIA = {'posiciones', 'desplazados'}
+
+
+def negociar_formato(scope: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    """
+    Elige el formato de una conexión.
+
+    El subprotocolo tiene prioridad sobre ``?formato=``. Un valor desconocido
+    deja el formato 'json'.
+
+    Returns:
+        Tupla (formato, subprotocolo a aceptar o None)
+    """
+    for subprotocolo in scope.get('subprotocols') or []:
+        if subprotocolo.startswith(PREFIJO_SUBPROTOCOLO):
+            formato = subprotocolo[len(PREFIJO_SUBPROTOCOLO):]
+            if formato in FORMATOS:
+                return formato, subprotocolo
+
+    params = parse_qs(scope.get('query_string', b'').decode())
+    formato = params.get('formato', [FORMATO_JSON])[0]
+    return (formato if formato in FORMATOS else FORMATO_JSON), None
+
+
+def _traducir(valor: Any, claves: Dict[str, str], traducir_claves: bool = True) -> Any:
+    if isinstance(valor, dict):
+        traducido = {}
+        for clave, contenido in valor.items():
+            nueva = claves.get(clave, clave) if traducir_claves else clave
+            # Se comprueba la clave larga, sea la original o la traducida
+            por_categoria = clave in CLAVES_POR_CATEGORIA or nueva in CLAVES_POR_CATEGORIA
+            traducido[nueva] = _traducir(contenido, claves, not por_categoria)
+        return traducido
+    if isinstance(valor, list):
+        return [_traducir(elemento, claves) for elemento in valor]
+    return valor
+
+
+def acortar(contenido: Any) -> Any:
+    """Reemplaza las claves conocidas por sus versiones cortas."""
+    return _traducir(contenido, CLAVES_CORTAS)
+
+
+def expandir(contenido: Any) -> Any:
+    """Restaura las claves completas de un mensaje con claves cortas."""
+    return _traducir(contenido, CLAVES_LARGAS)
+
+
+def codificar(contenido: Dict[str, Any], formato: str) -> Dict[str, Any]:
+    """
+    Codifica un mensaje para ``send()`` del consumer.
+
+    Returns:
+        {'text_data': str} o {'bytes_data': bytes}
+    """
+    if formato == FORMATO_MSGPACK:
+        return {'bytes_data': msgpack.packb(acortar(contenido))}
+    if formato == FORMATO_COMPACTO:
+        return {'text_data': json.dumps(acortar(contenido), separators=(',', ':'), ensure_ascii=False)}
+    return {'text_data': json.dumps(contenido)}
+
+
+def decodificar(text_data: Optional[str], bytes_data: Optional[bytes], formato: str) -> Any:
+    """
+    Decodifica un mensaje del cliente: JSON en texto o MessagePack en binario.
+    En los formatos compactos se aceptan claves cortas o completas.
+    """
+    if text_data is None and bytes_data is not None:
+        contenido = msgpack.unpackb(bytes_data)
+    else:
+        contenido = json.loads(text_data)
+    return contenido if formato == FORMATO_JSON else expandir(contenido)
+
+
+class CacheTramas:
+    """
+    Tramas ya codificadas de los eventos de grupo recientes de este proceso.
+
+    Todos los consumers de un worker corren en el mismo bucle de eventos, así
+    que no hace falta lock. Se guardan las últimas ``maximo`` entradas.
+    """
+
+    def __init__(self, maximo: int = 512):
+        self.maximo = maximo
+        self._tramas: 'OrderedDict[tuple, Any]' = OrderedDict()
+        self.codificadas = 0
+        self.reutilizadas = 0
+
+    def obtener(self, clave: tuple, construir: Callable[[], Any]) -> Any:
+        trama = self._tramas.get(clave)
+        if trama is not None:
+            self.reutilizadas += 1
+            return trama
+        trama = construir()
+        self.codificadas += 1
+        self._tramas[clave] = trama
+        if len(self._tramas) > self.maximo:
+            self._tramas.popitem(last=False)
+        return trama
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {'codificadas': self.codificadas, 'reutilizadas': self.reutilizadas}
+
+
+tramas = CacheTramas()
+
+
+class CodificacionMixin:
+    """
+    Mixin para consumers JSON: negocia el formato al aceptar la conexión y
+    lo aplica en ``send_json`` y al recibir.
+    """
+
+    formato = FORMATO_JSON
+
+    async def accept(self, subprotocol=None, headers=None):
+        self.formato, subprotocolo = negociar_formato(self.scope)
+        await super().accept(subprotocol=subprotocol or subprotocolo, headers=headers)
+
+    async def send_json(self, content, close=False):
+        await self.send(**codificar(content, self.formato), close=close)
+
+    async def enviar_evento(self, event: Dict[str, Any], construir: Callable[[], Any]) -> None:
+        """
+        Envía el mensaje que ``construir()`` arma a partir de un evento de grupo.
+
+        Si el evento trae 'id_evento', el mensaje se construye y codifica una
+        sola vez por worker para cada tipo de consumer y formato. ``construir``
+        puede devolver un mensaje, una lista de mensajes o None (nada que enviar).
+        """
+        def codificar_mensajes():
+            contenido = construir()
+            if contenido is None:
+                return []
+            mensajes = contenido if isinstance(contenido, list) else [contenido]
+            return [codificar(mensaje, self.formato) for mensaje in mensajes]
+
+        id_evento = event.get('id_evento')
+        if id_evento is None:
+            lista = codificar_mensajes()
+        else:
+            lista = tramas.obtener((id_evento, type(self).__name__, self.formato), codificar_mensajes)
+        for trama in lista:
+            await self.send(**trama)
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        await self.receive_json(decodificar(text_data, bytes_data, self.formato), **kwargs)
@@ -4,26 +4,24 @@ Consumer WebSocket para gestionar las conexiones de jueces y recepción de tiemp
 Responsable de:
 - Validar autenticación JWT
 - Verificar permisos del juez
-- Recibir y procesar registros de tiempo
+- Indicar al cliente que los registros de tiempo se envían por HTTP
 - Enviar notificaciones en tiempo real
 """
 
 import urllib.parse
 import logging
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
-from channels.db import database_sync_to_async
-from .validators import (
-    get_juez_from_token,
-    verificar_competencia_activa,
-    obtener_estado_competencia,
-    validar_datos_registro,
-    validar_datos_batch,
-)
+from app.utils.bd_async import en_pool_bd
+from .admision import control_admision, rechazar_ocupado
+from .codificacion import CodificacionMixin
+from .grupos import alias_capa_espectadores, grupo_control, grupo_espectadores, grupo_juez
+from .latido import LatidoMixin
+from .validators import obtener_contexto_conexion
 
 logger = logging.getLogger(__name__)
 
 
-class JuezConsumer(AsyncJsonWebsocketConsumer):
+class JuezConsumer(LatidoMixin, CodificacionMixin, AsyncJsonWebsocketConsumer):
     """
     Consumer WebSocket para jueces.
     
@@ -33,7 +31,19 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
     
     async def connect(self):
         """
-        Maneja la conexión inicial del WebSocket.
+        Maneja la conexión inicial del WebSocket, con turno del control de
+        admisión: si hay demasiados handshakes en curso se rechaza con la
+        espera sugerida para reintentar.
+        """
+        async with control_admision.turno() as admitido:
+            if not admitido:
+                await rechazar_ocupado(self)
+                return
+            await self._conectar()
+
+    async def _conectar(self):
+        """
+        Handshake del juez.
         
         Valida:
         - Token JWT en query string
@@ -55,11 +65,13 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
             return
 
         try:
-            juez = await get_juez_from_token(token)
-            if not juez:
+            # Una sola ida a la base de datos (o ninguna si el token ya conectó antes)
+            contexto = await obtener_contexto_conexion(token)
+            if not contexto:
                 logger.warning("WebSocket rejected: invalid token or inactive judge")
                 await self.close(code=4002)
                 return
+            juez = contexto['juez']
             logger.info("WebSocket authenticated: juez=%s id=%s", juez.username, juez.id)
         except Exception as e:
             logger.exception("WebSocket token validation error")
@@ -78,23 +90,20 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
             return
 
         # Verificar que la competencia esté activa
-        logger.debug("Checking active competition for juez_id=%s", self.juez_id)
-        competencia_activa = await verificar_competencia_activa(self.juez)
-        if not competencia_activa:
+        if not contexto['competencia_activa']:
             logger.warning("WebSocket rejected: no active competition juez_id=%s", self.juez_id)
             await self.close(code=4004)
             return
 
         logger.debug("Active competition verified juez_id=%s", self.juez_id)
         
-        # Unirse al grupo del juez y al grupo de la competencia
-        self.group_name = f'juez_{self.juez_id}'
-        
-        # Obtener competencia_id del equipo asignado al juez (async)
-        competencia_id = await self.get_competencia_id_del_juez()
+        # Unirse al grupo del juez (sus equipos) y al de control de la
+        # competencia de su primer equipo (inicio/fin)
+        self.group_name = grupo_juez(self.juez_id)
+        competencia_id = contexto['competencia_id']
         
         if competencia_id:
-            self.competencia_group = f'competencia_{competencia_id}'
+            self.competencia_group = grupo_control(competencia_id)
             await self.channel_layer.group_add(self.competencia_group, self.channel_name)
             logger.debug("Joined group %s for juez_id=%s", self.competencia_group, self.juez_id)
         
@@ -102,9 +111,10 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
         
         logger.info("WebSocket accepted: juez_id=%s", self.juez_id)
         await self.accept()
+        self.iniciar_latido()
         
         # Enviar estado de la competencia al conectar
-        estado_competencia = await obtener_estado_competencia(self.juez)
+        estado_competencia = contexto['estado_competencia']
         logger.debug("Sending initial competition state juez_id=%s state=%s", self.juez_id, estado_competencia)
         await self.send_json({
             'tipo': 'conexion_establecida',
@@ -113,24 +123,12 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
         })
         logger.info("WebSocket ready: juez=%s id=%s", self.juez.username, self.juez_id)
 
-    @database_sync_to_async
-    def get_competencia_id_del_juez(self):
-        """
-        Obtiene el ID de la competencia del primer equipo del juez.
-        Debe ser async porque accede a la base de datos.
-        """
-        equipo = self.juez.teams.select_related('competition').first()
-        if equipo:
-            logger.debug("Team found: equipo=%s competencia=%s", equipo.name, equipo.competition.name)
-            return equipo.competition_id
-        logger.warning("Judge has no assigned teams juez_id=%s", self.juez_id)
-        return None
-
     async def disconnect(self, close_code):
         """
         Maneja la desconexión del WebSocket.
         Remueve al juez de los grupos de Redis.
         """
+        self.detener_latido()
         try:
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
             await self.channel_layer.group_discard(self.competencia_group, self.channel_name)
@@ -138,12 +136,16 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
             pass
         logger.info("WebSocket disconnected: juez_id=%s code=%s", getattr(self, 'juez_id', None), close_code)
 
+    def grupos_latido(self):
+        return [grupo for grupo in (getattr(self, 'group_name', None), getattr(self, 'competencia_group', None)) if grupo]
+
     async def receive_json(self, content, **kwargs):
         """
         Maneja mensajes JSON del cliente.
         
         Mensajes soportados:
         1. ping: Mantiene la conexión viva (heartbeat)
+        2. pong: Respuesta al latido del servidor
         
         NOTA: Los registros de tiempo ahora se envían por HTTP POST
         a /api/equipos/{id}/registros/ para mayor confiabilidad.
@@ -157,6 +159,9 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
                 'tipo': 'pong',
                 'mensaje': 'Conexión activa'
             })
+        elif tipo == 'pong':
+            # Respuesta al latido del servidor; la actividad ya quedó registrada
+            pass
         elif tipo == 'registrar_tiempo' or tipo == 'registrar_tiempos':
             # Informar al cliente que debe usar HTTP
             await self.send_json({
@@ -171,164 +176,6 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
                 'mensaje': f'Tipo de mensaje no reconocido: {tipo}'
             })
     
-    async def manejar_registro_tiempo(self, content):
-        """
-        Registra el tiempo de un equipo.
-        
-        Esperado en content:
-        {
-            "tipo": "registrar_tiempo",
-            "equipo_id": 1,
-            "tiempo": 1234567,  # milisegundos totales
-            "horas": 0,
-            "minutos": 20,
-            "segundos": 34,
-            "milisegundos": 567
-        }
-        """
-        try:
-            # Validar datos básicos
-            es_valido, error = validar_datos_registro(content)
-            if not es_valido:
-                await self.send_json({
-                    'tipo': 'error',
-                    'mensaje': error
-                })
-                return
-            
-            equipo_id = content.get('equipo_id')
-            tiempo = content.get('tiempo')
-            horas = content.get('horas', 0)
-            minutos = content.get('minutos', 0)
-            segundos = content.get('segundos', 0)
-            milisegundos = content.get('milisegundos', 0)
-            
-            # Registrar el tiempo usando el servicio
-            from app.services.registro_service import RegistroService
-            
-            service = RegistroService()
-            resultado = await service.registrar_tiempo(
-                juez=self.juez,
-                equipo_id=equipo_id,
-                tiempo=tiempo,
-                horas=horas,
-                minutos=minutos,
-                segundos=segundos,
-                milisegundos=milisegundos
-            )
-            
-            if resultado['exito']:
-                registro = resultado['registro']
-                # Enviar confirmación al cliente
-                await self.send_json({
-                    'tipo': 'tiempo_registrado',
-                    'registro': {
-                        'id_registro': str(registro.record_id),
-                        'equipo_id': registro.team_id,
-                        'equipo_nombre': registro.team.name,
-                        'equipo_dorsal': registro.team.number,
-                        'tiempo': registro.time,
-                        'horas': registro.hours,
-                        'minutos': registro.minutes,
-                        'segundos': registro.seconds,
-                        'milisegundos': registro.milliseconds,
-                        'timestamp': registro.created_at.isoformat()
-                    }
-                })
-            else:
-                await self.send_json({
-                    'tipo': 'error',
-                    'mensaje': resultado['error']
-                })
-            
-        except Exception as e:
-            await self.send_json({
-                'tipo': 'error',
-                'mensaje': f'Error al registrar tiempo: {str(e)}'
-            })
-    
-    async def manejar_registro_tiempos_batch(self, content):
-        """
-        Registra múltiples tiempos en batch (lote).
-        
-        Esperado en content:
-        {
-            "tipo": "registrar_tiempos",
-            "equipo_id": 1,
-            "registros": [
-                {
-                    "tiempo": 1234567,
-                    "horas": 0,
-                    "minutos": 20,
-                    "segundos": 34,
-                    "milisegundos": 567
-                },
-                ...
-            ]
-        }
-        """
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        try:
-            # Log de debug: recibimos el mensaje
-            logger.debug("[BATCH] Batch recibido: juez=%s equipo_id=%s", self.juez.username, content.get('equipo_id'))
-            logger.debug("[BATCH] Total registros recibidos: %s", len(content.get('registros', [])))
-            
-            # Validar datos del batch
-            es_valido, error = validar_datos_batch(content)
-            if not es_valido:
-                logger.warning(f"[BATCH] Validación fallida: {error}")
-                await self.send_json({
-                    'tipo': 'error',
-                    'mensaje': error
-                })
-                return
-            
-            equipo_id = content.get('equipo_id')
-            registros = content.get('registros', [])
-            
-            # Procesar batch usando el servicio
-            from app.services.registro_service import RegistroService
-            
-            service = RegistroService()
-            resultado = await service.registrar_batch(
-                juez=self.juez,
-                equipo_id=equipo_id,
-                registros=registros
-            )
-            
-            # Log de resultado
-            logger.info(
-                "[BATCH] Resultado: guardados=%s fallidos=%s juez=%s equipo_id=%s",
-                resultado['total_guardados'],
-                resultado['total_fallidos'],
-                self.juez.username,
-                equipo_id,
-            )
-            
-            if resultado['total_fallidos'] > 0:
-                logger.warning(f"[BATCH] Detalles de fallos: {resultado['registros_fallidos']}")
-
-            # Enviar respuesta con resumen
-            await self.send_json({
-                'tipo': 'tiempos_registrados_batch',
-                'total_enviados': resultado['total_enviados'],
-                'total_guardados': resultado['total_guardados'],
-                'total_fallidos': resultado['total_fallidos'],
-                'registros_guardados': resultado['registros_guardados'],
-                'registros_fallidos': resultado['registros_fallidos']
-            })
-            
-            logger.debug("[BATCH] Respuesta enviada al cliente")
-            
-        except Exception as e:
-            logger.error(f"[BATCH] Error crítico: {str(e)}", exc_info=True)
-            await self.send_json({
-                'tipo': 'error',
-                'mensaje': f'Error al procesar batch: {str(e)}'
-            })
-
     # Manejadores de eventos de grupo
     async def competencia_iniciada(self, event):
         """
@@ -342,20 +189,22 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
         
         data = event.get('data', {})
         
-        mensaje_a_enviar = {
-            'tipo': 'competencia_iniciada',
-            'mensaje': data.get('mensaje', 'La competencia ha iniciado'),
-            'competencia': {
-                'id': data.get('competencia_id'),
-                'nombre': data.get('competencia_nombre'),
-                'en_curso': data.get('en_curso', True),
-                'started_at': data.get('started_at'),  # Timestamp de inicio del servidor
+        def construir():
+            return {
+                'tipo': 'competencia_iniciada',
+                'mensaje': data.get('mensaje', 'La competencia ha iniciado'),
+                'competencia': {
+                    'id': data.get('competencia_id'),
+                    'nombre': data.get('competencia_nombre'),
+                    'en_curso': data.get('en_curso', True),
+                    'started_at': data.get('started_at'),  # Timestamp de inicio del servidor
+                }
             }
-        }
         
         logger.debug("Sending competencia_iniciada to client juez_id=%s", self.juez_id)
         
-        await self.send_json(mensaje_a_enviar)
+        # Mismo evento para todos los jueces del worker: se codifica una vez
+        await self.enviar_evento(event, construir)
         logger.debug("competencia_iniciada sent juez_id=%s", self.juez_id)
         
     
@@ -370,21 +219,22 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
         
         data = event.get('data', {})
         
-        mensaje_a_enviar = {
-            'tipo': 'competencia_detenida',
-            'mensaje': data.get('mensaje', 'La competencia ha finalizado'),
-            'competencia': {
-                'id': data.get('competencia_id'),
-                'nombre': data.get('competencia_nombre'),
-                'started_at': data.get('started_at'),  # Timestamp de inicio
-                'finished_at': data.get('finished_at'),  # Timestamp de finalización
-                'en_curso': data.get('en_curso', False),
+        def construir():
+            return {
+                'tipo': 'competencia_detenida',
+                'mensaje': data.get('mensaje', 'La competencia ha finalizado'),
+                'competencia': {
+                    'id': data.get('competencia_id'),
+                    'nombre': data.get('competencia_nombre'),
+                    'started_at': data.get('started_at'),  # Timestamp de inicio
+                    'finished_at': data.get('finished_at'),  # Timestamp de finalización
+                    'en_curso': data.get('en_curso', False),
+                }
             }
-        }
         
         logger.debug("Sending competencia_detenida to client juez_id=%s", self.juez_id)
         
-        await self.send_json(mensaje_a_enviar)
+        await self.enviar_evento(event, construir)
         
         logger.debug("competencia_detenida sent juez_id=%s", self.juez_id)
 
@@ -393,6 +243,9 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
         Notifica al cliente que hay nuevos registros de tiempo.
         Este evento se dispara cuando se guardan registros por HTTP.
         Permite actualizar la UI en tiempo real.
+
+        Llega por el grupo del juez y solo trae sus equipos de la ventana; se
+        envía un mensaje por equipo con el formato de siempre.
         """
         import logging
         logger = logging.getLogger(__name__)
@@ -401,70 +254,154 @@ class JuezConsumer(AsyncJsonWebsocketConsumer):
         
         data = event.get('data', {})
         
-        mensaje_a_enviar = {
-            'tipo': 'registros_actualizados',
-            'equipo': {
-                'id': data.get('equipo_id'),
-                'nombre': data.get('equipo_nombre'),
-                'dorsal': data.get('equipo_dorsal'),
-            },
-            'total_registros': data.get('total_registros'),
-            'tiempo_total': data.get('tiempo_total'),
-        }
+        def construir():
+            return [
+                {
+                    'tipo': 'registros_actualizados',
+                    'equipo': {
+                        'id': equipo.get('equipo_id'),
+                        'nombre': equipo.get('equipo_nombre'),
+                        'dorsal': equipo.get('equipo_dorsal'),
+                    },
+                    'total_registros': equipo.get('total_registros'),
+                    'tiempo_total': equipo.get('tiempo_total'),
+                }
+                for equipo in data.get('equipos', [])
+            ]
         
-        await self.send_json(mensaje_a_enviar)
+        await self.enviar_evento(event, construir)
 
         logger.debug("registros_actualizados sent juez_id=%s", self.juez_id)
 
 
-class CompetenciaPublicConsumer(AsyncJsonWebsocketConsumer):
+class CompetenciaPublicConsumer(LatidoMixin, CodificacionMixin, AsyncJsonWebsocketConsumer):
     """Consumer WebSocket público para ver resultados en vivo.
 
-    Se suscribe al grupo `competencia_<id>` y reenvía eventos al navegador.
+    Se suscribe al grupo `espectadores_<id>` del channel layer de espectadores
+    (Redis pub/sub: una suscripción por worker y competencia) y reenvía los
+    eventos al navegador.
+
+    Al conectar envía la clasificación con su número de secuencia
+    (`clasificacion_instantanea`). Si el cliente indica `?since=<seq>` y el
+    historial tiene todo lo posterior, solo le reenvía los deltas perdidos.
+    `?categoria=` filtra la instantánea igual que la página.
     """
 
+    @property
+    def channel_layer_alias(self):
+        return alias_capa_espectadores()
+
     async def connect(self):
+        async with control_admision.turno() as admitido:
+            if not admitido:
+                await rechazar_ocupado(self)
+                return
+            await self._conectar()
+
+    async def _conectar(self):
         competencia_id = str(self.scope['url_route']['kwargs'].get('competencia_id'))
         if not competencia_id:
             await self.close(code=4400)
             return
 
         self.competencia_id = competencia_id
-        self.group_name = f'competencia_{self.competencia_id}'
+        self.group_name = grupo_espectadores(self.competencia_id)
+
+        params = urllib.parse.parse_qs(self.scope.get('query_string', b'').decode())
+        categoria = params.get('categoria', [''])[0]
+        try:
+            since = int(params['since'][0]) if 'since' in params else None
+        except ValueError:
+            since = None
 
+        # Unirse antes de leer la clasificación: lo que llegue después por el
+        # grupo tiene una secuencia mayor y el cliente lo aplica encima.
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        self.iniciar_latido()
 
         await self.send_json({
             'tipo': 'conexion_establecida',
             'competencia_id': int(self.competencia_id),
         })
 
+        deltas, instantanea = await self.obtener_sincronizacion(since, categoria)
+        if instantanea is not None:
+            await self.send_json({
+                'tipo': 'clasificacion_instantanea',
+                'seq': instantanea['seq'],
+                'equipos': instantanea['calificados'] + instantanea['descalificados'],
+            })
+        elif deltas:
+            await self.send_json({
+                'tipo': 'clasificacion_lote',
+                'deltas': deltas,
+            })
+
+    @en_pool_bd
+    def obtener_sincronizacion(self, since, categoria):
+        """
+        Deltas perdidos desde ``since`` o, si no están todos (o no hay
+        ``since``), la instantánea de la clasificación.
+
+        Returns:
+            Tupla (deltas, instantanea); una de las dos es None
+        """
+        from app.services.leaderboard_service import LeaderboardService
+
+        leaderboard = LeaderboardService()
+        if since is not None:
+            deltas = leaderboard.deltas_desde(int(self.competencia_id), since)
+            if deltas is not None:
+                return deltas, None
+        return None, leaderboard.obtener_instantanea(int(self.competencia_id), categoria)
+
     async def disconnect(self, close_code):
+        self.detener_latido()
         try:
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
         except Exception:
             pass
 
+    def grupos_latido(self):
+        return [self.group_name]
+
     async def receive_json(self, content, **kwargs):
         if content.get('tipo') == 'ping':
             await self.send_json({'tipo': 'pong'})
 
     async def registros_actualizados(self, event):
-        data = event.get('data', {})
-        await self.send_json({
-            'tipo': 'registros_actualizados',
-            'data': data,
-        })
+        """
+        Envía al navegador, en un solo mensaje, los deltas de la clasificación
+        de la ventana (fila del equipo, posiciones y desplazamientos), cada uno
+        con su número de secuencia.
+        Si el evento no trae deltas se mantiene el aviso genérico, que obliga
+        al cliente a recargar el bloque de resultados.
+        """
+        def construir():
+            data = dict(event.get('data', {}))
+            deltas = data.pop('deltas', None)
+            if deltas:
+                return {
+                    'tipo': 'clasificacion_lote',
+                    'deltas': deltas,
+                }
+            return {
+                'tipo': 'registros_actualizados',
+                'data': data,
+            }
+
+        # Mismo evento para todos los espectadores del worker: se codifica una vez
+        await self.enviar_evento(event, construir)
 
     async def competencia_iniciada(self, event):
-        await self.send_json({
+        await self.enviar_evento(event, lambda: {
             'tipo': 'competencia_iniciada',
             'data': event.get('data', {}),
         })
 
     async def competencia_detenida(self, event):
-        await self.send_json({
+        await self.enviar_evento(event, lambda: {
             'tipo': 'competencia_detenida',
             'data': event.get('data', {}),
         })
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+Módulo: grupos
+Nombres de grupos y envío a grupos del channel layer.
+
+Características:
+- Cada tipo de cliente recibe solo lo que muestra:
+  - control_<id>: inicio/fin de la competencia, para los jueces
+  - juez_<id>: actualizaciones de los equipos del juez
+  - espectadores_<id>: deltas de la clasificación, para el público
+- Jueces en el channel layer por defecto
+- Los espectadores están en el layer 'espectadores' (Redis pub/sub): cada
+  worker se suscribe una vez por competencia y reparte el mensaje a sus
+  propios sockets, así un envío cuesta una escritura en Redis por worker
+  y no una por espectador
+- Si el layer 'espectadores' no está configurado se usa el de por defecto
+- Cada evento enviado lleva un 'id_evento' para que los consumers de un
+  worker lo codifiquen una sola vez (ver codificacion.CacheTramas)
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict
+
+from asgiref.sync import async_to_sync
+from channels import DEFAULT_CHANNEL_LAYER
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CAPA_ESPECTADORES = 'espectadores'
+
+
+def alias_capa_espectadores() -> str:
+    """Alias del channel layer de los espectadores."""
+    if CAPA_ESPECTADORES in getattr(settings, 'CHANNEL_LAYERS', {}):
+        return CAPA_ESPECTADORES
+    return DEFAULT_CHANNEL_LAYER
+
+
+def grupo_control(competencia_id: int) -> str:
+    """Grupo de eventos de control (inicio/fin) de los jueces de una competencia."""
+    return f'control_{competencia_id}'
+
+
+def grupo_juez(juez_id: int) -> str:
+    """Grupo de un juez (todas sus conexiones)."""
+    return f'juez_{juez_id}'
+
+
+def grupo_espectadores(competencia_id: int) -> str:
+    """Grupo de los espectadores de una competencia."""
+    return f'espectadores_{competencia_id}'
+
+
+def _con_id(mensaje: Dict[str, Any]) -> Dict[str, Any]:
+    return {**mensaje, 'id_evento': uuid.uuid4().hex}
+
+
+def enviar_a_espectadores(competencia_id: int, mensaje: Dict[str, Any]) -> None:
+    """
+    Envía un evento a los espectadores de una competencia (llamada síncrona).
+
+    Args:
+        competencia_id: ID de la competencia
+        mensaje: Evento con 'type' y 'data'
+    """
+    channel_layer = get_channel_layer(alias_capa_espectadores())
+    if not channel_layer:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(grupo_espectadores(competencia_id), _con_id(mensaje))
+    except Exception as e:
+        logger.warning("No se pudo notificar a los espectadores (competencia=%s): %s", competencia_id, e)
+
+
+def enviar_a_control(competencia_id: int, mensaje: Dict[str, Any]) -> None:
+    """
+    Envía un evento de control (inicio/fin) a los jueces de una competencia
+    (llamada síncrona).
+
+    Args:
+        competencia_id: ID de la competencia
+        mensaje: Evento con 'type' y 'data'
+    """
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        logger.warning("Channel layer no disponible; no se puede enviar notificación")
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(grupo_control(competencia_id), _con_id(mensaje))
+    except Exception as e:
+        logger.error("Error enviando notificación WebSocket (competencia=%s): %s", competencia_id, e, exc_info=True)
+
+
+def enviar_a_jueces(mensajes: Dict[int, Dict[str, Any]]) -> None:
+    """
+    Envía a cada juez su propio evento, todos en una sola llamada síncrona.
+
+    Args:
+        mensajes: Evento (con 'type' y 'data') por ID de juez
+    """
+    channel_layer = get_channel_layer()
+    if not channel_layer or not mensajes:
+        return
+
+    async def enviar():
+        return await asyncio.gather(
+            *(channel_layer.group_send(grupo_juez(juez_id), _con_id(mensaje)) for juez_id, mensaje in mensajes.items()),
+            return_exceptions=True,
+        )
+
+    try:
+        errores = [r for r in async_to_sync(enviar)() if isinstance(r, Exception)]
+    except Exception as e:
+        logger.warning("No se pudo notificar a los jueces: %s", e)
+        return
+    if errores:
+        logger.warning("No se pudo notificar a %s jueces: %s", len(errores), errores[0])
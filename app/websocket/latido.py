@@ -0,0 +1,112 @@
+"""
+Módulo: latido
+Latido del servidor y cosecha de conexiones WebSocket inactivas.
+
+Características:
+- El servidor envía {'tipo': 'ping'} cada WS_LATIDO_INTERVALO_S segundos
+- Cualquier mensaje del cliente (pong, ping, otros) cuenta como actividad
+- Tras WS_LATIDOS_PERDIDOS intervalos sin actividad la conexión se cosecha:
+  se descartan sus grupos del channel layer y se cierra
+- Medidores por worker: conexiones vivas, zombis y cosechadas
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from typing import Any, Dict, List
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Código de cierre para conexiones cosechadas por inactividad
+CODIGO_INACTIVA = 4008
+
+_conexiones = weakref.WeakSet()
+_cosechadas = 0
+
+
+def _intervalo() -> float:
+    return getattr(settings, 'WS_LATIDO_INTERVALO_S', 25)
+
+
+def _maximo_perdidos() -> int:
+    return getattr(settings, 'WS_LATIDOS_PERDIDOS', 3)
+
+
+class LatidoMixin:
+    """
+    Mixin para consumers JSON con latido del servidor.
+
+    El consumer llama a ``iniciar_latido()`` después de ``accept()`` y a
+    ``detener_latido()`` en ``disconnect()``, y define ``grupos_latido()``
+    con los grupos que hay que descartar al cosechar la conexión.
+    """
+
+    def grupos_latido(self) -> List[str]:
+        return []
+
+    def iniciar_latido(self) -> None:
+        self._ultima_actividad = time.monotonic()
+        self._tarea_latido = asyncio.create_task(self._latir())
+        _conexiones.add(self)
+
+    def detener_latido(self) -> None:
+        _conexiones.discard(self)
+        tarea = getattr(self, '_tarea_latido', None)
+        if tarea is not None and tarea is not asyncio.current_task():
+            tarea.cancel()
+
+    def silencio(self) -> float:
+        """Segundos desde el último mensaje del cliente."""
+        return time.monotonic() - self._ultima_actividad
+
+    async def websocket_receive(self, message):
+        self._ultima_actividad = time.monotonic()
+        await super().websocket_receive(message)
+
+    async def _latir(self) -> None:
+        intervalo = _intervalo()
+        limite = intervalo * _maximo_perdidos()
+        try:
+            while True:
+                await asyncio.sleep(intervalo)
+                if self.silencio() >= limite:
+                    await self._cosechar()
+                    return
+                await self.send_json({'tipo': 'ping'})
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug("Latido interrumpido: %s", e)
+
+    async def _cosechar(self) -> None:
+        global _cosechadas
+        _cosechadas += 1
+        self.detener_latido()
+        logger.info("WebSocket reaped: %.0fs without client messages channel=%s", self.silencio(), self.channel_name)
+        for grupo in self.grupos_latido():
+            try:
+                await self.channel_layer.group_discard(grupo, self.channel_name)
+            except Exception:
+                pass
+        try:
+            await self.close(code=CODIGO_INACTIVA)
+        except Exception:
+            pass
+
+
+def estadisticas() -> Dict[str, Any]:
+    """
+    Medidores de este worker: una conexión es zombi si ya perdió al menos un
+    latido y todavía no se cosechó.
+    """
+    umbral = _intervalo() * 1.5
+    silencios = [conexion.silencio() for conexion in list(_conexiones)]
+    zombis = sum(1 for silencio in silencios if silencio >= umbral)
+    return {
+        'vivas': len(silencios) - zombis,
+        'zombis': zombis,
+        'cosechadas': _cosechadas,
+    }
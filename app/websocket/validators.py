@@ -1,16 +1,167 @@
 """
 Módulo: validators
 Funciones de validación para conexiones WebSocket y mensajes entrantes.
+
+Características:
+- Contexto de conexión del juez en una sola consulta y un solo salto a hilo
+  (en el pool acotado de hilos de BD, ver utils.bd_async)
+- Caché por proceso del contexto, por token (jti), hasta que el token expira
+- Generación compartida en la caché 'default' (Redis): guardar un Juez,
+  Equipo o Competencia invalida los contextos de todos los procesos
 """
 
 import logging
-from channels.db import database_sync_to_async
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from django.core.cache import cache
 from rest_framework_simplejwt.tokens import AccessToken
 
+from app.utils.bd_async import en_pool_bd, pool_bd
+
 logger = logging.getLogger(__name__)
 
+# Contextos de conexión por jti: (expira_en, generacion, contexto)
+MAX_CONTEXTOS = 2000
+_contextos: Dict[str, tuple] = {}
+_contextos_lock = threading.Lock()
+CLAVE_GENERACION = 'ws:contextos:generacion'
+
+
+async def obtener_contexto_conexion(token) -> Optional[Dict[str, Any]]:
+    """
+    Valida el token JWT y retorna todo lo que necesita la conexión del juez.
+
+    La firma y expiración del token se validan en el propio bucle (sin base de
+    datos). Si el token ya se usó para conectar en este proceso y la
+    generación compartida no cambió desde entonces (ningún proceso guardó un
+    Juez, Equipo o Competencia), el contexto sale de la caché con una sola
+    lectura de Redis; si no, se obtiene con una sola consulta.
+
+    Args:
+        token: Token JWT de acceso
+
+    Returns:
+        Dict con 'juez', 'competencia_activa', 'competencia_id' y
+        'estado_competencia', o None si el token o el juez no son válidos
+    """
+    try:
+        access_token = AccessToken(token)
+    except Exception as e:
+        logger.warning("Token JWT inválido: %s", e)
+        return None
+
+    juez_id = access_token.get('juez_id')
+    if not juez_id:
+        logger.error("Token JWT no contiene juez_id")
+        return None
+
+    clave = access_token.get('jti')
+    expira_en = access_token.get('exp') or 0
+    if clave:
+        entrada = _contextos.get(clave)
+        if entrada is not None and entrada[0] > time.time():
+            if entrada[1] == await pool_bd.ejecutar(_generacion_compartida):
+                logger.debug("Contexto de conexión desde caché: juez_id=%s", juez_id)
+                return entrada[2]
+
+    generacion, contexto = await _cargar_contexto_conexion(juez_id)
+    if contexto is not None and clave and generacion is not None:
+        with _contextos_lock:
+            if len(_contextos) >= MAX_CONTEXTOS:
+                _contextos.clear()
+            _contextos[clave] = (expira_en, generacion, contexto)
+    return contexto
+
+
+def invalidar_contextos_conexion() -> None:
+    """
+    Invalida los contextos de conexión en caché de todos los procesos
+    (avanza la generación compartida) y vacía los de este proceso.
+    Se llama al guardar jueces, equipos o competencias.
+    """
+    try:
+        cache.add(CLAVE_GENERACION, 0, None)
+        cache.incr(CLAVE_GENERACION)
+    except Exception as e:
+        logger.warning("No se pudo invalidar los contextos de conexión: %s", e)
+    with _contextos_lock:
+        _contextos.clear()
+
+
+def _generacion_compartida() -> Optional[int]:
+    """Generación actual de los contextos, o None si la caché no responde."""
+    try:
+        return cache.get_or_set(CLAVE_GENERACION, 0, None)
+    except Exception as e:
+        logger.warning("Generación de contextos no disponible: %s", e)
+        return None
+
+
+@en_pool_bd
+def _cargar_contexto_conexion(juez_id) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    """
+    Una sola consulta: el juez activo unido (LEFT JOIN) a sus equipos y las
+    competencias de esos equipos, ordenados por dorsal.
+
+    La generación se lee antes de la consulta: una invalidación posterior
+    deja la entrada obsoleta en lugar de perderse.
 
-@database_sync_to_async
+    Returns:
+        Tupla (generación compartida o None, contexto o None)
+    """
+    from app.models import Juez
+
+    generacion = _generacion_compartida()
+    filas = list(
+        Juez.objects
+        .filter(id=juez_id, is_active=True)
+        .order_by('teams__number')
+        .values(
+            'id', 'username', 'first_name', 'last_name', 'email', 'is_active', 'created_at',
+            'teams__id', 'teams__competition_id', 'teams__competition__name',
+            'teams__competition__is_running', 'teams__competition__is_active',
+        )
+    )
+    if not filas:
+        logger.warning("Juez no existe o está inactivo: juez_id=%s", juez_id)
+        return generacion, None
+
+    primera = filas[0]
+    juez = Juez(**{campo: primera[campo] for campo in (
+        'id', 'username', 'first_name', 'last_name', 'email', 'is_active', 'created_at'
+    )})
+    # Instancia equivalente a una leída de la base de datos
+    juez._state.adding = False
+    juez._state.db = 'default'
+
+    equipos = [fila for fila in filas if fila['teams__id'] is not None]
+    juez.equipo_ids = sorted(fila['teams__id'] for fila in equipos)
+    juez.competencia_ids = sorted({fila['teams__competition_id'] for fila in equipos})
+
+    # Misma elección que antes: grupo por la competencia del primer equipo,
+    # estado por la del primer equipo con competencia activa
+    activa = next((fila for fila in equipos if fila['teams__competition__is_active']), None)
+    estado_competencia = None
+    if activa is not None:
+        estado_competencia = {
+            'id': activa['teams__competition_id'],
+            'nombre': activa['teams__competition__name'],
+            'en_curso': activa['teams__competition__is_running'],
+            'activa': activa['teams__competition__is_active'],
+        }
+
+    logger.debug("Juez autenticado: %s (id=%s)", juez.username, juez.id)
+    return generacion, {
+        'juez': juez,
+        'competencia_activa': activa is not None,
+        'competencia_id': equipos[0]['teams__competition_id'] if equipos else None,
+        'estado_competencia': estado_competencia,
+    }
+
+
+@en_pool_bd
 def get_juez_from_token(token):
     """
     Valida el token JWT y retorna el juez.
@@ -46,7 +197,7 @@ def get_juez_from_token(token):
         return None
 
 
-@database_sync_to_async
+@en_pool_bd
 def verificar_competencia_activa(juez):
     """
     Verifica que el juez tenga una competencia activa.
@@ -62,7 +213,7 @@ def verificar_competencia_activa(juez):
     return tiene_competencia
 
 
-@database_sync_to_async
+@en_pool_bd
 def verificar_competencia_en_curso(juez):
     """
     Verifica que la competencia del juez esté en curso.
@@ -76,7 +227,7 @@ def verificar_competencia_en_curso(juez):
     return juez.teams.filter(competition__is_running=True).exists()
 
 
-@database_sync_to_async
+@en_pool_bd
 def obtener_estado_competencia(juez):
     """
     Obtiene el estado de la competencia del juez.
@@ -101,7 +252,7 @@ def obtener_estado_competencia(juez):
     }
 
 
-@database_sync_to_async
+@en_pool_bd
 def validar_equipo_pertenece_juez(equipo_id, juez_id):
     """
     Valida que un equipo pertenezca al juez especificado.
@@ -120,53 +271,3 @@ def validar_equipo_pertenece_juez(equipo_id, juez_id):
         return equipo.judge_id == juez_id
     except Equipo.DoesNotExist:
         return False
-
-
-def validar_datos_registro(content):
-    """
-    Valida que los datos de un registro de tiempo sean correctos.
-    
-    Args:
-        content: Diccionario con los datos del registro
-        
-    Returns:
-        tuple: (bool_valido, mensaje_error)
-    """
-    equipo_id = content.get('equipo_id')
-    tiempo = content.get('tiempo')
-    
-    if equipo_id is None:
-        return False, 'Falta el campo equipo_id'
-    
-    if tiempo is None:
-        return False, 'Falta el campo tiempo'
-    
-    if not isinstance(tiempo, (int, float)) or tiempo < 0:
-        return False, 'El tiempo debe ser un número positivo'
-    
-    return True, None
-
-
-def validar_datos_batch(content):
-    """
-    Valida que los datos de un batch de registros sean correctos.
-    
-    Args:
-        content: Diccionario con los datos del batch
-        
-    Returns:
-        tuple: (bool_valido, mensaje_error)
-    """
-    equipo_id = content.get('equipo_id')
-    registros = content.get('registros', [])
-    
-    if equipo_id is None:
-        return False, 'Falta el campo equipo_id'
-    
-    if not registros or not isinstance(registros, list):
-        return False, 'Faltan los registros o no es una lista válida'
-    
-    if len(registros) > 15:
-        return False, 'El batch no puede contener más de 15 registros'
-    
-    return True, None
@@ -0,0 +1,35 @@
+"""
+Módulo: workers
+Consumers de segundo plano del channel layer (sin WebSocket).
+
+Se ejecutan con:
+    python manage.py runworker resultados-refresco
+"""
+
+import logging
+from channels.consumer import SyncConsumer
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class ResultadosWorker(SyncConsumer):
+    """
+    Refresca la tabla materializada de resultados (ResumenEquipo)
+    cuando se confirma un lote de registros.
+    """
+
+    def resultados_refrescar(self, message):
+        from app.services.resumen_service import ResumenService
+
+        competencia_id = message.get('competencia_id')
+        if not competencia_id:
+            return
+
+        close_old_connections()
+        try:
+            ResumenService().refrescar_competencia(competencia_id)
+        except Exception as e:
+            logger.error("Error refrescando resultados (competencia=%s): %s", competencia_id, e, exc_info=True)
+        finally:
+            close_old_connections()
@@ -18,9 +18,11 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 django_asgi_app = get_asgi_application()
 
 # DESPUÉS importar componentes que dependen de Django
-from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.routing import ChannelNameRouter, ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from app.websocket.routing import websocket_urlpatterns
+from app.websocket.workers import ResultadosWorker
+from app.services.resumen_service import CANAL_REFRESCO
 
 application = ProtocolTypeRouter({
 	"http": django_asgi_app,
@@ -29,4 +31,8 @@ application = ProtocolTypeRouter({
 			websocket_urlpatterns
 		)
 	),
+	# Workers de segundo plano: python manage.py runworker resultados-refresco
+	"channel": ChannelNameRouter({
+		CANAL_REFRESCO: ResultadosWorker.as_asgi(),
+	}),
 })
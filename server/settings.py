@@ -89,6 +89,56 @@ CHANNEL_LAYERS = {
             'prefix': 'server5k',
         },
     },
+    # Espectadores: Redis pub/sub. Cada worker se suscribe una vez por
+    # competencia y reparte a sus sockets (una escritura por worker, no por
+    # espectador). Sin persistencia: quien no está conectado pierde el mensaje.
+    'espectadores': {
+        'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+        'CONFIG': {
+            'hosts': [(REDIS_HOST, REDIS_PORT)],
+            'prefix': 'server5k-espectadores',
+        },
+    },
+}
+
+# Ventana (ms) en la que se agrupan las actualizaciones de una competencia
+# antes de difundirlas por WebSocket
+DIFUSION_VENTANA_MS = int(os.getenv('DIFUSION_VENTANA_MS', 150))
+
+# Control de admisión de WebSocket (por worker): handshakes simultáneos, cola
+# de espera y tiempo máximo en cola; al rechazar se sugiere reintentar tras
+# WS_REINTENTO_BASE_MS (con jitter, más si la cola está llena)
+WS_HANDSHAKES_SIMULTANEOS = int(os.getenv('WS_HANDSHAKES_SIMULTANEOS', 32))
+WS_HANDSHAKES_COLA = int(os.getenv('WS_HANDSHAKES_COLA', 256))
+WS_HANDSHAKE_ESPERA_MS = int(os.getenv('WS_HANDSHAKE_ESPERA_MS', 3000))
+WS_REINTENTO_BASE_MS = int(os.getenv('WS_REINTENTO_BASE_MS', 1000))
+
+# Latido del servidor: ping cada WS_LATIDO_INTERVALO_S segundos; una conexión
+# sin mensajes del cliente durante WS_LATIDOS_PERDIDOS intervalos se cierra y
+# sale de sus grupos
+WS_LATIDO_INTERVALO_S = int(os.getenv('WS_LATIDO_INTERVALO_S', 25))
+WS_LATIDOS_PERDIDOS = int(os.getenv('WS_LATIDOS_PERDIDOS', 3))
+
+# === CACHÉ ===
+# 'default' (Redis) se comparte entre workers: clasificación en vivo, versiones
+# de competencia y HTML renderizado. 'local' es memoria del proceso y sirve
+# como primer nivel para el HTML renderizado.
+REDIS_CACHE_DB = int(os.getenv('REDIS_CACHE_DB', 1))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_CACHE_DB}',
+        'KEY_PREFIX': 'server5k',
+        'TIMEOUT': 300,
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'server5k-local',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
 }
 
 # === BASE DE DATOS (PostgreSQL) ===
@@ -116,9 +166,43 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Daphne atiende cada petición en su propio hilo: con transacciones
+            # IMMEDIATE los escritores concurrentes esperan en vez de fallar
+            # con "database is locked".
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
         }
     }
 
+# Camino de escritura del registro de tiempos: 'hilo' (ORM en el pool de
+# hilos de BD), 'nativo' (psycopg asíncrono con su propio pool de
+# REGISTRO_POOL_ASYNC conexiones por worker; solo PostgreSQL) o 'cola'
+# (202 inmediato y escritura por el worker procesar_registros)
+REGISTRO_MODO = os.getenv('REGISTRO_MODO', 'hilo')
+REGISTRO_POOL_ASYNC = int(os.getenv('REGISTRO_POOL_ASYNC', 10))
+
+# Cola de registros (REGISTRO_MODO='cola'): Redis Stream, estado de cada
+# envío durante COLA_REGISTROS_TTL segundos, reintento de los mensajes que
+# un worker dejó sin confirmar tras COLA_REGISTROS_REINTENTO_MS y estado
+# 'fallido' tras COLA_REGISTROS_MAX_INTENTOS entregas sin guardar
+REDIS_COLA_DB = int(os.getenv('REDIS_COLA_DB', 2))
+COLA_REGISTROS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_COLA_DB}'
+COLA_REGISTROS_TTL = int(os.getenv('COLA_REGISTROS_TTL', 86400))
+COLA_REGISTROS_REINTENTO_MS = int(os.getenv('COLA_REGISTROS_REINTENTO_MS', 30000))
+COLA_REGISTROS_MAX_INTENTOS = int(os.getenv('COLA_REGISTROS_MAX_INTENTOS', 5))
+
+# Presupuesto de conexiones a la base de datos por worker (max_connections de
+# PostgreSQL repartido entre los workers). De él salen el hilo de las vistas
+# síncronas, el pool asíncrono del registro nativo y el pool de hilos del ORM
+# de los consumers y del registro, que tendrá WS_BD_HILOS hilos como máximo
+BD_CONEXIONES_POR_WORKER = int(os.getenv('BD_CONEXIONES_POR_WORKER', 20))
+WS_BD_HILOS = int(os.getenv('WS_BD_HILOS', 8))
+
+# Segundos que se guarda la respuesta de un envío con Idempotency-Key
+IDEMPOTENCIA_TTL = int(os.getenv('IDEMPOTENCIA_TTL', 86400))
+
 # === VALIDACIÓN DE CONTRASEÑAS ===
 AUTH_PASSWORD_VALIDATORS = [
     {